@@ -0,0 +1,204 @@
+"""Local OpenAI-compatible chat completions stub for benchmarks.
+
+Answers /v1/chat/completions with canned output shaped for whichever generator
+sent the prompt (cards/tasks JSON arrays, transcript JSON objects, prose notes),
+with configurable first-token latency, tokens per second and failure rate.
+Supports stream=True (SSE chunks plus a final usage chunk). Also serves a mock
+AssemblyAI /v3/token endpoint for the streaming token route.
+
+Run standalone:
+    python -m benchmarks.fake_llm_server --port 8901 --latency 0.3 --tps 80
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.2  # seconds before the first token
+    tokens_per_second: float = 200.0
+    failure_rate: float = 0.0  # share of requests answered with HTTP 500
+    rate_limit_rate: float = 0.0  # share of requests answered with HTTP 429
+    seed: int = 0
+
+
+CARDS = [
+    {
+        "id": f"q{i}",
+        "title": f"Have you noticed any change in symptom {i}?",
+        "description": "Ask whether the symptom has improved, stayed the same or worsened.",
+        "rationale": "Tracks recovery and flags complications early.",
+        "category": cat,
+    }
+    for i, cat in enumerate(["red_flag", "medication", "symptom", "recovery", "follow_up"], 1)
+]
+
+TASKS = [
+    {"id": "task-f1", "label": "Schedule follow-up visit in 2 weeks", "priority": "high", "source": "AI-generated", "category": "Follow-up"},
+    {"id": "task-m1", "label": "Review medication adherence", "priority": "medium", "source": "AI-generated", "category": "Medication"},
+]
+
+
+def _processed_transcript(user_prompt: str) -> dict:
+    body = user_prompt.split('"""')[1] if '"""' in user_prompt else user_prompt
+    sentences = [s.strip() for s in body.replace("?", "?.").split(".") if s.strip()]
+    utterances = [
+        {"speaker": "clinician" if s.endswith("?") else "client", "text": s}
+        for s in sentences
+    ]
+    return {
+        "utterances": utterances,
+        "clinician_questions": [u["text"] for u in utterances if u["speaker"] == "clinician"][:5],
+        "client_responses": [u["text"] for u in utterances if u["speaker"] == "client"][:5],
+        "summary": "Follow-up conversation about recovery and medications.",
+    }
+
+
+def _speaker_labels(user_prompt: str) -> list:
+    labels = []
+    for line in user_prompt.splitlines():
+        number, _, rest = line.partition(" [?] ")
+        if rest and number.isdigit():
+            labels.append({"line": int(number), "speaker": "clinician" if rest.endswith("?") else "client"})
+    return labels
+
+
+def canned_reply(messages: list, max_tokens: int) -> str:
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    user = next((m["content"] for m in messages if m.get("role") == "user"), "")
+    if "labeled [?] need a label" in system:
+        return json.dumps(_speaker_labels(user))
+    if "split it into utterances" in system:
+        return json.dumps(_processed_transcript(user))
+    if "summarize clinician-patient conversations" in system:
+        return "Follow-up conversation about recovery and medications."
+    if "task assistant" in system:
+        return json.dumps(TASKS)
+    if "JSON array" in system:
+        return json.dumps(CARDS)
+    words = min(max_tokens, 400)
+    return " ".join(["Patient stable; continue current plan and monitor symptoms."] * max(1, words // 8))
+
+
+def _count_tokens(text: str) -> int:
+    # Close enough to BPE counts for throughput modelling.
+    return max(1, len(text) // 4)
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(config.seed)
+    app.state.requests = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "stub")
+        max_tokens = int(body.get("max_tokens") or 500)
+
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            return JSONResponse({"error": {"message": "rate limited"}}, status_code=429)
+        if roll < config.rate_limit_rate + config.failure_rate:
+            return JSONResponse({"error": {"message": "stub failure"}}, status_code=500)
+
+        text = canned_reply(messages, max_tokens)
+        prompt_tokens = sum(_count_tokens(m.get("content", "")) for m in messages)
+        completion_tokens = _count_tokens(text)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        await asyncio.sleep(config.latency)
+
+        if body.get("stream"):
+            async def events():
+                # Emit ~4-character pieces at the configured token rate.
+                pieces = [text[i:i + 4] for i in range(0, len(text), 4)]
+                delay = 1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+                for piece in pieces:
+                    chunk = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if delay:
+                        await asyncio.sleep(delay)
+                final = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        if config.tokens_per_second > 0:
+            await asyncio.sleep(completion_tokens / config.tokens_per_second)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+            ],
+            "usage": usage,
+        }
+
+    @app.get("/v3/token")
+    async def streaming_token(request: Request, expires_in_seconds: int = 300):
+        # Mock AssemblyAI temporary token (set ASSEMBLYAI_STREAMING_BASE_URL to this server).
+        app.state.token_requests = getattr(app.state, "token_requests", 0) + 1
+        if not request.headers.get("authorization"):
+            return JSONResponse({"error": "missing api key"}, status_code=401)
+        await asyncio.sleep(config.latency)
+        return {"token": f"tmp-{uuid.uuid4().hex[:16]}", "expires_in_seconds": expires_in_seconds}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--tps", type=float, default=200.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    config = StubConfig(
+        latency=args.latency,
+        tokens_per_second=args.tps,
+        failure_rate=args.failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
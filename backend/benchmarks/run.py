@@ -0,0 +1,265 @@
+"""Offline load benchmark for the FastAPI stack.
+
+Starts the fake LLM server (benchmarks/fake_llm_server.py) on a local port, points
+ai_service at it, uses the in-memory repository, and drives every generation route
+in-process at several client concurrency levels. Reports p50/p95/p99 latency,
+throughput and memory, and writes the results as JSON so runs can be compared
+across commits.
+
+Run from backend/:
+    python -m benchmarks.run --concurrency 1,4,16 --requests 64
+    python -m benchmarks.run --routes cards,report --latency 0.5 --tps 60 --output out.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+import uvicorn
+
+from .fake_llm_server import StubConfig, create_app
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+TRANSCRIPT = (
+    "How have you been feeling since the surgery? The knee is still a bit swollen in the evenings. "
+    "Are you taking the warfarin every day? Yes, every morning with breakfast. "
+    "Any unusual bruising or bleeding? I noticed a bruise on my arm last week. "
+    "How is physical therapy going? It's going well, I can walk further without the cane. "
+    "Keep elevating the leg and call us if the swelling gets worse. Okay, I will."
+)
+
+PROCESSED = {
+    "utterances": [
+        {"speaker": "clinician", "text": "How have you been feeling since the surgery?"},
+        {"speaker": "client", "text": "The knee is still a bit swollen in the evenings."},
+        {"speaker": "clinician", "text": "Are you taking the warfarin every day?"},
+        {"speaker": "client", "text": "Yes, every morning with breakfast."},
+    ],
+    "clinician_questions": ["How have you been feeling since the surgery?"],
+    "client_responses": ["The knee is still a bit swollen in the evenings."],
+    "summary": "Post-op follow-up; mild evening swelling, adherent to warfarin.",
+}
+
+EMR_TEXT = (
+    "Conditions: Post-knee replacement recovery, Osteoarthritis. Medications: Warfarin 5mg daily, "
+    "Atorvastatin 20mg. Alerts: Post-op anticoagulation - monitor for bleeding."
+)
+
+QUESTIONS = [
+    {"id": "q1", "title": "Any new swelling in the leg?", "description": "Check for DVT signs.", "answer": "yes"},
+    {"id": "q2", "title": "Any unusual bleeding?", "description": "Anticoagulation safety.", "answer": "no"},
+]
+
+
+def _emr_text(i: int) -> str:
+    # A per-request detail keeps prompts distinct, so neither the cache nor
+    # single-flight can answer one request from another's completion.
+    return f"{EMR_TEXT} Last INR {2 + (i % 100) / 100:.2f} (request {i})."
+
+
+def _transcript(i: int) -> str:
+    return f"{TRANSCRIPT} See you in {i + 2} days."
+
+
+def _processed(i: int) -> Dict[str, Any]:
+    return {**PROCESSED, "summary": f"{PROCESSED['summary']} Follow-up in {i + 2} days."}
+
+
+def _questions(i: int) -> List[Dict[str, Any]]:
+    return [{**q, "description": f"{q['description']} (request {i})"} for q in QUESTIONS]
+
+
+# name -> (path, payload factory taking the request index)
+SCENARIOS: Dict[str, Tuple[str, Callable[[int], Dict[str, Any]]]] = {
+    "cards": ("/api/cards/generate", lambda i: {"user_id": f"user_00{i % 5 + 1}", "transcript_emr": _emr_text(i)}),
+    "cards-from-text": ("/api/cards/generate-from-text", lambda i: {"emr_text": _emr_text(i)}),
+    "report": ("/api/report/generate", lambda i: {"user_id": f"user_00{i % 5 + 1}", "selected_questions": _questions(i)}),
+    "tasks": ("/api/tasks/generate", lambda i: {"emr_text": _emr_text(i), "agreed_items": []}),
+    "summary": ("/api/summary/generate", lambda i: {"emr_text": _emr_text(i)}),
+    "transcript-process": ("/api/transcript/process", lambda i: {"raw_transcript": _transcript(i)}),
+    "generate-emr": ("/api/transcript/generate-emr", lambda i: {"processed": _processed(i)}),
+    "full-pipeline": (
+        "/api/transcript/full-pipeline",
+        lambda i: {"raw_transcript": _transcript(i), "stages": ["cards", "tasks", "summary"]},
+    ),
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(config: StubConfig) -> Tuple[uvicorn.Server, int]:
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("fake LLM server did not start")
+        time.sleep(0.05)
+    return server, port
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    name: str,
+    concurrency: int,
+    requests: int,
+    trace_memory: bool,
+) -> Dict[str, Any]:
+    path, payload = SCENARIOS[name]
+    latencies: List[float] = []
+    errors = 0
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with gate:
+            start = time.perf_counter()
+            resp = await client.post(path, json=payload(i))
+            latencies.append(time.perf_counter() - start)
+            if resp.status_code >= 400:
+                errors += 1
+
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+    peak_kb = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_kb = round(peak / 1024, 1)
+
+    ordered = sorted(latencies)
+    return {
+        "route": name,
+        "path": path,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2) if ordered else 0.0,
+        "throughput_rps": round(requests / wall, 2) if wall else 0.0,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "tracemalloc_peak_kb": peak_kb,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(args) -> Dict[str, Any]:
+    stub_config = StubConfig(
+        latency=args.latency,
+        tokens_per_second=args.tps,
+        failure_rate=args.failure_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+    server, port = start_stub(stub_config)
+
+    # Must be set before the app (and ai_service) is imported.
+    os.environ["FEATHERLESS_BASE_URL"] = f"http://127.0.0.1:{port}/v1"
+    os.environ["FEATHERLESS_API_KEY"] = "benchmark"
+    os.environ.setdefault("REPO_BACKEND", "memory")
+    os.environ["LLM_CONCURRENCY"] = str(args.llm_concurrency)
+    if not args.cache:
+        os.environ["LLM_CACHE_ENABLED"] = "0"
+    if not args.coalesce:
+        os.environ["LLM_COALESCE_ENABLED"] = "0"
+    sys.path.insert(0, str(BACKEND_DIR))
+    from main import app
+
+    routes = list(SCENARIOS) if args.routes == "all" else args.routes.split(",")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in routes:
+            for level in levels:
+                row = await run_scenario(client, name, level, args.requests, args.trace_memory)
+                results.append(row)
+                print(
+                    f"{name:20s} c={level:<4d} p50={row['p50_ms']:>9.1f}ms p95={row['p95_ms']:>9.1f}ms "
+                    f"p99={row['p99_ms']:>9.1f}ms rps={row['throughput_rps']:>8.2f} errors={row['errors']}"
+                )
+    server.should_exit = True
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stub": vars(stub_config),
+            "llm_concurrency": args.llm_concurrency,
+            "llm_cache": args.cache,
+            "llm_coalesce": args.coalesce,
+            "repo_backend": os.environ["REPO_BACKEND"],
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", default="all", help=f"comma-separated subset of: {','.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,16", help="client concurrency levels")
+    parser.add_argument("--requests", type=int, default=32, help="requests per route and level")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="LLM_CONCURRENCY for the app")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub first-token latency (s)")
+    parser.add_argument("--tps", type=float, default=200.0, help="stub tokens per second")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--coalesce", action="store_true", help="keep single-flight coalescing of identical prompts enabled")
+    parser.add_argument("--trace-memory", action="store_true", help="record tracemalloc peak per scenario (slower)")
+    parser.add_argument("--output", help="results JSON path (default: benchmarks/results/<commit>-<time>.json)")
+    args = parser.parse_args()
+
+    unknown = [r for r in args.routes.split(",") if args.routes != "all" and r not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown routes: {unknown}")
+
+    report = asyncio.run(run(args))
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{report['meta']['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"wrote {output}")
+
+
+if __name__ == "__main__":
+    main()
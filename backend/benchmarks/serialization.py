@@ -0,0 +1,166 @@
+"""Serialization micro-benchmark for large route payloads.
+
+Times only the step from a route's return value to response bytes, three ways:
+
+- default: plain FastAPI. response_model routes are validated and dumped to
+  bytes by pydantic; dict routes go through jsonable_encoder + JSONResponse.
+- orjson_class: FastAPI with an app-wide orjson default response class. This
+  turns off pydantic's direct dump for response_model routes.
+- current: what the route does now (FastJSONResponse for dict routes, the
+  default path for response_model routes).
+
+Payloads are synthetic and sized by --scale.
+
+Run from backend/:
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --scale 4 --iterations 200 --output out.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from src.routes.questions import Card
+from src.routes.tasks import TaskOutput
+from src.routes.transcript import ProcessTranscriptResponse
+from src.services.json_response import FastJSONResponse
+
+from .run import PROCESSED
+
+
+def _utterances(n: int) -> List[Dict[str, Any]]:
+    base = PROCESSED["utterances"]
+    return [dict(base[i % len(base)]) for i in range(n)]
+
+
+def _processed(scale: int) -> Dict[str, Any]:
+    utterances = _utterances(200 * scale)
+    return {
+        "utterances": utterances,
+        "clinician_questions": [u["text"] for u in utterances if u["speaker"] == "clinician"],
+        "client_responses": [u["text"] for u in utterances if u["speaker"] == "client"],
+        "summary": PROCESSED["summary"],
+    }
+
+
+def _cards(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": f"card-{i}",
+            "title": "Monitor for bleeding",
+            "description": "Ask about bruising, nosebleeds and dark stools while on warfarin.",
+            "rationale": "Post-op anticoagulation.",
+            "category": "Medication",
+        }
+        for i in range(n)
+    ]
+
+
+def _tasks(n: int) -> List[Dict[str, Any]]:
+    return [
+        {"id": f"task-{i}", "label": "Recheck INR", "priority": "high", "source": "AI-generated", "category": "Follow-up"}
+        for i in range(n)
+    ]
+
+
+def _users(n: int) -> Dict[str, Any]:
+    users = [
+        {"id": f"user_{i:05d}", "name": f"Patient {i}", "dateOfBirth": "1970-01-01", "role": "client"} for i in range(n)
+    ]
+    return {"users": users, "next_cursor": users[-1]["id"]}
+
+
+def _response_field(model: Any):
+    async def endpoint():  # pragma: no cover - never called
+        return None
+
+    return APIRoute("/", endpoint, response_model=model).response_field
+
+
+def _model_route(model: Any, value: Any) -> Dict[str, Callable[[], bytes]]:
+    # Mirrors fastapi.routing.serialize_response with and without dump_json.
+    field = _response_field(model)
+
+    def validated() -> Any:
+        value_, errors = field.validate(value, {}, loc=("response",))
+        assert not errors
+        return value_
+
+    default = lambda: field.serialize_json(validated(), by_alias=True)
+    return {
+        "default": default,
+        "orjson_class": lambda: orjson.dumps(field.serialize(validated(), by_alias=True)),
+        "current": default,
+    }
+
+
+def _dict_route(value: Any) -> Dict[str, Callable[[], bytes]]:
+    return {
+        "default": lambda: JSONResponse(jsonable_encoder(value)).body,
+        "orjson_class": lambda: orjson.dumps(jsonable_encoder(value)),
+        "current": lambda: FastJSONResponse(value).body,
+    }
+
+
+def build_cases(scale: int) -> Dict[str, Dict[str, Callable[[], bytes]]]:
+    processed = _processed(scale)
+    cards, tasks = _cards(50 * scale), _tasks(50 * scale)
+    full_pipeline = {
+        "processed": processed,
+        "emr_notes": "Visit notes. " * 100 * scale,
+        "timings_ms": {"process": 1200.0, "emr": 3400.0, "cards": 2100.0},
+        "cards": cards[:8],
+        "tasks": tasks[:4],
+    }
+    return {
+        "/api/transcript/full-pipeline": _dict_route(full_pipeline),
+        "/api/users": _dict_route(_users(500 * scale)),
+        "/api/transcript/process": _model_route(ProcessTranscriptResponse, ProcessTranscriptResponse(**processed)),
+        "/api/tasks/generate": _model_route(List[TaskOutput], [TaskOutput(**t) for t in tasks]),
+        "/api/cards/generate-from-text": _model_route(List[Card], cards),
+    }
+
+
+def _time(fn: Callable[[], bytes], iterations: int) -> Dict[str, float]:
+    fn()  # warm up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return {"median_us": round(statistics.median(samples), 1), "p95_us": round(sorted(samples)[int(0.95 * (len(samples) - 1))], 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="payload size multiplier")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'route':32} {'bytes':>8} {'default us':>11} {'orjson_class us':>16} {'current us':>11} {'speedup':>8}")
+    for route, case in build_cases(args.scale).items():
+        timings = {name: _time(fn, args.iterations) for name, fn in case.items()}
+        medians = {name: t["median_us"] for name, t in timings.items()}
+        speedup = medians["default"] / medians["current"] if medians["current"] else 0.0
+        size = len(case["current"]())
+        results[route] = {"bytes": size, **timings, "speedup": round(speedup, 2)}
+        print(
+            f"{route:32} {size:>8} {medians['default']:>11} {medians['orjson_class']:>16}"
+            f" {medians['current']:>11} {speedup:>7.2f}x"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"scale": args.scale, "iterations": args.iterations, "routes": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,43 @@ _here = Path(__file__).resolve().parent
 load_dotenv(_here / ".env")
 load_dotenv(_here.parent / ".env")
 
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from src.routes import users, emr, questions, report, streaming, transcript, summary, tasks
-app = FastAPI()
+from src.routes import users, emr, questions, report, streaming, transcript, summary, tasks, stats, metrics, jobs, artifacts
+from src.services.http_client import close_http_client, get_http_client
+from src.services.jobs import job_queue
+from src.services.metrics import current_route, http_request_seconds, request_spans, server_timing_header
+from src.services.repositories import get_repository
+from src.services.supabase_client import close_supabase
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Resolve REPO_BACKEND up front so a bad setting fails at startup, not on first request.
+    get_repository()
+    get_http_client()
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await close_http_client()
+    await close_supabase()
+
+
+def _route_template(request: Request) -> str:
+    # Label by path template (/api/emr/{user_id}) so metrics stay low-cardinality.
+    route = request.scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+async def label_route(request: Request):
+    """Expose the matched route template to services (LLM and stage metrics)."""
+    current_route.set(_route_template(request))
+
+
+app = FastAPI(lifespan=lifespan, dependencies=[Depends(label_route)])
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +61,33 @@ app.include_router(streaming.router)
 app.include_router(transcript.router)
 app.include_router(summary.router)
 app.include_router(tasks.router)
+app.include_router(stats.router)
+app.include_router(metrics.router)
+app.include_router(jobs.router)
+app.include_router(artifacts.router)
+
+SERVER_TIMING = os.getenv("SERVER_TIMING", "0").lower() in {"1", "true", "yes"}
+
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    route_token = current_route.set("unmatched")
+    spans_token = request_spans.set([])
+    spans = request_spans.get()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if SERVER_TIMING:
+            response.headers["Server-Timing"] = server_timing_header(spans, time.perf_counter() - start)
+        return response
+    finally:
+        http_request_seconds.observe(
+            time.perf_counter() - start, route=_route_template(request), method=request.method, status=str(status)
+        )
+        request_spans.reset(spans_token)
+        current_route.reset(route_token)
 
 @app.get("/")
 def root():
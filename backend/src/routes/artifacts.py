@@ -0,0 +1,24 @@
+"""Precomputed per-patient artifacts (cards, tasks, summary)."""
+
+from fastapi import APIRouter, HTTPException
+
+from ..services.artifacts import get_artifacts
+from ..services.json_response import FastJSONResponse
+
+router = APIRouter(prefix="/api/artifacts", tags=["artifacts"])
+
+
+@router.get("/{user_id}")
+async def get_patient_artifacts(user_id: str):
+    """Stored cards, tasks and summary for a patient, returned without waiting on the LLM.
+
+    status "fresh" means they match the current EMR. "stale" and "pending" mean a
+    background refresh was queued (refresh_job_id, pollable at /api/jobs/{id}).
+    """
+    try:
+        artifacts = await get_artifacts(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if artifacts is None:
+        raise HTTPException(status_code=404, detail="EMR not found for user")
+    return FastJSONResponse(artifacts)
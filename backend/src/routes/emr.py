@@ -1,23 +1,65 @@
 """EMR API."""
 
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
-from src.services.emr_repo import get_emr_by_user_id
+from src.services.artifacts import on_emr_changed
+from src.services.emr_repo import (
+    clamp_page_size,
+    get_emr_by_user_id,
+    get_emr_cached,
+    invalidate_emr,
+    parse_cursor,
+    parse_emr_fields,
+)
+from src.services.json_response import FastJSONResponse
+from src.services.repositories import get_repository
 
 router = APIRouter(prefix="/api/emr", tags=["emr"])
 
 
 @router.get("/{user_id}")
-def get_emr(user_id: str):
+async def get_emr(user_id: str, fields: Optional[str] = None):
+    """EMR for a user; fields=alerts,medications returns only those sections (plus user_id)."""
     try:
-        emr = get_emr_by_user_id(user_id)
+        emr = await get_emr_cached(user_id, parse_emr_fields(fields))
         if not emr:
             raise HTTPException(status_code=404, detail="EMR not found for user")
-        return emr
+        return FastJSONResponse(emr)
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/{user_id}/visit-notes")
+async def get_visit_notes(user_id: str, limit: Optional[int] = None, before: Optional[str] = None):
+    """Visit-note history, newest first. Pass next_cursor back as before= for the next page."""
+    try:
+        page = await get_repository().get_visit_notes(user_id, clamp_page_size(limit), parse_cursor(before))
+        return FastJSONResponse(page)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
+
+@router.post("/{user_id}/invalidate")
+async def invalidate_emr_cache(user_id: str):
+    """Drop the cached EMR for a user (call from whatever writes emr_reports).
+
+    If the EMR content changed, the patient's precomputed artifacts are refreshed
+    in the background.
+    """
+    invalidate_emr(user_id)
+    try:
+        job_id = await on_emr_changed(user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"ok": True, "artifacts_refresh_job_id": job_id}
+
 def get_emr(user_id: str):
    
     emr = get_emr_by_user_id(user_id)
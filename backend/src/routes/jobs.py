@@ -0,0 +1,61 @@
+"""Background generation jobs: submit, poll, cancel."""
+
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel
+
+from ..services.jobs import IdempotencyConflict, job_queue
+from ..services.json_response import FastJSONResponse
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+class SubmitJobRequest(BaseModel):
+    # One of: cards, cards_for_user, transcript, emr, report, full_pipeline, tasks, summary.
+    kind: str
+    # Same fields as the matching route's request body, e.g. {"emr_text": ...} for cards.
+    payload: Dict[str, Any] = {}
+    # "high", "normal" or "low"; defaults to the kind's lane.
+    priority: Optional[str] = None
+    idempotency_key: Optional[str] = None
+    # Receives the finished job as JSON (POST); https on a JOB_CALLBACK_HOSTS host only.
+    callback_url: Optional[str] = None
+
+
+@router.post("", status_code=202)
+@router.post("/", status_code=202, include_in_schema=False)
+async def submit_job(req: SubmitJobRequest, idempotency_key: Optional[str] = Header(None)):
+    """Queue a generation job. Resubmitting with the same Idempotency-Key returns the original job."""
+    try:
+        job = await job_queue.submit(
+            kind=req.kind,
+            payload=req.payload,
+            lane=req.priority,
+            idempotency_key=idempotency_key or req.idempotency_key,
+            callback_url=req.callback_url,
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+    return job.public()
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Job status; `result` is set once status is "succeeded", `error` once it is "failed"."""
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(job.public())
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = await job_queue.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.public()
@@ -1,10 +1,17 @@
+import json
 from typing import List, Optional
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from ..services.emr_repo import get_emr_by_user_id
-from ..services.question_generator import generate_questions, generate_questions_from_emr_text
+from ..services.emr_repo import get_emr_cached
+from ..services.question_generator import (
+    generate_questions,
+    generate_questions_batch,
+    generate_questions_from_emr_text,
+    stream_questions_from_emr_text,
+)
 
 router = APIRouter(prefix="/api/cards", tags=["cards"])
 
@@ -15,6 +22,13 @@ class GenerateQuestionRequest(BaseModel):
 class GenerateFromTextRequest(BaseModel):
     emr_text: str
 
+class BatchPatientInput(BaseModel):
+    patient_id: str
+    emr_text: str
+
+class GenerateBatchRequest(BaseModel):
+    patients: List[BatchPatientInput]
+
 class Card(BaseModel):
     id: str
     title: str
@@ -23,27 +37,72 @@ class Card(BaseModel):
     category: Optional[str] = None
 
 @router.post("/generate-from-text", response_model=List[Card])
-def generate_cards_from_text(req: GenerateFromTextRequest):
+async def generate_cards_from_text(req: GenerateFromTextRequest):
     """Generate follow-up cards from raw EMR text. Use when you have EMR content (e.g. from visit notes) without a user_id."""
     try:
-        cards = generate_questions_from_emr_text(emr_text=req.emr_text)
+        cards = await generate_questions_from_emr_text(emr_text=req.emr_text)
         return cards
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception:
         raise HTTPException(status_code=500, detail="Failed to generate cards")
 
+@router.post("/generate-from-text-stream")
+async def generate_cards_from_text_stream(req: GenerateFromTextRequest):
+    """Stream cards from raw EMR text as NDJSON, one line per card as soon as it is complete:
+    {"card": {...}}, then {"done": true, "count": n, "usage": ..., "cached": bool},
+    or {"error": str} if generation fails part way.
+    """
+    if not req.emr_text or not req.emr_text.strip():
+        raise HTTPException(status_code=400, detail="emr_text is required")
+
+    async def lines():
+        try:
+            async for kind, payload in stream_questions_from_emr_text(req.emr_text):
+                if kind == "card":
+                    yield json.dumps({"card": payload}) + "\n"
+                else:
+                    yield json.dumps({
+                        "done": True,
+                        "count": len(payload["cards"]),
+                        "usage": payload["usage"],
+                        "cached": payload["cached"],
+                    }) + "\n"
+        except ValueError as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+        except Exception:
+            yield json.dumps({"error": "Failed to generate cards"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.post("/generate", response_model=List[Card])
-def generate_cards(req: GenerateQuestionRequest):
+async def generate_cards(req: GenerateQuestionRequest):
     try:
-        emr_report = get_emr_by_user_id(req.user_id)
+        emr_report = await get_emr_cached(req.user_id)
         if not emr_report:
             raise HTTPException(status_code=404, detail="EMR not found for user")
 
-        return generate_questions(emr_report, req.transcript_emr)
+        return await generate_questions(emr_report, req.transcript_emr)
     except HTTPException:
         raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception:
-        raise HTTPException(status_code=500, detail="Failed to generate cards")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to generate cards")
+
+@router.post("/generate-batch")
+async def generate_cards_batch(req: GenerateBatchRequest):
+    """Generate cards for many patients in one call.
+
+    Streams NDJSON, one line per patient as soon as its cards are ready:
+    {"patient_id": ..., "cards": [...] | null, "error": str | null}.
+    """
+    if not req.patients:
+        raise HTTPException(status_code=400, detail="patients is required")
+
+    async def lines():
+        items = [(p.patient_id, p.emr_text) for p in req.patients]
+        async for patient_id, cards, error in generate_questions_batch(items):
+            yield json.dumps({"patient_id": patient_id, "cards": cards, "error": error}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
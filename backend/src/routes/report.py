@@ -3,8 +3,9 @@ from typing import List, Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from ..services.emr_repo import get_emr_by_user_id
-from ..services.report_generator import generate_report
+from ..services.emr_repo import get_emr_cached
+from ..services.report_generator import build_report_messages, generate_report
+from ..services.sse import completion_events, sse_response
 
 router = APIRouter(prefix="/api/report", tags=["report"])
 
@@ -24,13 +25,13 @@ class GenerateReportResponse(BaseModel):
     report: str
 
 @router.post("/generate", response_model=GenerateReportResponse)
-def generate_report_endpoint(req: GenerateReportRequest):
+async def generate_report_endpoint(req: GenerateReportRequest):
     try:
-        emr_report = get_emr_by_user_id(req.user_id)
+        emr_report = await get_emr_cached(req.user_id)
         if not emr_report:
             raise HTTPException(status_code=404, detail="EMR not found for user")
 
-        report_text = generate_report(
+        report_text = await generate_report(
             emr_report=emr_report,
             selected_questions=[q.dict() for q in req.selected_questions],
         )
@@ -40,4 +41,26 @@ def generate_report_endpoint(req: GenerateReportRequest):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception:
-        raise HTTPException(status_code=500, detail="Failed to generate report")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to generate report")
+
+
+@router.post("/generate-stream")
+async def generate_report_stream(req: GenerateReportRequest):
+    """Stream the report as Server-Sent Events: `token` events, then one `done` event with text and usage."""
+    try:
+        emr_report = await get_emr_cached(req.user_id)
+        if not emr_report:
+            raise HTTPException(status_code=404, detail="EMR not found for user")
+
+        messages = build_report_messages(
+            emr_report=emr_report,
+            selected_questions=[q.dict() for q in req.selected_questions],
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to generate report")
+
+    return sse_response(completion_events(messages, generator="report"))
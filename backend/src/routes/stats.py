@@ -0,0 +1,34 @@
+"""Runtime stats for connection pools and caches."""
+
+from fastapi import APIRouter
+
+from ..services.ai_service import llm_singleflight
+from ..services.artifacts import artifact_stats
+from ..services.assemblyai import token_stats
+from ..services.emr_repo import emr_cache, emr_projection_cache
+from ..services.jobs import job_queue
+from ..services.llm_cache import llm_cache
+from ..services.repositories import get_repository
+from ..services.resilience import breaker_stats
+from ..services.supabase_client import pool_stats
+from ..services.users_repo import user_cache
+
+router = APIRouter(prefix="/api/stats", tags=["stats"])
+
+
+@router.get("")
+@router.get("/")
+def get_stats():
+    return {
+        "repository": get_repository().name,
+        "supabase": pool_stats(),
+        "llm_cache": llm_cache.stats() if llm_cache else None,
+        "llm_circuits": breaker_stats(),
+        "llm_singleflight": llm_singleflight.stats(),
+        "emr_cache": emr_cache.stats(),
+        "emr_projection_cache": emr_projection_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "jobs": job_queue.stats(),
+        "assemblyai_tokens": token_stats(),
+        "artifacts": artifact_stats(),
+    }
@@ -2,14 +2,15 @@
 
 import os
 
-import httpx
 from fastapi import APIRouter, HTTPException
 
+from ..services.assemblyai import TokenError, get_streaming_token as fetch_streaming_token
+
 router = APIRouter(prefix="/api/streaming", tags=["streaming"])
 
 
 @router.get("/token")
-def get_streaming_token(expires_in_seconds: int = 300):
+async def get_streaming_token(expires_in_seconds: int = 300):
     """Return a temporary AssemblyAI token for WebSocket streaming.
 
     Token is used to connect to wss://streaming.assemblyai.com/v3/ws
@@ -21,27 +22,9 @@ def get_streaming_token(expires_in_seconds: int = 300):
             status_code=500,
             detail="ASSEMBLYAI_API_KEY not configured",
         )
-    expires = min(max(60, expires_in_seconds), 600)  # 60–600 seconds
-    url = f"https://streaming.assemblyai.com/v3/token?expires_in_seconds={expires}"
     try:
-        with httpx.Client() as client:
-            resp = client.get(url, headers={"Authorization": api_key}, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            token = data.get("token")
-            if not token:
-                raise HTTPException(status_code=500, detail="No token in response")
-            return {"token": token, "expires_in": expires}
-    except httpx.HTTPStatusError as e:
-        body = e.response.text
-        if e.response.status_code == 402:
-            raise HTTPException(
-                status_code=402,
-                detail="AssemblyAI streaming requires an upgraded account. Add a payment method at app.assemblyai.com",
-            ) from e
-        raise HTTPException(
-            status_code=e.response.status_code,
-            detail=body or "Failed to get streaming token",
-        ) from e
+        return await fetch_streaming_token(api_key, expires_in_seconds)
+    except TokenError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
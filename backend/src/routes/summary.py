@@ -5,7 +5,12 @@ from typing import Any, Dict, List, Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from ..services.progress_summary_generator import generate_progress_summary
+from ..services.progress_summary_generator import (
+    NO_CONTEXT_SUMMARY,
+    build_progress_summary_messages,
+    generate_progress_summary,
+)
+from ..services.sse import completion_events, sse_response, static_events
 
 router = APIRouter(prefix="/api/summary", tags=["summary"])
 
@@ -26,14 +31,27 @@ class GenerateSummaryResponse(BaseModel):
 
 
 @router.post("/generate", response_model=GenerateSummaryResponse)
-def generate_summary_endpoint(req: GenerateSummaryRequest):
+async def generate_summary_endpoint(req: GenerateSummaryRequest):
     """Generate AI progress summary from EMR text and agreed items."""
     try:
         agreed = [a.model_dump() for a in (req.agreed_items or [])]
-        summary = generate_progress_summary(
+        summary = await generate_progress_summary(
             emr_text=req.emr_text,
             agreed_items=agreed if agreed else None,
         )
         return GenerateSummaryResponse(summary=summary)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
+
+
+@router.post("/generate-stream")
+async def generate_summary_stream(req: GenerateSummaryRequest):
+    """Stream the progress summary as Server-Sent Events (`token` events, then `done`)."""
+    agreed = [a.model_dump() for a in (req.agreed_items or [])]
+    messages = build_progress_summary_messages(
+        emr_text=req.emr_text,
+        agreed_items=agreed if agreed else None,
+    )
+    if messages is None:
+        return sse_response(static_events(NO_CONTEXT_SUMMARY))
+    return sse_response(completion_events(messages, generator="summary"))
@@ -30,11 +30,11 @@ class TaskOutput(BaseModel):
 
 
 @router.post("/generate", response_model=List[TaskOutput])
-def generate_tasks_endpoint(req: GenerateTasksRequest):
+async def generate_tasks_endpoint(req: GenerateTasksRequest):
     """Generate clinician tasks (Follow-up, Medication, Screening, Routine) from patient context."""
     try:
         agreed = [a.model_dump() for a in (req.agreed_items or [])]
-        tasks = generate_clinician_tasks(
+        tasks = await generate_clinician_tasks(
             emr_text=req.emr_text or "",
             agreed_items=agreed,
         )
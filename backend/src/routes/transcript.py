@@ -1,12 +1,22 @@
 """Transcript processing and EMR generation from conversation."""
 
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-from ..services.transcript_processor import process_transcript
-from ..services.transcript_to_emr import generate_emr_from_transcript
+from ..services.json_response import FastJSONResponse
+from ..services.transcript_processor import (
+    SessionLimitError,
+    create_session,
+    discard_session,
+    get_session,
+    pop_session,
+    process_transcript,
+)
+from ..services.pipeline import VISIT_DOWNSTREAM_STAGES, run_pipeline, visit_pipeline_stages
+from ..services.sse import completion_events, sse_response
+from ..services.transcript_to_emr import build_emr_messages, generate_emr_from_transcript
 
 router = APIRouter(prefix="/api/transcript", tags=["transcript"])
 
@@ -22,6 +32,18 @@ class ProcessTranscriptResponse(BaseModel):
     summary: str
 
 
+class FullPipelineRequest(BaseModel):
+    raw_transcript: str = ""
+    # When set, raw_transcript is only the tail not yet sent to /sessions/{id}/append.
+    session_id: Optional[str] = None
+    # Extra stages to run in the same pass: any of "cards", "tasks", "summary".
+    stages: List[str] = []
+
+
+class AppendTranscriptRequest(BaseModel):
+    text: str
+
+
 class GenerateEmrRequest(BaseModel):
     processed: Dict[str, Any]
 
@@ -31,10 +53,10 @@ class GenerateEmrResponse(BaseModel):
 
 
 @router.post("/process", response_model=ProcessTranscriptResponse)
-def process_transcript_endpoint(req: ProcessTranscriptRequest):
+async def process_transcript_endpoint(req: ProcessTranscriptRequest):
     """Separate clinician vs client utterances and structure the transcript."""
     try:
-        result = process_transcript(raw_transcript=req.raw_transcript)
+        result = await process_transcript(raw_transcript=req.raw_transcript)
         return ProcessTranscriptResponse(
             utterances=result.get("utterances", []),
             clinician_questions=result.get("clinician_questions", []),
@@ -48,26 +70,95 @@ def process_transcript_endpoint(req: ProcessTranscriptRequest):
 
 
 @router.post("/generate-emr", response_model=GenerateEmrResponse)
-def generate_emr_endpoint(req: GenerateEmrRequest):
+async def generate_emr_endpoint(req: GenerateEmrRequest):
     """Generate EMR visit notes from processed (clinician/client labeled) transcript."""
     try:
-        emr = generate_emr_from_transcript(processed=req.processed)
+        emr = await generate_emr_from_transcript(processed=req.processed)
         return GenerateEmrResponse(emr_notes=emr)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@router.post("/generate-emr-stream")
+async def generate_emr_stream(req: GenerateEmrRequest):
+    """Stream EMR visit notes as Server-Sent Events (`token` events, then `done` with text and usage)."""
+    try:
+        messages = build_emr_messages(processed=req.processed)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    return sse_response(completion_events(messages, generator="emr"))
+
+
+@router.post("/sessions")
+async def create_transcript_session():
+    """Start a live-recording session; append text as it arrives so chunks are processed early."""
+    try:
+        session = create_session()
+    except SessionLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e)) from e
+    return {"session_id": session.id}
+
+
+@router.post("/sessions/{session_id}/append")
+async def append_transcript(session_id: str, req: AppendTranscriptRequest):
+    session = get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Transcript session not found")
+    try:
+        chunks_started = session.append(req.text)
+    except SessionLimitError as e:
+        discard_session(session_id)
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    return {"session_id": session_id, "chunks_started": chunks_started}
+
+
 @router.post("/full-pipeline")
-def full_pipeline(req: ProcessTranscriptRequest):
-    """Process transcript and generate EMR in one call. Returns both."""
+async def full_pipeline(req: FullPipelineRequest):
+    """Process transcript and generate EMR in one call. Returns both.
+
+    With session_id, chunks already appended to that session are reused and only
+    the remaining tail (raw_transcript) is processed here. Requested extra stages
+    run concurrently with EMR generation; per-stage timings are in timings_ms.
+    """
+    unknown = [name for name in req.stages if name not in VISIT_DOWNSTREAM_STAGES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown pipeline stages: {unknown}")
+    session = None
+    if req.session_id:
+        session = get_session(req.session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Transcript session not found")
+        if session.in_use:
+            raise HTTPException(status_code=409, detail="Transcript session is already being finalized")
+        session.in_use = True
     try:
-        processed = process_transcript(raw_transcript=req.raw_transcript)
-        emr = generate_emr_from_transcript(processed=processed)
-        return {
-            "processed": processed,
-            "emr_notes": emr,
+        stages = visit_pipeline_stages(
+            raw_transcript=req.raw_transcript,
+            session=session,
+            downstream=tuple(req.stages),
+        )
+        result = await run_pipeline(stages)
+        if session is not None:
+            # Only drop the session once it produced a result; on failure the client can retry.
+            pop_session(session.id)
+        response = {
+            "processed": result.results["process"],
+            "emr_notes": result.results["emr"],
+            "timings_ms": result.timings_ms,
         }
+        for name in dict.fromkeys(req.stages):
+            response[name] = result.results.get(name)
+        if result.errors:
+            response["errors"] = result.errors
+        return FastJSONResponse(response)
+    except SessionLimitError as e:
+        if session is not None:
+            discard_session(session.id)
+        raise HTTPException(status_code=413, detail=str(e)) from e
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
+    finally:
+        if session is not None:
+            session.in_use = False
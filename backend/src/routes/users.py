@@ -1,27 +1,47 @@
 """Users API."""
 
-from fastapi import APIRouter, HTTPException
-from src.services.users_repo import get_users, get_user_by_id
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from src.services.etag import etag_json_response
+from src.services.repositories import get_repository
+from src.services.users_repo import clamp_users_limit, get_user_cached, parse_user_ids, parse_users_cursor
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 
 @router.get("")
 @router.get("/")
-def list_users():
+async def list_users(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    ids: Optional[str] = None,
+):
+    """Users ordered by id, one page at a time (pass next_cursor back as cursor=).
+
+    ids=a,b,c instead looks those users up in one query. Responses carry an ETag;
+    send it as If-None-Match to get 304 when nothing changed.
+    """
     try:
-        return {"users": get_users()}
+        if ids is not None:
+            users = await get_repository().get_users_by_ids(parse_user_ids(ids))
+            return etag_json_response(request, {"users": users})
+        page = await get_repository().get_users_page(clamp_users_limit(limit), parse_users_cursor(cursor))
+        return etag_json_response(request, page)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/{user_id}")
-def get_user(user_id: str):
+async def get_user(user_id: str, request: Request):
     try:
-        user = get_user_by_id(user_id)
+        user = await get_user_cached(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        return user
+        return etag_json_response(request, user)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,33 +1,304 @@
 # connect to featherless AI
 
+import asyncio
 import os
-import threading
-from openai import OpenAI
-from typing import List, Dict
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from openai import AsyncOpenAI
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
 from dotenv import load_dotenv
 
+from .llm_cache import llm_cache, make_cache_key
+from .metrics import (
+    add_span,
+    current_route,
+    llm_queue_wait_seconds,
+    llm_request_seconds,
+    llm_requests_total,
+    llm_resilience_events_total,
+    record_llm_usage,
+)
+# Featherless concurrency is an account-wide budget of units; each model's per-request
+# cost and the budget (LLM_CONCURRENCY_UNITS) live in model_routing.
+from .model_routing import DEFAULT_MODEL, LLM_CONCURRENCY_UNITS, TIERS, get_route, model_for, units_for
+from .resilience import call_with_policy
+from .singleflight import SingleFlight
+
 load_dotenv()
 FEATHERLESS_API_KEY = os.getenv("FEATHERLESS_API_KEY")
 
 if not FEATHERLESS_API_KEY:
     raise ValueError("FEATHERLESS_API_KEY is not set")
 
-client = OpenAI(base_url="https://api.featherless.ai/v1", api_key=FEATHERLESS_API_KEY)
+TEMPERATURE = 0.5
+
+# Overridable so benchmarks can point at a local OpenAI-compatible stub.
+FEATHERLESS_BASE_URL = os.getenv("FEATHERLESS_BASE_URL", "https://api.featherless.ai/v1")
+
+# Retries, timeouts and fallbacks are handled by resilience.call_with_policy.
+async_client = AsyncOpenAI(base_url=FEATHERLESS_BASE_URL, api_key=FEATHERLESS_API_KEY, max_retries=0)
+
+
+class FairLimiter:
+    """Async limiter over a budget of units that admits waiters strictly in arrival order.
+
+    Each acquire() takes `units` of the budget. A waiter that does not fit yet holds
+    back the ones behind it, so a large request is not starved by a stream of small ones.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0  # units held
+        self._waiters: Deque[Tuple[asyncio.Future, int]] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, units: int = 1) -> None:
+        units = min(units, self.limit)
+        if not self._waiters and self.in_flight + units <= self.limit:
+            self.in_flight += units
+            return
+        fut = asyncio.get_running_loop().create_future()
+        entry = (fut, units)
+        self._waiters.append(entry)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Units were handed over just before cancellation; pass them on.
+                self.release(units)
+            else:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                # A cancelled head waiter may have been holding back smaller ones.
+                self._wake()
+            raise
+
+    def release(self, units: int = 1) -> None:
+        self.in_flight -= min(units, self.limit)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters:
+            fut, units = self._waiters[0]
+            if fut.done():
+                # Cancelled while queued; its acquire() is cleaning up.
+                self._waiters.popleft()
+                continue
+            if self.in_flight + units > self.limit:
+                return
+            self._waiters.popleft()
+            self.in_flight += units
+            fut.set_result(None)
+
+    async def __aenter__(self) -> "FairLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+# One budget for the whole Featherless account, shared by every model, including
+# resilience fallbacks and hedges: each call holds units_for(model) while it runs.
+llm_limiter = FairLimiter(LLM_CONCURRENCY_UNITS)
+
+
+# Identical prompts already in flight share one completion (covers the window before
+# the first result is cached). Keyed like llm_cache, whether or not the cache is on.
+# LLM_COALESCE_ENABLED=0 gives every request its own call (load tests).
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "1").lower() not in {"0", "false", "no"}
+llm_singleflight = SingleFlight()
+
+
+def _cache_lookup(messages: List[Dict[str, str]], model: str, max_tokens: int) -> Tuple[Optional[str], Optional[str]]:
+    if llm_cache is None:
+        return None, None
+    key = make_cache_key(messages, model, max_tokens, TEMPERATURE)
+    return key, llm_cache.get(key)
 
-# Serialize all AI calls to stay within Featherless concurrency limit (4 units = 1 request at a time)
-_ai_lock = threading.Lock()
 
+@contextmanager
+def _llm_call_timer(labels: Dict[str, str]) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        llm_requests_total.inc(outcome="error", **labels)
+        raise
+    else:
+        llm_requests_total.inc(outcome="ok", **labels)
+    finally:
+        elapsed = time.perf_counter() - start
+        llm_request_seconds.observe(elapsed, **labels)
+        add_span("llm", elapsed)
 
-def send_msg(
+
+@asynccontextmanager
+async def _llm_slot(model: str, labels: Dict[str, str]) -> AsyncIterator[None]:
+    """Wait for the model's concurrency units, recording the queue wait separately from model time."""
+    units = units_for(model)
+    wait_start = time.perf_counter()
+    await llm_limiter.acquire(units)
+    try:
+        waited = time.perf_counter() - wait_start
+        llm_queue_wait_seconds.observe(waited, **labels)
+        add_span("llm-queue", waited)
+        yield
+    finally:
+        llm_limiter.release(units)
+
+
+async def send_msg_async(
     messages: List[Dict[str, str]],
-    model: str = "deepseek-ai/DeepSeek-V3-0324",
-    max_tokens: int = 500,
+    model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    generator: str = "unknown",
 ) -> str:
-    with _ai_lock:
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            temperature=0.5,
-            max_tokens=max_tokens,
-        )
-        return response.choices[0].message.content
\ No newline at end of file
+    """Send a chat completion without blocking the event loop.
+
+    Identical prompts are answered from llm_cache; otherwise waits in a FIFO
+    queue for the model's share of the account's concurrency units, joining an identical call that
+    is already in flight instead of starting another. model and max_tokens default
+    to the generator's entry in model_routing.ROUTES. Deadlines, retries and
+    fallback follow the generator's policy in resilience.py. `generator` labels metrics.
+    """
+    model = model or model_for(generator)
+    max_tokens = max_tokens or get_route(generator).max_tokens
+    labels = {"route": current_route.get(), "generator": generator, "model": model}
+    key = None
+    if use_cache and llm_cache is not None:
+        if llm_cache.has_disk_tier:
+            key, cached = await asyncio.to_thread(_cache_lookup, messages, model, max_tokens)
+        else:
+            key, cached = _cache_lookup(messages, model, max_tokens)
+        if cached is not None:
+            llm_requests_total.inc(outcome="cache_hit", **labels)
+            return cached
+
+    async def attempt(target: str, timeout: float) -> Tuple[str, str]:
+        call_labels = {**labels, "model": target}
+        async with _llm_slot(target, call_labels):
+            with _llm_call_timer(call_labels):
+                response = await async_client.chat.completions.create(
+                    model=target,
+                    messages=messages,
+                    temperature=TEMPERATURE,
+                    max_tokens=max_tokens,
+                    timeout=timeout,
+                )
+        record_llm_usage(generator, target, response.usage)
+        return target, response.choices[0].message.content
+
+    async def complete() -> str:
+        used_model, content = await call_with_policy(attempt, model, generator)
+        # Fallback answers are not cached under the primary model's key.
+        if key is not None and used_model == model:
+            if llm_cache.has_disk_tier:
+                await asyncio.to_thread(llm_cache.set, key, content)
+            else:
+                llm_cache.set(key, content)
+        return content
+
+    if not use_cache or not LLM_COALESCE_ENABLED:
+        return await complete()
+    flight_key = key or make_cache_key(messages, model, max_tokens, TEMPERATURE)
+    if llm_singleflight.has(flight_key):
+        llm_requests_total.inc(outcome="coalesced", **labels)
+    return await llm_singleflight.do(flight_key, complete)
+
+
+async def stream_msg_async(
+    messages: List[Dict[str, str]],
+    model: Optional[str] = None,
+    max_tokens: Optional[int] = None,
+    use_cache: bool = True,
+    generator: str = "unknown",
+) -> AsyncIterator[Dict[str, Any]]:
+    """Stream a chat completion as it is generated.
+
+    Yields {"type": "token", "text": ...} for each content delta and finishes with
+    {"type": "done", "text": <full text>, "usage": {...} | None, "cached": bool}.
+    The retry policy covers opening the stream; once tokens flow it is not retried.
+    """
+    model = model or model_for(generator)
+    max_tokens = max_tokens or get_route(generator).max_tokens
+    labels = {"route": current_route.get(), "generator": generator, "model": model}
+    key = None
+    if use_cache and llm_cache is not None:
+        key, cached = await asyncio.to_thread(_cache_lookup, messages, model, max_tokens)
+        if cached is not None:
+            llm_requests_total.inc(outcome="cache_hit", **labels)
+            yield {"type": "token", "text": cached}
+            yield {"type": "done", "text": cached, "usage": None, "cached": True}
+            return
+
+    async def open_stream(target: str, timeout: float) -> Tuple[str, AsyncExitStack, Any]:
+        # Returns with the model's concurrency units held; the caller releases it via the stack.
+        call_labels = {**labels, "model": target}
+        stack = AsyncExitStack()
+        await stack.enter_async_context(_llm_slot(target, call_labels))
+        try:
+            stream = await async_client.chat.completions.create(
+                model=target,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+                timeout=timeout,
+            )
+        except BaseException:
+            llm_requests_total.inc(outcome="error", **call_labels)
+            await stack.aclose()
+            raise
+        return target, stack, stream
+
+    used_model, stack, stream = await call_with_policy(open_stream, model, generator)
+    parts: List[str] = []
+    usage = None
+    async with stack:
+        with _llm_call_timer({**labels, "model": used_model}):
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage.model_dump()
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield {"type": "token", "text": delta}
+
+    record_llm_usage(generator, used_model, usage)
+    content = "".join(parts)
+    if key is not None and used_model == model:
+        await asyncio.to_thread(llm_cache.set, key, content)
+    yield {"type": "done", "text": content, "usage": usage, "cached": False}
+
+
+T = TypeVar("T")
+
+
+async def send_json_async(
+    messages: List[Dict[str, str]],
+    parse: Callable[[str], T],
+    generator: str,
+    max_tokens: Optional[int] = None,
+) -> T:
+    """send_msg_async for JSON generators: parse the reply, and if a small-tier model's
+    output fails validation (parse raises ValueError), ask the large model instead."""
+    model = model_for(generator)
+    content = await send_msg_async(messages, model=model, max_tokens=max_tokens, generator=generator)
+    try:
+        return parse(content)
+    except ValueError:
+        large = TIERS["large"].model
+        if model == large:
+            raise
+        llm_resilience_events_total.inc(generator=generator, model=large, event="validation_fallback")
+    content = await send_msg_async(messages, model=large, max_tokens=max_tokens, generator=generator)
+    return parse(content)
@@ -0,0 +1,258 @@
+"""Precomputed per-patient artifacts: question cards, clinician tasks, progress summary.
+
+Opening a patient used to run three LLM calls back to back. Instead the
+artifacts are generated once per EMR version and stored with the hash of the
+EMR they came from:
+
+- get_artifacts() returns the stored set straight away. When the EMR hash has
+  changed (or nothing is stored yet) it also queues a background refresh on the
+  job queue and marks the result "stale" / "pending".
+- refresh_artifacts() is the job handler: it regenerates all three concurrently
+  and saves them under the new hash. An artifact that fails keeps its last good
+  value (listed in errors), and retries for that EMR version back off
+  exponentially (ARTIFACT_RETRY_BASE_SECONDS, ARTIFACT_RETRY_MAX_SECONDS).
+
+ARTIFACT_STORE=memory (default) or sqlite (ARTIFACT_SQLITE_PATH) selects storage.
+Artifacts are built from the EMR alone; items agreed during a visit still go
+through /api/tasks/generate and /api/summary/generate.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .emr_repo import format_emr_report_as_text, get_emr_cached
+from .progress_summary_generator import generate_progress_summary
+from .question_generator import generate_questions_from_emr_text
+from .task_generator import generate_clinician_tasks
+
+ARTIFACT_KINDS = ("cards", "tasks", "summary")
+ARTIFACT_RETRY_BASE_SECONDS = float(os.getenv("ARTIFACT_RETRY_BASE_SECONDS", "30"))
+ARTIFACT_RETRY_MAX_SECONDS = float(os.getenv("ARTIFACT_RETRY_MAX_SECONDS", "900"))
+
+
+def emr_content_hash(emr_report: Dict[str, Any]) -> str:
+    """Stable hash of an EMR's content; changes whenever any field does."""
+    return hashlib.sha256(json.dumps(emr_report, sort_keys=True, default=str).encode()).hexdigest()
+
+
+@dataclass
+class ArtifactSet:
+    user_id: str
+    emr_hash: str
+    cards: Optional[List[Dict[str, Any]]] = None
+    tasks: Optional[List[Dict[str, Any]]] = None
+    summary: Optional[str] = None
+    # kind -> error message for artifacts that failed to generate
+    errors: Dict[str, str] = field(default_factory=dict)
+    generated_at: float = field(default_factory=time.time)
+
+
+class MemoryArtifactStore:
+    name = "memory"
+
+    def __init__(self):
+        self._sets: Dict[str, ArtifactSet] = {}
+
+    def get(self, user_id: str) -> Optional[ArtifactSet]:
+        return self._sets.get(user_id)
+
+    def save(self, artifacts: ArtifactSet) -> None:
+        self._sets[artifacts.user_id] = artifacts
+
+    def count(self) -> int:
+        return len(self._sets)
+
+
+class SQLiteArtifactStore:
+    """Artifact sets as JSON rows in a local SQLite file, so they survive restarts."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS artifacts (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            self._conn.commit()
+
+    def get(self, user_id: str) -> Optional[ArtifactSet]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM artifacts WHERE user_id = ?", (user_id,)).fetchone()
+        return ArtifactSet(**json.loads(row[0])) if row else None
+
+    def save(self, artifacts: ArtifactSet) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (user_id, data) VALUES (?, ?)",
+                (artifacts.user_id, json.dumps(asdict(artifacts))),
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            (n,) = self._conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()
+        return n
+
+
+def _build_store():
+    backend = os.getenv("ARTIFACT_STORE", "memory").strip().lower()
+    if backend == "memory":
+        return MemoryArtifactStore()
+    if backend == "sqlite":
+        default_path = Path(__file__).resolve().parent.parent / "data" / "artifacts.sqlite3"
+        return SQLiteArtifactStore(os.getenv("ARTIFACT_SQLITE_PATH") or str(default_path))
+    raise RuntimeError(f"Unknown ARTIFACT_STORE: {backend!r} (expected memory or sqlite)")
+
+
+artifact_store = _build_store()
+# user_id -> (emr_hash, job_id) of the refresh queued for that patient
+_pending: Dict[str, tuple] = {}
+# user_id -> (emr_hash, failed refreshes in a row, monotonic time before which no retry is queued)
+_backoff: Dict[str, tuple] = {}
+_counters = {"fresh": 0, "stale": 0, "missing": 0, "refreshes": 0, "retries_deferred": 0}
+
+
+async def _generate(kind: str, emr_text: str) -> Any:
+    if kind == "cards":
+        return await generate_questions_from_emr_text(emr_text=emr_text)
+    if kind == "tasks":
+        return await generate_clinician_tasks(emr_text=emr_text, agreed_items=[])
+    return await generate_progress_summary(emr_text=emr_text, agreed_items=[])
+
+
+async def refresh_artifacts(user_id: str) -> Dict[str, Any]:
+    """Regenerate a patient's artifacts from the current EMR unless they are already up to date."""
+    emr_report = await get_emr_cached(user_id)
+    if not emr_report:
+        raise ValueError("EMR not found for user")
+    emr_hash = emr_content_hash(emr_report)
+    current = await asyncio.to_thread(artifact_store.get, user_id)
+    if current is not None and current.emr_hash == emr_hash and not current.errors:
+        return {"user_id": user_id, "emr_hash": emr_hash, "regenerated": False}
+
+    kinds = list(ARTIFACT_KINDS)
+    if current is not None and current.emr_hash == emr_hash:
+        # A retry for the same EMR only redoes the artifacts that failed.
+        kinds = [kind for kind in ARTIFACT_KINDS if kind in current.errors]
+    emr_text = format_emr_report_as_text(emr_report)
+    results = await asyncio.gather(*(_generate(kind, emr_text) for kind in kinds), return_exceptions=True)
+    artifacts = ArtifactSet(user_id=user_id, emr_hash=emr_hash)
+    if current is not None:
+        for kind in ARTIFACT_KINDS:
+            setattr(artifacts, kind, getattr(current, kind))
+    for kind, result in zip(kinds, results):
+        if isinstance(result, asyncio.CancelledError):
+            raise result
+        if isinstance(result, Exception):
+            # The previous value (if any) stays in place until a retry succeeds.
+            artifacts.errors[kind] = str(result) if isinstance(result, ValueError) else f"Failed to generate {kind}"
+        else:
+            setattr(artifacts, kind, result)
+    await asyncio.to_thread(artifact_store.save, artifacts)
+    _counters["refreshes"] += 1
+    _record_outcome(user_id, emr_hash, failed=bool(artifacts.errors))
+    if _pending.get(user_id, ("",))[0] == emr_hash:
+        del _pending[user_id]
+    return {"user_id": user_id, "emr_hash": emr_hash, "regenerated": True, "errors": artifacts.errors}
+
+
+def _record_outcome(user_id: str, emr_hash: str, failed: bool) -> None:
+    if not failed:
+        _backoff.pop(user_id, None)
+        return
+    previous = _backoff.get(user_id)
+    failures = previous[1] + 1 if previous is not None and previous[0] == emr_hash else 1
+    delay = min(ARTIFACT_RETRY_MAX_SECONDS, ARTIFACT_RETRY_BASE_SECONDS * 2 ** (failures - 1))
+    _backoff[user_id] = (emr_hash, failures, time.monotonic() + delay)
+
+
+def _retry_deferred(user_id: str, emr_hash: str) -> bool:
+    """True while a failed refresh of this EMR version is backing off; a new version retries at once."""
+    entry = _backoff.get(user_id)
+    return entry is not None and entry[0] == emr_hash and time.monotonic() < entry[2]
+
+
+async def schedule_refresh(user_id: str, emr_hash: str) -> Optional[str]:
+    """Queue a background refresh unless one for this EMR version is already queued or
+    running, or the last one failed and its retry delay has not passed."""
+    # Imported here: jobs registers refresh_artifacts as a job kind.
+    from .jobs import FINISHED, job_queue
+
+    pending = _pending.get(user_id)
+    if pending is not None and pending[0] == emr_hash:
+        job = job_queue.get(pending[1])
+        if job is not None and job.status not in FINISHED:
+            return job.id
+    if _retry_deferred(user_id, emr_hash):
+        _counters["retries_deferred"] += 1
+        return None
+    try:
+        job = await job_queue.submit("artifacts", {"user_id": user_id})
+    except RuntimeError:
+        return None  # queue not running (e.g. shutting down); the next read retries
+    _pending[user_id] = (emr_hash, job.id)
+    return job.id
+
+
+async def get_artifacts(user_id: str) -> Optional[Dict[str, Any]]:
+    """Stored artifacts for a patient, or None when the patient has no EMR.
+
+    status is "fresh" when they match the current EMR, "stale" when they are for
+    an older EMR or some failed (refresh_job_id is None while a retry backs off),
+    and "pending" when nothing is stored yet.
+    """
+    emr_report = await get_emr_cached(user_id)
+    if not emr_report:
+        return None
+    emr_hash = emr_content_hash(emr_report)
+    stored = await asyncio.to_thread(artifact_store.get, user_id)
+    job_id = None
+    if stored is None:
+        status = "pending"
+        _counters["missing"] += 1
+        job_id = await schedule_refresh(user_id, emr_hash)
+    elif stored.emr_hash != emr_hash or stored.errors:
+        status = "stale"
+        _counters["stale"] += 1
+        job_id = await schedule_refresh(user_id, emr_hash)
+    else:
+        status = "fresh"
+        _counters["fresh"] += 1
+    out: Dict[str, Any] = {"user_id": user_id, "emr_hash": emr_hash, "status": status, "refresh_job_id": job_id}
+    if stored is None:
+        out.update({kind: None for kind in ARTIFACT_KINDS}, errors={}, generated_at=None)
+    else:
+        out.update({kind: getattr(stored, kind) for kind in ARTIFACT_KINDS})
+        out.update(errors=stored.errors, generated_at=stored.generated_at)
+    return out
+
+
+async def on_emr_changed(user_id: str) -> Optional[str]:
+    """Re-read the EMR and queue a refresh if its content changed; call after invalidate_emr."""
+    emr_report = await get_emr_cached(user_id)
+    if not emr_report:
+        return None
+    emr_hash = emr_content_hash(emr_report)
+    stored = await asyncio.to_thread(artifact_store.get, user_id)
+    if stored is not None and stored.emr_hash == emr_hash and not stored.errors:
+        return None
+    return await schedule_refresh(user_id, emr_hash)
+
+
+def artifact_stats() -> Dict[str, Any]:
+    return {
+        "store": artifact_store.name,
+        "patients": artifact_store.count(),
+        "pending_refreshes": len(_pending),
+        "backing_off": len(_backoff),
+        **_counters,
+    }
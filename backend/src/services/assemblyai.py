@@ -0,0 +1,72 @@
+"""AssemblyAI temporary streaming tokens.
+
+Tokens are fetched over the shared keep-alive client (http_client.py), so each
+request skips the TCP/TLS handshake. They are never cached or shared: a v3
+temporary token is good for one streaming session, so every caller gets its own.
+
+ASSEMBLYAI_STREAMING_BASE_URL points the client at a local mock for testing
+(benchmarks/fake_llm_server.py serves /v3/token).
+"""
+
+import os
+from typing import Any, Dict
+
+import httpx
+
+from .http_client import get_http_client
+
+ASSEMBLYAI_STREAMING_BASE_URL = os.getenv("ASSEMBLYAI_STREAMING_BASE_URL", "https://streaming.assemblyai.com").rstrip("/")
+MIN_EXPIRES, MAX_EXPIRES = 60, 600
+
+
+class TokenError(Exception):
+    """Upstream refused or returned no token; status_code is what the route should answer."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+_stats = {"fetched": 0, "failed": 0}
+
+
+def clamp_expires(expires_in_seconds: int) -> int:
+    return min(max(MIN_EXPIRES, expires_in_seconds), MAX_EXPIRES)
+
+
+async def _fetch(api_key: str, expires: int) -> Dict[str, Any]:
+    url = f"{ASSEMBLYAI_STREAMING_BASE_URL}/v3/token"
+    try:
+        resp = await get_http_client().get(
+            url, params={"expires_in_seconds": expires}, headers={"Authorization": api_key}
+        )
+        resp.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 402:
+            raise TokenError(
+                402,
+                "AssemblyAI streaming requires an upgraded account. Add a payment method at app.assemblyai.com",
+            ) from e
+        raise TokenError(e.response.status_code, e.response.text or "Failed to get streaming token") from e
+    except httpx.HTTPError as e:
+        raise TokenError(502, f"AssemblyAI token request failed: {e}") from e
+    token = resp.json().get("token")
+    if not token:
+        raise TokenError(500, "No token in response")
+    return {"token": token, "expires_in": expires}
+
+
+async def get_streaming_token(api_key: str, expires_in_seconds: int = 300) -> Dict[str, Any]:
+    """Return a fresh {"token", "expires_in"}; expires_in is clamped to 60-600 seconds."""
+    try:
+        result = await _fetch(api_key, clamp_expires(expires_in_seconds))
+    except TokenError:
+        _stats["failed"] += 1
+        raise
+    _stats["fetched"] += 1
+    return result
+
+
+def token_stats() -> Dict[str, Any]:
+    return dict(_stats)
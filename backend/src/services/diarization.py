@@ -0,0 +1,284 @@
+"""Rule-based speaker labeling for visit transcripts.
+
+Labels each sentence clinician or client in-process, with a confidence score, from:
+- speaker tags on the line ("Doctor:", "Patient:", or AssemblyAI's "Speaker A:")
+- question form, instructions, short answers
+- second-person ("you") vs first-person ("I", "my") cues and symptom words
+- turn-taking (an answer usually follows a clinician question)
+
+Only sentences below DIARIZATION_MIN_CONFIDENCE go to the LLM, with a few
+neighbouring lines for context, and the model returns just their labels. The 1-2
+sentence summary the LLM path would have written comes from a short small-tier
+call that runs alongside. When too many sentences are uncertain, diarize()
+returns None and the caller falls back to full LLM processing.
+"""
+
+import asyncio
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from .ai_service import send_json_async
+from .generator import Generator
+from .json_stream import parse_json_lenient
+from .metrics import diarization_segments_total, time_stage
+from .prompting import TOKEN_BUDGETS, chat_messages, truncate_to_tokens
+
+DIARIZATION_ENABLED = os.getenv("DIARIZATION_ENABLED", "1").lower() not in ("0", "false", "no")
+DIARIZATION_MIN_CONFIDENCE = float(os.getenv("DIARIZATION_MIN_CONFIDENCE", "0.7"))
+# Above this share of uncertain sentences, label the whole transcript with the LLM instead.
+DIARIZATION_MAX_LLM_SHARE = float(os.getenv("DIARIZATION_MAX_LLM_SHARE", "0.5"))
+CONTEXT_LINES = 2
+# The question/response lists are highlights for the EMR prompt; utterances keep everything.
+MAX_CLINICIAN_QUESTIONS = 15
+MAX_CLIENT_RESPONSES = 15
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+_TAG = re.compile(r"^\s*(?:speaker\s+)?([a-z]|\d{1,2}|clinician|doctor|dr\.?|nurse|provider|patient|client)\s*:\s*(.*)$", re.I)
+_CLINICIAN_TAGS = {"clinician", "doctor", "dr", "dr.", "nurse", "provider"}
+_CLIENT_TAGS = {"patient", "client"}
+
+_QUESTION_START = re.compile(
+    r"^(how|what|when|where|why|which|who|are|is|do|does|did|have|has|can|could|would|will|any|tell me|describe)\b", re.I
+)
+_INSTRUCTION_START = re.compile(
+    r"^(please|take|keep|continue|stop|call|make sure|try|let's|let me|we'll|we will|i'd like you|i want you|i'll prescribe|i'm going to)\b",
+    re.I,
+)
+_SHORT_ANSWER = re.compile(r"^(yes|yeah|yep|no|nope|not really|okay|ok|sure|maybe|a little|sometimes)\b", re.I)
+_SECOND_PERSON = re.compile(r"\b(you|your|you're|you've|yourself)\b", re.I)
+_FIRST_PERSON = re.compile(r"\b(i|i'm|i've|i'd|my|me|myself)\b", re.I)
+_SYMPTOM = re.compile(
+    r"\b(pain|hurts?|ache|aching|swollen|swelling|dizzy|tired|nause\w*|bleed\w*|bruis\w*|cough\w*|fever|sore|itch\w*|feel|feeling|felt|noticed)\b",
+    re.I,
+)
+
+
+@dataclass
+class Segment:
+    text: str
+    speaker: str  # "clinician" | "client"
+    confidence: float
+    source: str  # "tag" | "rules" | "llm"
+    tag: Optional[str] = None
+
+
+def rule_score(text: str, after_clinician_question: bool = False) -> float:
+    """Positive scores point to the clinician, negative to the client."""
+    first = len(_FIRST_PERSON.findall(text))
+    second = len(_SECOND_PERSON.findall(text))
+    is_question = text.rstrip().endswith("?")
+    score = 0.0
+    if is_question:
+        score += 2.0
+    if _QUESTION_START.match(text):
+        score += 1.0
+    if _INSTRUCTION_START.match(text):
+        score += 2.0
+    if _SHORT_ANSWER.match(text):
+        score -= 2.0
+    score += 0.6 * min(second, 3) - 0.6 * min(first, 3)
+    if _SYMPTOM.search(text) and not second:
+        score -= 1.2 if first else 0.7
+    if after_clinician_question and not is_question:
+        score -= 0.8
+    return score
+
+
+def _confidence(score: float) -> float:
+    return min(0.99, 0.5 + abs(score) / 5)
+
+
+def _split(text: str) -> List[str]:
+    return [p.strip() for p in _SENTENCE_BOUNDARY.split(text) if p and p.strip()]
+
+
+def label_segments(raw_transcript: str) -> List[Segment]:
+    """Split into sentences and label each with speaker, confidence and source."""
+    segments: List[Segment] = []
+    for line in raw_transcript.splitlines():
+        if not line.strip():
+            continue
+        match = _TAG.match(line)
+        tag = match.group(1).lower() if match else None
+        body = match.group(2) if match else line
+        for sentence in _split(body):
+            segments.append(Segment(sentence, "client", 0.5, "rules", tag))
+
+    prev: Optional[Segment] = None
+    for seg in segments:
+        after_question = prev is not None and prev.speaker == "clinician" and prev.text.endswith("?")
+        score = rule_score(seg.text, after_question)
+        seg.speaker = "clinician" if score > 0 else "client"
+        seg.confidence = _confidence(score)
+        prev = seg
+
+    _apply_tags(segments)
+    return segments
+
+
+def _apply_tags(segments: List[Segment]) -> None:
+    """Role tags decide outright; anonymous tags (A, B, 1, 2) take the role their sentences lean to."""
+    leaning: Dict[str, List[float]] = {}
+    for seg in segments:
+        if seg.tag in _CLINICIAN_TAGS or seg.tag in _CLIENT_TAGS:
+            seg.speaker = "clinician" if seg.tag in _CLINICIAN_TAGS else "client"
+            seg.confidence, seg.source = 1.0, "tag"
+        elif seg.tag is not None:
+            leaning.setdefault(seg.tag, []).append(rule_score(seg.text))
+    if len(leaning) < 2:
+        return
+    means = {tag: sum(scores) / len(scores) for tag, scores in leaning.items()}
+    clinician_tag = max(means, key=means.get)
+    others = [m for tag, m in means.items() if tag != clinician_tag]
+    margin = means[clinician_tag] - max(others)
+    confidence = min(0.99, 0.6 + margin / 4)
+    for seg in segments:
+        if seg.tag in means:
+            seg.speaker = "clinician" if seg.tag == clinician_tag else "client"
+            seg.confidence, seg.source = confidence, "tag"
+
+
+DIARIZATION_SYSTEM_PROMPT = """You label speakers in a clinician-patient conversation. The user gives numbered lines; lines already labeled are context, lines labeled [?] need a label. Clinicians ask questions, give instructions, or provide medical information. Clients (patients) describe symptoms, answer questions, and report how they feel.
+
+Output ONLY a JSON array with one object per [?] line: {"line": <number>, "speaker": "clinician"|"client"}. No markdown, no code fences, no commentary."""
+
+
+def build_diarization_messages(segments: List[Segment], uncertain: List[int]) -> List[Dict[str, str]]:
+    wanted = set(uncertain)
+    shown = sorted({j for i in uncertain for j in range(i - CONTEXT_LINES, i + CONTEXT_LINES + 1) if 0 <= j < len(segments)})
+    lines, last = [], None
+    for i in shown:
+        if last is not None and i != last + 1:
+            lines.append("...")
+        label = "?" if i in wanted else segments[i].speaker.upper()
+        lines.append(f"{i} [{label}] {segments[i].text}")
+        last = i
+    return chat_messages(DIARIZATION_SYSTEM_PROMPT, "\n".join(lines))
+
+
+def _parse_labels(content: str, uncertain: List[int]) -> Dict[int, str]:
+    items = parse_json_lenient(content, expect=list)
+    if not isinstance(items, list):
+        raise ValueError("Model output must be a JSON array")
+    wanted = set(uncertain)
+    labels: Dict[int, str] = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        speaker = str(item.get("speaker", "")).strip().lower()
+        try:
+            line = int(item.get("line"))
+        except (TypeError, ValueError):
+            continue
+        if line in wanted and speaker in ("clinician", "client"):
+            labels[line] = speaker
+    if not labels:
+        raise ValueError("No speaker labels in model output")
+    return labels
+
+
+async def refine_with_llm(segments: List[Segment], uncertain: List[int]) -> None:
+    """Ask the model for labels of the uncertain segments only; updates them in place."""
+    with time_stage("prompt_build", "diarization"):
+        messages = build_diarization_messages(segments, uncertain)
+
+    def parse(content: str) -> Dict[int, str]:
+        with time_stage("json_parse", "diarization"):
+            return _parse_labels(content, uncertain)
+
+    # About 15 output tokens per label.
+    labels = await send_json_async(messages, parse, generator="diarization", max_tokens=min(2000, 50 + 20 * len(uncertain)))
+    for i, speaker in labels.items():
+        segments[i].speaker, segments[i].confidence, segments[i].source = speaker, 1.0, "llm"
+
+
+def group_utterances(segments: List[Segment], merge: bool = True) -> List[Dict[str, Any]]:
+    """Turn segments into utterances, joining consecutive sentences by the same speaker when merge is set."""
+    utterances: List[Dict[str, Any]] = []
+    for seg in segments:
+        if merge and utterances and utterances[-1]["speaker"] == seg.speaker:
+            utterances[-1]["text"] += " " + seg.text
+        else:
+            utterances.append({"speaker": seg.speaker, "text": seg.text})
+    return utterances
+
+
+def client_responses(segments: List[Segment], limit: int = MAX_CLIENT_RESPONSES) -> List[str]:
+    """Client sentences worth charting, in order: symptom reports first, then other
+    answers; bare acknowledgements ("Okay, I will.") are left out."""
+    client = [
+        (i, s.text) for i, s in enumerate(segments)
+        if s.speaker == "client" and not (_SHORT_ANSWER.match(s.text) and len(s.text.split()) <= 4)
+    ]
+    symptoms = [item for item in client if _SYMPTOM.search(item[1])]
+    others = [item for item in client if not _SYMPTOM.search(item[1])]
+    picked = (symptoms + others)[:limit]
+    return [text for _, text in sorted(picked)]
+
+
+def build_processed(segments: List[Segment], merge: bool = True, summary: str = "") -> Dict[str, Any]:
+    """Shape segments like the LLM transcript output."""
+    questions = [s.text for s in segments if s.speaker == "clinician" and s.text.endswith("?")]
+    return {
+        "utterances": group_utterances(segments, merge),
+        "clinician_questions": questions[:MAX_CLINICIAN_QUESTIONS],
+        "client_responses": client_responses(segments),
+        "summary": summary,
+    }
+
+
+SUMMARY_SYSTEM_PROMPT = """You summarize clinician-patient conversations for the chart. Reply with 1-2 plain sentences: why the patient was seen, what they reported, and the plan. No markdown, no preamble, no commentary."""
+
+
+def build_summary_prompt(utterances: List[Dict[str, Any]]) -> str:
+    dialogue = "\n".join(f"[{u['speaker'].upper()}] {u['text']}" for u in utterances)
+    return truncate_to_tokens(dialogue, TOKEN_BUDGETS["transcript_summary"]["dialogue"], keep="middle")
+
+
+TRANSCRIPT_SUMMARY = Generator("transcript_summary", SUMMARY_SYSTEM_PROMPT, build_summary_prompt)
+
+
+async def summarize_utterances(utterances: List[Dict[str, Any]]) -> str:
+    """1-2 sentence summary of labeled utterances; chunked transcripts call this once at the end.
+
+    The summary is a nice-to-have next to the labels, so a failed call leaves it empty.
+    """
+    if not utterances:
+        return ""
+    try:
+        return (await TRANSCRIPT_SUMMARY.run(utterances)).strip()
+    except Exception:
+        return ""
+
+
+async def diarize(raw_transcript: str, merge: bool = True, summarize: bool = True) -> Optional[Dict[str, Any]]:
+    """Label a transcript with rules, using the LLM only for uncertain sentences.
+
+    Returns the processed transcript, or None when the whole transcript should go
+    to the LLM instead: rules are too unsure to be worth refining, or refining
+    failed. With summarize=False (chunks of a longer transcript) no summary is
+    written; the caller summarizes the merged result once.
+    """
+    with time_stage("rules", "diarization"):
+        segments = label_segments(raw_transcript)
+    if not segments:
+        return None
+    uncertain = [i for i, s in enumerate(segments) if s.confidence < DIARIZATION_MIN_CONFIDENCE]
+    if len(uncertain) > DIARIZATION_MAX_LLM_SHARE * len(segments):
+        return None
+    # The summary does not depend on the labels being refined, so both calls run at once.
+    summary_task = asyncio.create_task(summarize_utterances(group_utterances(segments))) if summarize else None
+    try:
+        if uncertain:
+            await refine_with_llm(segments, uncertain)
+        summary = await summary_task if summary_task is not None else ""
+    except Exception:
+        return None
+    finally:
+        if summary_task is not None:
+            summary_task.cancel()
+    for seg in segments:
+        diarization_segments_total.inc(source=seg.source)
+    return build_processed(segments, merge, summary)
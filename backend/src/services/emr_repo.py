@@ -1,9 +1,36 @@
-from typing import Any, Dict, Optional
-from src.services.supabase_client import get_supabase
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from src.services.read_cache import ReadThroughCache
+from src.services.supabase_client import get_async_supabase, get_supabase
 
-def _map_emr_row(row: Dict[str, Any]) -> Dict[str, Any]:
+EMR_FIELDS = ("user_id", "last_visit", "conditions", "medications", "procedures", "vitals", "visit_notes", "alerts")
+EMR_COLUMNS = ",".join(EMR_FIELDS)
+
+# Visit-note history lives in its own table so the chart row stays small. Schema in
+# supabase/migrations/20261018000000_emr_visit_notes.sql: a trigger on emr_reports
+# appends each new visit_notes value, and emr_reports.visit_notes keeps only the latest.
+VISIT_NOTE_COLUMNS = "id,visit_date,note"
+VISIT_NOTES_PAGE_SIZE = 20
+VISIT_NOTES_MAX_PAGE_SIZE = 100
+
+def parse_emr_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Parse a comma-separated fields= value into EMR columns; None means all.
+
+    user_id is always included. Raises ValueError on unknown fields.
+    """
+    if fields is None or not fields.strip():
+        return None
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - set(EMR_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown EMR fields: {sorted(unknown)} (allowed: {list(EMR_FIELDS)})")
+    wanted.add("user_id")
+    # Keep EMR_FIELDS order so equal projections share one cache key.
+    return tuple(f for f in EMR_FIELDS if f in wanted)
+
+def _map_emr_row(row: Dict[str, Any], columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
     # Normalize EMR keys to API snake_case contract.
-    return {
+    emr = {
         "user_id": row.get("user_id"),
         "last_visit": row.get("last_visit") or row.get("lastVisit"),
         "conditions": row.get("conditions") or [],
@@ -13,12 +40,44 @@ def _map_emr_row(row: Dict[str, Any]) -> Dict[str, Any]:
         "visit_notes": row.get("visit_notes") or row.get("visitNotes"),
         "alerts": row.get("alerts") or [],
     }
+    return project_emr(emr, columns)
+
+def project_emr(emr: Dict[str, Any], columns: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Keep only the given columns of an API-shaped EMR (all when columns is None)."""
+    if columns is None:
+        return emr
+    return {c: emr.get(c) for c in columns}
+
+def _select_columns(columns: Optional[Sequence[str]]) -> str:
+    return ",".join(columns) if columns else EMR_COLUMNS
+
+def _map_visit_note(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": str(row.get("id")), "visit_date": row.get("visit_date"), "note": row.get("note") or ""}
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if limit is None:
+        return VISIT_NOTES_PAGE_SIZE
+    return max(1, min(int(limit), VISIT_NOTES_MAX_PAGE_SIZE))
 
-def get_emr_by_user_id(user_id: str) -> Optional[Dict[str, Any]]:
+def visit_notes_page(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    """Build a page from up to limit + 1 rows, newest first; next_cursor is set when more remain."""
+    notes = [_map_visit_note(r) for r in rows[:limit]]
+    next_cursor = notes[-1]["id"] if len(rows) > limit and notes else None
+    return {"notes": notes, "next_cursor": next_cursor}
+
+def parse_cursor(before: Optional[str]) -> Optional[int]:
+    if before is None or before == "":
+        return None
+    try:
+        return int(before)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {before!r}")
+
+def get_emr_by_user_id(user_id: str, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
     sb = get_supabase()
     res = (
         sb.table("emr_reports")
-        .select("user_id,last_visit,conditions,medications,procedures,vitals,visit_notes,alerts")
+        .select(_select_columns(columns))
         .eq("user_id", user_id)
         .maybe_single()
         .execute()
@@ -30,7 +89,80 @@ def get_emr_by_user_id(user_id: str) -> Optional[Dict[str, Any]]:
     if not res.data:
         return None
 
-    return _map_emr_row(res.data)
+    return _map_emr_row(res.data, columns)
+
+async def get_emr_by_user_id_async(user_id: str, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+    sb = await get_async_supabase()
+    res = await (
+        sb.table("emr_reports")
+        .select(_select_columns(columns))
+        .eq("user_id", user_id)
+        .maybe_single()
+        .execute()
+    )
+
+    if getattr(res, "error", None):
+        raise RuntimeError(f"Supabase error: {res.error}")
+
+    # maybe_single() yields no response at all when the row is missing.
+    if res is None or not res.data:
+        return None
+
+    return _map_emr_row(res.data, columns)
+
+async def get_visit_notes_async(user_id: str, limit: int, before: Optional[int] = None) -> Dict[str, Any]:
+    """One page of a patient's visit notes, newest first (keyset on id)."""
+    sb = await get_async_supabase()
+    query = sb.table("emr_visit_notes").select(VISIT_NOTE_COLUMNS).eq("user_id", user_id)
+    if before is not None:
+        query = query.lt("id", before)
+    res = await query.order("id", desc=True).limit(limit + 1).execute()
+
+    if getattr(res, "error", None):
+        raise RuntimeError(f"Supabase error: {res.error}")
+
+    return visit_notes_page(res.data or [], limit)
+
+async def _load_emr(user_id: str) -> Optional[Dict[str, Any]]:
+    # Imported here: repositories builds on this module.
+    from src.services.repositories import get_repository
+    return await get_repository().get_emr_by_user_id(user_id)
+
+emr_cache = ReadThroughCache(
+    _load_emr,
+    ttl_seconds=float(os.getenv("EMR_CACHE_TTL_SECONDS", "30")),
+    max_entries=int(os.getenv("EMR_CACHE_MAX_ENTRIES", "1024")),
+)
+
+async def _load_emr_projection(key: Tuple[str, Tuple[str, ...]]) -> Optional[Dict[str, Any]]:
+    from src.services.repositories import get_repository
+    user_id, columns = key
+    return await get_repository().get_emr_by_user_id(user_id, columns)
+
+emr_projection_cache = ReadThroughCache(
+    _load_emr_projection,
+    ttl_seconds=emr_cache.ttl_seconds,
+    max_entries=emr_cache.max_entries,
+)
+
+async def get_emr_cached(user_id: str, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+    """Read-through cached EMR lookup. Treat the returned dict as read-only.
+
+    With columns, only those fields are returned: from the full cached EMR when
+    there is one, otherwise by selecting just those columns.
+    """
+    if columns is None or set(columns) >= set(EMR_FIELDS):
+        return await emr_cache.get(user_id)
+    columns = tuple(columns)
+    full = emr_cache.peek(user_id)
+    if full is not None:
+        return project_emr(full, columns)
+    return await emr_projection_cache.get((user_id, columns))
+
+def invalidate_emr(user_id: str) -> None:
+    """Drop the cached EMR for user_id; call after writing that patient's EMR."""
+    emr_cache.invalidate(user_id)
+    emr_projection_cache.invalidate_where(lambda key: key[0] == user_id)
 
 def format_emr_report_as_text(emr_report: Dict[str, Any]) -> str:
     conditions = emr_report.get("conditions") or []
@@ -0,0 +1,37 @@
+"""ETag / If-None-Match support for JSON GET responses.
+
+The payload is serialized once (json_response.dumps_json); the bytes are both
+hashed for the ETag and sent as the body, so a matching If-None-Match gets a
+bodyless 304 and a miss costs no second encoding pass.
+"""
+
+import hashlib
+from typing import Any
+
+from fastapi import Request, Response
+
+from .json_response import dumps_json
+
+
+def compute_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # Weak comparison (RFC 9110 13.1.2): W/"x" matches "x".
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def etag_json_response(request: Request, payload: Any) -> Response:
+    """JSON response with an ETag, or 304 Not Modified when the client already has it."""
+    body = dumps_json(payload)
+    etag = compute_etag(body)
+    # no-cache: browsers may keep the copy but must revalidate with the ETag each time.
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,222 @@
+"""Declarative LLM generators.
+
+A Generator bundles what used to be hand-written in every *_generator module:
+the system prompt, a function building the user prompt from the inputs, and
+the output schema that validates the reply. The model tier, max_tokens and
+retry policy are looked up by name in model_routing.ROUTES and
+resilience.POLICIES. Running one goes through ai_service, so every generator
+gets the same response cache, in-flight coalescing, concurrency limits,
+retries and fallback, small-to-large validation fallback, and prompt-build /
+parse stage metrics.
+
+    TASKS = Generator("tasks", TASKS_SYSTEM_PROMPT, build_tasks_prompt,
+                      output=JsonArray({"id", "label", "priority", "category"}, item="task"),
+                      on_empty=list)
+    tasks = await TASKS.run(emr_text, agreed_items)
+"""
+
+import asyncio
+import copy
+import json
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Callable, Dict, FrozenSet, Generic, List, Optional, Tuple, TypeVar, Union
+
+from .ai_service import send_json_async, send_msg_async, stream_msg_async
+from .json_stream import JsonArrayStream, parse_json_lenient
+from .metrics import time_stage
+from .prompting import chat_messages
+
+T = TypeVar("T")
+Messages = List[Dict[str, str]]
+
+
+@dataclass(frozen=True)
+class JsonArray:
+    """A JSON array of objects, each with the required fields.
+
+    parse() rejects the whole reply on the first invalid item, so a small-tier
+    reply that breaks the schema goes to the large tier. accept() checks one
+    item at a time for streaming, where items already sent cannot be taken back
+    and invalid ones are skipped instead.
+    """
+
+    required: FrozenSet[str]
+    item: str = "item"
+    # Applied to each valid item (defaults, normalized enums); returns the item.
+    normalize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+
+    def __post_init__(self):
+        object.__setattr__(self, "required", frozenset(self.required))
+
+    def is_valid(self, value: Any) -> bool:
+        return isinstance(value, dict) and self.required <= value.keys()
+
+    def accept(self, value: Any) -> Optional[Dict[str, Any]]:
+        """The item, normalized, or None when it is invalid."""
+        if not self.is_valid(value):
+            return None
+        return self.normalize(value) if self.normalize else value
+
+    def _load(self, content: str) -> List[Any]:
+        parsed = parse_json_lenient(content, expect=list)
+        if not isinstance(parsed, list):
+            raise ValueError("Model output must be a JSON array")
+        return parsed
+
+    def accept_all(self, content: str) -> List[Dict[str, Any]]:
+        """The valid items of a whole reply, skipping invalid ones like a stream does."""
+        return [item for item in map(self.accept, self._load(content)) if item is not None]
+
+    def parse(self, content: str) -> List[Dict[str, Any]]:
+        parsed = self._load(content)
+        name = self.item.capitalize()
+        for i, value in enumerate(parsed):
+            if not isinstance(value, dict):
+                raise ValueError(f"{name} at index {i} is not an object")
+            missing = self.required - value.keys()
+            if missing:
+                raise ValueError(f"{name} at index {i} missing fields: {sorted(missing)}")
+        return [self.normalize(value) if self.normalize else value for value in parsed]
+
+
+@dataclass(frozen=True)
+class JsonObject:
+    """A JSON object; missing keys are filled from defaults (copied per reply)."""
+
+    defaults: Dict[str, Any] = field(default_factory=dict)
+    normalize: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None
+
+    def parse(self, content: str) -> Dict[str, Any]:
+        data = parse_json_lenient(content, expect=dict)
+        if not isinstance(data, dict):
+            raise ValueError("Model output must be a JSON object")
+        for key, value in self.defaults.items():
+            if key not in data:
+                data[key] = copy.copy(value)
+        return self.normalize(data) if self.normalize else data
+
+
+OutputSchema = Union[JsonArray, JsonObject]
+
+
+@dataclass(frozen=True)
+class Generator(Generic[T]):
+    # Routing key: selects tier, max_tokens and retry policy, and labels metrics.
+    name: str
+    system_prompt: str
+    # Builds the user prompt from the run() arguments. Raises ValueError on bad
+    # input; returns None when there is nothing to generate from.
+    build_prompt: Callable[..., Optional[str]]
+    # None: the reply is returned as text.
+    output: Optional[OutputSchema] = None
+    # Result when build_prompt returns None (no LLM call is made).
+    on_empty: Optional[Callable[[], T]] = None
+    # Overrides the route's max_tokens (e.g. for short chunks).
+    max_tokens: Optional[int] = None
+    # What it makes, for error messages ("cards"); defaults to name.
+    label: Optional[str] = None
+
+    def with_max_tokens(self, max_tokens: int) -> "Generator[T]":
+        return replace(self, max_tokens=max_tokens)
+
+    def messages(self, *args: Any, **kwargs: Any) -> Optional[Messages]:
+        """Chat messages for these inputs, or None when build_prompt found nothing to send."""
+        prompt = self.build_prompt(*args, **kwargs)
+        return None if prompt is None else chat_messages(self.system_prompt, prompt)
+
+    def _timed_messages(self, *args: Any, **kwargs: Any) -> Optional[Messages]:
+        with time_stage("prompt_build", self.name):
+            return self.messages(*args, **kwargs)
+
+    def _empty(self) -> T:
+        if self.on_empty is None:
+            raise ValueError(f"Nothing to generate {self.label or self.name} from")
+        return self.on_empty()
+
+    def parse(self, content: str) -> T:
+        with time_stage("json_parse", self.name):
+            return self.output.parse(content)
+
+    async def run_messages(self, messages: Messages) -> T:
+        if self.output is None:
+            return await send_msg_async(messages, max_tokens=self.max_tokens, generator=self.name)
+        return await send_json_async(messages, self.parse, generator=self.name, max_tokens=self.max_tokens)
+
+    async def run(self, *args: Any, **kwargs: Any) -> T:
+        """Generate for one set of inputs (cached, coalesced, retried per policy)."""
+        messages = self._timed_messages(*args, **kwargs)
+        if messages is None:
+            return self._empty()
+        return await self.run_messages(messages)
+
+    async def stream(self, *args: Any, **kwargs: Any) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the raw reply: stream_msg_async's token events, then one done event."""
+        messages = self._timed_messages(*args, **kwargs)
+        if messages is None:
+            raise ValueError(f"Nothing to generate {self.label or self.name} from")
+        async for event in stream_msg_async(messages, max_tokens=self.max_tokens, generator=self.name):
+            yield event
+
+    async def stream_items(self, *args: Any, **kwargs: Any) -> AsyncIterator[Tuple[str, Any]]:
+        """For JsonArray outputs: yield ("item", item) as each valid item closes, then
+        ("done", {"items": [...], "usage": ..., "cached": bool})."""
+        if not isinstance(self.output, JsonArray):
+            raise TypeError(f"{self.name} does not produce a JSON array")
+        parser = JsonArrayStream()
+        items: List[Dict[str, Any]] = []
+        async for event in self.stream(*args, **kwargs):
+            if event["type"] == "token":
+                for value in parser.feed(event["text"]):
+                    item = self.output.accept(value)
+                    if item is not None:
+                        items.append(item)
+                        yield "item", item
+            elif event["type"] == "done":
+                if not items:
+                    # Nothing closed while streaming (e.g. a cached reply): parse the whole text.
+                    with time_stage("json_parse", self.name):
+                        whole = self.output.accept_all(event["text"])
+                    for item in whole:
+                        items.append(item)
+                        yield "item", item
+                yield "done", {"items": items, "usage": event.get("usage"), "cached": event.get("cached", False)}
+
+    async def batch(self, inputs: List[Tuple[str, tuple]]) -> AsyncIterator[Tuple[str, Optional[T], Optional[str]]]:
+        """Generate for many (key, args) pairs concurrently.
+
+        Inputs that build identical prompts are generated once. Yields (key, result,
+        error) as each distinct prompt finishes; concurrency is bounded by the LLM
+        limiter. Abandoning the iterator cancels the remaining work.
+        """
+        keys_by_prompt: Dict[str, List[str]] = {}
+        messages_by_prompt: Dict[str, Optional[Messages]] = {}
+        for key, args in inputs:
+            try:
+                messages = self.messages(*args)
+            except ValueError as e:
+                yield key, None, str(e)
+                continue
+            prompt_key = json.dumps(messages)
+            keys_by_prompt.setdefault(prompt_key, []).append(key)
+            messages_by_prompt[prompt_key] = messages
+
+        async def run(prompt_key: str):
+            messages = messages_by_prompt[prompt_key]
+            try:
+                result = self._empty() if messages is None else await self.run_messages(messages)
+                return prompt_key, result, None
+            except ValueError as e:
+                return prompt_key, None, str(e)
+            except Exception:
+                return prompt_key, None, f"Failed to generate {self.label or self.name}"
+
+        tasks = [asyncio.create_task(run(prompt_key)) for prompt_key in keys_by_prompt]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                prompt_key, result, error = await next_done
+                for key in keys_by_prompt[prompt_key]:
+                    yield key, result, error
+        finally:
+            # Client went away mid-stream: stop paying for results nobody will read.
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,48 @@
+"""Shared outbound HTTP client for third-party APIs (AssemblyAI, job callbacks).
+
+One keep-alive httpx.AsyncClient, so calls reuse TCP/TLS connections. The app
+lifespan creates it at startup and closes it on shutdown; code running outside the
+app (scripts, tests) gets one created on first use. HTTP/2 is used when the h2
+package is installed. Tunables (env): OUTBOUND_MAX_CONNECTIONS, OUTBOUND_MAX_KEEPALIVE, OUTBOUND_TIMEOUT.
+"""
+
+import os
+from typing import Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # optional; fall back to HTTP/1.1 keep-alive
+    HTTP2_AVAILABLE = False
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=int(os.getenv("OUTBOUND_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("OUTBOUND_MAX_KEEPALIVE", "10")),
+            keepalive_expiry=60,
+        ),
+        timeout=float(os.getenv("OUTBOUND_TIMEOUT", "10")),
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The shared client; created on first use if the lifespan has not opened it yet."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,424 @@
+"""Background jobs for long-running generation.
+
+POST /api/jobs queues a generator run and returns immediately; workers started in
+the app lifespan execute it, so the LLM work survives client disconnects and load
+balancer timeouts. Results are polled with GET /api/jobs/{id}, or POSTed to an
+optional callback_url on a host listed in JOB_CALLBACK_HOSTS (https only; with no
+hosts listed, callbacks are refused).
+
+- Priority lanes: high (cards, which carry red flags) runs ahead of normal
+  (transcript, EMR, report) and low (summary, tasks, artifact refreshes).
+  Callers may override.
+- Idempotency keys: resubmitting with the same key returns the existing job
+  instead of starting a second LLM call.
+- JOB_STORE=memory (default) or sqlite (JOB_SQLITE_PATH); with sqlite, queued and
+  interrupted jobs are picked up again after a restart.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .artifacts import refresh_artifacts
+from .emr_repo import get_emr_cached
+from .http_client import get_http_client
+from .pipeline import run_pipeline, visit_pipeline_stages
+from .progress_summary_generator import generate_progress_summary
+from .question_generator import generate_questions, generate_questions_from_emr_text
+from .report_generator import generate_report
+from .task_generator import generate_clinician_tasks
+from .transcript_processor import process_transcript
+from .transcript_to_emr import generate_emr_from_transcript
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "4")))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 60 * 60)))
+CALLBACK_TIMEOUT_SECONDS = 10
+# Comma-separated hostnames callback_url may point at; the server POSTs there, so
+# arbitrary URLs would let clients reach internal addresses.
+JOB_CALLBACK_HOSTS = frozenset(h.strip().lower() for h in os.getenv("JOB_CALLBACK_HOSTS", "").split(",") if h.strip())
+JOB_PRUNE_INTERVAL_SECONDS = float(os.getenv("JOB_PRUNE_INTERVAL_SECONDS", "600"))
+
+LANES = {"high": 0, "normal": 1, "low": 2}
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused for a different request."""
+
+
+async def _cards(p: Dict[str, Any]) -> Any:
+    return await generate_questions_from_emr_text(emr_text=p.get("emr_text", ""))
+
+
+async def _cards_for_user(p: Dict[str, Any]) -> Any:
+    emr_report = await get_emr_cached(p.get("user_id", ""))
+    if not emr_report:
+        raise ValueError("EMR not found for user")
+    return await generate_questions(emr_report, p.get("transcript_emr", ""))
+
+
+async def _report(p: Dict[str, Any]) -> Any:
+    emr_report = await get_emr_cached(p.get("user_id", ""))
+    if not emr_report:
+        raise ValueError("EMR not found for user")
+    return await generate_report(emr_report=emr_report, selected_questions=p.get("selected_questions") or [])
+
+
+async def _tasks(p: Dict[str, Any]) -> Any:
+    return await generate_clinician_tasks(emr_text=p.get("emr_text"), agreed_items=p.get("agreed_items") or [])
+
+
+async def _summary(p: Dict[str, Any]) -> Any:
+    return await generate_progress_summary(emr_text=p.get("emr_text"), agreed_items=p.get("agreed_items"))
+
+
+async def _artifacts(p: Dict[str, Any]) -> Any:
+    return await refresh_artifacts(p.get("user_id", ""))
+
+
+async def _transcript(p: Dict[str, Any]) -> Any:
+    return await process_transcript(raw_transcript=p.get("raw_transcript", ""))
+
+
+async def _emr(p: Dict[str, Any]) -> Any:
+    return await generate_emr_from_transcript(processed=p.get("processed") or {})
+
+
+async def _full_pipeline(p: Dict[str, Any]) -> Any:
+    stages = tuple(p.get("stages") or ())
+    result = await run_pipeline(visit_pipeline_stages(raw_transcript=p.get("raw_transcript", ""), downstream=stages))
+    out = {"processed": result.results["process"], "emr_notes": result.results["emr"], "timings_ms": result.timings_ms}
+    for name in stages:
+        out[name] = result.results.get(name)
+    if result.errors:
+        out["errors"] = result.errors
+    return out
+
+
+# kind -> (handler, default lane). Payload fields match the corresponding HTTP route's body.
+JOB_KINDS: Dict[str, tuple] = {
+    "cards": (_cards, "high"),
+    "cards_for_user": (_cards_for_user, "high"),
+    "transcript": (_transcript, "normal"),
+    "emr": (_emr, "normal"),
+    "report": (_report, "normal"),
+    "full_pipeline": (_full_pipeline, "normal"),
+    "tasks": (_tasks, "low"),
+    "summary": (_summary, "low"),
+    # Background refresh of precomputed per-patient artifacts (see artifacts.py).
+    "artifacts": (_artifacts, "low"),
+}
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    payload: Dict[str, Any]
+    lane: str
+    status: str = "queued"  # queued | running | succeeded | failed | cancelled
+    idempotency_key: Optional[str] = None
+    request_hash: str = ""
+    callback_url: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def public(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("payload")
+        data.pop("request_hash")
+        return data
+
+
+class MemoryJobStore:
+    name = "memory"
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+
+    def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def delete(self, job_id: str) -> None:
+        self._jobs.pop(job_id, None)
+
+    def all(self) -> List[Job]:
+        return list(self._jobs.values())
+
+
+class SQLiteJobStore:
+    """Jobs as JSON rows in a local SQLite file, so they survive restarts."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            self._conn.commit()
+
+    def save(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, data) VALUES (?, ?)", (job.id, json.dumps(asdict(job), default=str))
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(**json.loads(row[0])) if row else None
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._conn.commit()
+
+    def all(self) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM jobs").fetchall()
+        return [Job(**json.loads(r[0])) for r in rows]
+
+
+def _build_store():
+    backend = os.getenv("JOB_STORE", "memory").strip().lower()
+    if backend == "memory":
+        return MemoryJobStore()
+    if backend == "sqlite":
+        default_path = Path(__file__).resolve().parent.parent / "data" / "jobs.sqlite3"
+        return SQLiteJobStore(os.getenv("JOB_SQLITE_PATH") or str(default_path))
+    raise RuntimeError(f"Unknown JOB_STORE: {backend!r} (expected memory or sqlite)")
+
+
+def validate_callback_url(url: str) -> str:
+    """Raise ValueError unless url is https on one of JOB_CALLBACK_HOSTS."""
+    if not JOB_CALLBACK_HOSTS:
+        raise ValueError("callback_url is not enabled on this server; poll GET /api/jobs/{id} instead")
+    parts = urlsplit(url)
+    if parts.scheme != "https" or parts.username or parts.password or (parts.hostname or "") not in JOB_CALLBACK_HOSTS:
+        raise ValueError(f"callback_url must be an https URL on one of: {sorted(JOB_CALLBACK_HOSTS)}")
+    return url
+
+
+def _request_hash(kind: str, payload: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps([kind, payload], sort_keys=True, default=str).encode()).hexdigest()
+
+
+class JobQueue:
+    """Priority queue of jobs served by an asyncio worker pool."""
+
+    def __init__(self, store, workers: int = JOB_WORKERS):
+        self.store = store
+        self.workers = workers
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = 0
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._queue = asyncio.PriorityQueue()
+        for job in await asyncio.to_thread(self.store.all):
+            self._remember(job)
+            if job.status in ("queued", "running"):
+                # Interrupted by a restart: run it again.
+                job.status, job.started_at = "queued", None
+                self._enqueue(job)
+        self._stopping = False
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._worker_tasks.append(asyncio.create_task(self._prune_periodically()))
+
+    async def stop(self) -> None:
+        # Running jobs stay "running" in the store; a durable store re-queues them on start.
+        self._stopping = True
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def _remember(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        if job.idempotency_key:
+            self._by_key[job.idempotency_key] = job.id
+
+    def _enqueue(self, job: Job) -> None:
+        self._seq += 1
+        self._queue.put_nowait((LANES[job.lane], self._seq, job.id))
+
+    async def submit(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        lane: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        callback_url: Optional[str] = None,
+    ) -> Job:
+        """Queue a job, or return the existing one for a repeated idempotency key."""
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind!r} (expected one of {sorted(JOB_KINDS)})")
+        if lane is not None and lane not in LANES:
+            raise ValueError(f"Unknown priority lane: {lane!r} (expected one of {list(LANES)})")
+        if callback_url:
+            validate_callback_url(callback_url)
+        request_hash = _request_hash(kind, payload)
+        if idempotency_key:
+            existing = self._jobs.get(self._by_key.get(idempotency_key, ""))
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    raise IdempotencyConflict("Idempotency key was already used for a different request")
+                return existing
+        await self._prune_stale()
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            payload=payload,
+            lane=lane or JOB_KINDS[kind][1],
+            idempotency_key=idempotency_key,
+            request_hash=request_hash,
+            callback_url=callback_url,
+        )
+        self._remember(job)
+        await asyncio.to_thread(self.store.save, job)
+        self._enqueue(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            return job
+        # Still queued: the worker skips it when it comes up.
+        await self._finish(job, "cancelled")
+        return job
+
+    def _prune(self) -> List[str]:
+        """Forget finished jobs older than JOB_TTL_SECONDS; returns their ids."""
+        cutoff = time.time() - JOB_TTL_SECONDS
+        stale = [j for j in self._jobs.values() if j.status in FINISHED and (j.finished_at or 0) < cutoff]
+        for job in stale:
+            del self._jobs[job.id]
+            if job.idempotency_key:
+                self._by_key.pop(job.idempotency_key, None)
+        return [job.id for job in stale]
+
+    async def _prune_stale(self) -> None:
+        stale = self._prune()
+        if stale:
+            await asyncio.to_thread(lambda: [self.store.delete(job_id) for job_id in stale])
+
+    async def _prune_periodically(self) -> None:
+        # Submissions prune too, but finished jobs must not pile up while nobody submits.
+        while True:
+            await asyncio.sleep(JOB_PRUNE_INTERVAL_SECONDS)
+            try:
+                await self._prune_stale()
+            except Exception:
+                logger.exception("Pruning finished jobs failed")
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self._jobs.get(job_id)
+            if job is None or job.status != "queued":
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Store or bookkeeping errors: fail this job, keep the worker alive.
+                logger.exception("Job %s (%s) could not be completed", job.id, job.kind)
+                await self._mark_failed(job)
+
+    async def _run(self, job: Job) -> None:
+        job.status, job.started_at = "running", time.time()
+        task: Optional[asyncio.Task] = None
+        try:
+            # Inside the try: a stored job's kind may no longer exist.
+            task = asyncio.create_task(JOB_KINDS[job.kind][0](job.payload))
+            self._running[job.id] = task
+            await asyncio.to_thread(self.store.save, job)
+            job.result = await task
+        except asyncio.CancelledError:
+            if self._stopping:
+                raise
+            await self._finish(job, "cancelled")
+        except ValueError as e:
+            await self._finish(job, "failed", str(e))
+        except Exception:
+            await self._finish(job, "failed", f"Failed to run {job.kind} job")
+        else:
+            await self._finish(job, "succeeded")
+        finally:
+            self._running.pop(job.id, None)
+            if task is not None and not task.done():
+                task.cancel()
+
+    async def _mark_failed(self, job: Job) -> None:
+        # A job that already reached a final state keeps it; only the save is retried.
+        if job.status not in FINISHED:
+            job.status, job.finished_at = "failed", time.time()
+        if job.status == "failed" and not job.error:
+            job.error = f"Failed to run {job.kind} job"
+        try:
+            await asyncio.to_thread(self.store.save, job)
+        except Exception:
+            logger.exception("Could not save failed job %s", job.id)
+
+    async def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status, job.error, job.finished_at = status, error, time.time()
+        await asyncio.to_thread(self.store.save, job)
+        if job.callback_url:
+            try:
+                # Checked again: the allowlist may have changed since a stored job was submitted.
+                url = validate_callback_url(job.callback_url)
+                await get_http_client().post(
+                    url, json=job.public(), timeout=CALLBACK_TIMEOUT_SECONDS, follow_redirects=False
+                )
+            except Exception:
+                pass  # best effort; the result can still be polled
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "store": self.store.name,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._running),
+            "jobs": counts,
+        }
+
+
+job_queue = JobQueue(_build_store())
@@ -0,0 +1,40 @@
+"""Fast JSON responses for large dict payloads.
+
+Routes with a response_model are already serialized straight to bytes by
+pydantic's core, but only while they keep FastAPI's default response class. An
+app-wide ORJSONResponse default would switch that off and make those routes
+slower (see benchmarks/serialization.py), so it is not set. Routes that return
+plain dicts (full pipeline, users, EMR, jobs, artifacts) return
+FastJSONResponse instead, which skips jsonable_encoder's walk over the payload
+and encodes with orjson when it is installed. Pydantic models nested in the
+payload are dumped with model_dump, without being validated again.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(content: Any) -> bytes:
+    """Compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
@@ -0,0 +1,171 @@
+"""Tolerant JSON parsing for model output.
+
+- strip_code_fences: remove ```json fences the model adds despite instructions
+- JsonArrayStream: feed completion chunks as they arrive and get each element of
+  the target array (top-level, or under a key of the top-level object) as soon as
+  it closes
+- parse_json_lenient: parse a full completion, recovering from leading/trailing
+  prose and from a truncated final element
+"""
+
+import json
+from typing import Any, List, Optional
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def strip_code_fences(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        lines = text.splitlines()
+        if len(lines) >= 2 and lines[-1].strip().startswith("```"):
+            lines = lines[1:-1]
+        if lines and lines[0].strip().lower() == "json":
+            lines = lines[1:]
+        text = "\n".join(lines).strip()
+    return text
+
+
+class JsonArrayStream:
+    """Incrementally extract elements of a JSON array from streamed text.
+
+    With key=None the first top-level array is the target; with key="utterances"
+    the array under that key of the top-level object is. Only object/array
+    elements are emitted (cards, tasks and utterances are all objects). Text
+    outside the JSON value, such as code fences or prose, is ignored.
+    """
+
+    def __init__(self, key: Optional[str] = None):
+        self.key = key
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._target_depth: Optional[int] = None
+        self._elem_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Add text; return the elements completed by it (possibly none)."""
+        self._buf += chunk
+        out: List[Any] = []
+        buf = self._buf
+        i = self._pos
+        while i < len(buf) and not self.done:
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._last_string = buf[self._string_start + 1:i]
+            elif c == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = i
+            elif c == ":" and len(self._stack) == 1:
+                self._current_key = self._last_string
+            elif c in "{[":
+                depth = len(self._stack)
+                if depth == 0 and not self._accepts_root(c):
+                    i += 1
+                    continue
+                if self._target_depth is not None and depth == self._target_depth and self._elem_start is None:
+                    self._elem_start = i
+                self._stack.append(c)
+                if self._target_depth is None and c == "[" and self._is_target(depth):
+                    self._target_depth = depth + 1
+            elif c in "}]" and self._stack:
+                self._stack.pop()
+                depth = len(self._stack)
+                if self._target_depth is not None:
+                    if depth == self._target_depth and self._elem_start is not None:
+                        try:
+                            out.append(json.loads(buf[self._elem_start:i + 1]))
+                        except json.JSONDecodeError:
+                            pass
+                        self._elem_start = None
+                    elif depth == self._target_depth - 1:
+                        self.done = True
+                if not self._stack and self._target_depth is None:
+                    # Root closed without containing the target; wait for another root.
+                    self._current_key = None
+            i += 1
+        self._pos = i
+        return out
+
+    def _accepts_root(self, c: str) -> bool:
+        return c == ("[" if self.key is None else "{")
+
+    def _is_target(self, depth: int) -> bool:
+        if self.key is None:
+            return depth == 0
+        return depth == 1 and self._current_key == self.key
+
+
+def _repair_truncated(text: str) -> Any:
+    """Cut a truncated JSON value back to its last complete element and close it.
+
+    Only commas that separate whole array elements or object members are cut
+    points: a comma inside an array element would keep half of that element.
+    """
+    stack: List[str] = []
+    cut_points = []  # (index of ',' , open containers at that point)
+    in_string = escape = False
+    for i, c in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append(c)
+        elif c in "}]":
+            if stack:
+                stack.pop()
+        elif c == "," and stack and "[" not in stack[:-1]:
+            cut_points.append((i, list(stack)))
+    for idx, open_stack in reversed(cut_points):
+        candidate = text[:idx] + "".join(_CLOSERS[o] for o in reversed(open_stack))
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("could not recover a complete JSON prefix")
+
+
+def parse_json_lenient(content: str, expect: type = list) -> Any:
+    """Parse model output as JSON, tolerating fences, surrounding prose and truncation.
+
+    expect is list or dict and decides where the value starts. Raises ValueError
+    when nothing usable can be recovered.
+    """
+    cleaned = strip_code_fences(content or "")
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError as exc:
+        first_error = exc
+
+    opener = "[" if expect is list else "{"
+    start = cleaned.find(opener)
+    if start == -1:
+        raise ValueError(f"Model did not return valid JSON: {first_error}")
+    try:
+        value, _ = json.JSONDecoder().raw_decode(cleaned[start:])
+        return value
+    except json.JSONDecodeError:
+        pass
+    try:
+        return _repair_truncated(cleaned[start:])
+    except ValueError:
+        raise ValueError(f"Model did not return valid JSON: {first_error}") from first_error
@@ -0,0 +1,180 @@
+"""Content-addressed cache for LLM completions.
+
+Entries are keyed by a hash of the normalized message list plus the generation
+parameters, so a clinician refreshing a screen gets the previous completion back
+instead of spending another Featherless slot. Two tiers:
+
+- a bounded in-memory LRU (always on when the cache is enabled)
+- an optional SQLite file (LLM_CACHE_PATH) that survives restarts, with TTL and
+  row-count eviction
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _normalize_content(content: str) -> str:
+    # Prompts are built from indented f-strings; indentation changes should not bust the cache.
+    return "\n".join(line.strip() for line in (content or "").strip().splitlines())
+
+
+def make_cache_key(
+    messages: List[Dict[str, str]],
+    model: str,
+    max_tokens: int,
+    temperature: float,
+) -> str:
+    payload = {
+        "messages": [
+            {"role": m.get("role", ""), "content": _normalize_content(m.get("content", ""))}
+            for m in messages
+        ],
+        "model": model,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600,
+        db_path: Optional[str] = None,
+        db_max_entries: int = 5000,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.db_max_entries = db_max_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        if db_path:
+            self._open_db(db_path)
+
+    @property
+    def has_disk_tier(self) -> bool:
+        return self._db is not None
+
+    def _open_db(self, path: str) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, expires_at = row
+                    if expires_at > now:
+                        self._db.execute(
+                            "UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+                        self._remember(key, value, expires_at)
+                        self.counters["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.counters["misses"] += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        if not value:
+            return
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self.counters["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now),
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _evict_disk(self, now: float) -> None:
+        cur = self._db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        self.counters["evictions"] += max(cur.rowcount, 0)
+        (count,) = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.db_max_entries
+        if overflow > 0:
+            cur = self._db.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.counters["evictions"] += max(cur.rowcount, 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            lookups = hits + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_enabled": self._db is not None,
+            }
+
+
+def _cache_from_env() -> Optional[LLMCache]:
+    if os.getenv("LLM_CACHE_ENABLED", "1").lower() in {"0", "false", "no"}:
+        return None
+    return LLMCache(
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256")),
+        ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "3600")),
+        db_path=os.getenv("LLM_CACHE_PATH") or None,
+        db_max_entries=int(os.getenv("LLM_CACHE_DB_MAX_ENTRIES", "5000")),
+    )
+
+
+llm_cache = _cache_from_env()
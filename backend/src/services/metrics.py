@@ -0,0 +1,183 @@
+"""In-process metrics with Prometheus text export.
+
+Covers LLM calls (queue wait vs. model time, tokens), repository calls, and
+generator stages such as prompt building and JSON parsing. Series are labeled by
+route and generator. Per-request spans are also collected for the optional
+Server-Timing header (SERVER_TIMING=1).
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+current_route: contextvars.ContextVar[str] = contextvars.ContextVar("current_route", default="none")
+# Spans for the current request as (name, seconds); None outside a request.
+request_spans: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "request_spans", default=None
+)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts, sum, count)
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            counts, total, n = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(counts):
+                counts[idx] += 1
+            self._values[key] = (counts, total + value, n + 1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, n) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, c in zip(self.buckets, counts):
+                    cumulative += c
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {n}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {n}")
+        return lines
+
+
+http_request_seconds = Histogram(
+    "http_request_seconds", "HTTP request latency until response headers", ("route", "method", "status")
+)
+llm_queue_wait_seconds = Histogram(
+    "llm_queue_wait_seconds", "Time spent waiting for an LLM concurrency slot", ("route", "generator", "model")
+)
+llm_request_seconds = Histogram(
+    "llm_request_seconds", "Model time for one LLM call", ("route", "generator", "model")
+)
+llm_requests_total = Counter(
+    "llm_requests_total", "LLM calls by outcome (ok, error, cache_hit, coalesced)", ("route", "generator", "model", "outcome")
+)
+llm_tokens_total = Counter(
+    "llm_tokens_total", "Tokens reported in response.usage", ("route", "generator", "model", "kind")
+)
+llm_resilience_events_total = Counter(
+    "llm_resilience_events_total",
+    "Retries, timeouts, open-circuit rejections, hedges and fallbacks",
+    ("generator", "model", "event"),
+)
+diarization_segments_total = Counter(
+    "diarization_segments_total", "Transcript sentences by who labeled them (tag, rules, llm)", ("source",)
+)
+db_call_seconds = Histogram("db_call_seconds", "Repository call latency", ("backend", "operation"))
+stage_seconds = Histogram(
+    "stage_seconds", "Generator stage latency (prompt_build, json_parse, ...)", ("route", "generator", "stage")
+)
+
+REGISTRY = [
+    http_request_seconds,
+    llm_queue_wait_seconds,
+    llm_request_seconds,
+    llm_requests_total,
+    llm_tokens_total,
+    llm_resilience_events_total,
+    diarization_segments_total,
+    db_call_seconds,
+    stage_seconds,
+]
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def add_span(name: str, seconds: float) -> None:
+    spans = request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+@contextmanager
+def time_stage(stage: str, generator: str) -> Iterator[None]:
+    """Time a generator stage such as prompt building or JSON parsing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, route=current_route.get(), generator=generator, stage=stage)
+        add_span(stage, elapsed)
+
+
+def record_llm_usage(generator: str, model: str, usage) -> None:
+    """Count prompt/completion tokens from an OpenAI usage object or dict."""
+    if usage is None:
+        return
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+    route = current_route.get()
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            llm_tokens_total.inc(usage[kind], route=route, generator=generator, model=model, kind=kind[: -len("_tokens")])
+
+
+def server_timing_header(spans: List[Tuple[str, float]], total: float) -> str:
+    """Aggregate spans by name into a Server-Timing header value (durations in ms)."""
+    totals: Dict[str, float] = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
@@ -1,41 +1,117 @@
-""" mock database for testing purposes  - loads users and EMR reports from json files """
+""" mock database for testing purposes  - loads users and EMR reports from json files
+
+Each file is parsed once into a dict index and re-read only when its mtime changes,
+so lookups are O(1) with no per-request file I/O. Exposes the same functions as
+emr_repo/users_repo (sync and *_async) so it can stand in for Supabase.
+"""
 
 import json
+import os
+import threading
 from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+from .emr_repo import _map_emr_row
 
 DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
-USERS_PATH = DATA_DIR / 'mock_users.json'
-EMR_REPORTS_PATH = DATA_DIR / 'mock_emr_reports.json'
+USERS_PATH = Path(os.getenv('MOCK_USERS_PATH') or DATA_DIR / 'mock_users.json')
+EMR_REPORTS_PATH = Path(os.getenv('MOCK_EMR_REPORTS_PATH') or DATA_DIR / 'mock_emr_reports.json')
 
 def load_json(path: str):
     """ load json file from path and return as dict """
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
     with open(path, 'r') as f:
         return json.load(f)
-    
+
+
+def _map_mock_user(row: Dict[str, Any]) -> Dict[str, Any]:
+    # Same shape as users_repo._map_user_row output
+    return {
+        "id": row.get("id"),
+        "name": row.get("name"),
+        "dateOfBirth": row.get("dateOfBirth") or row.get("date_of_birth"),
+        "role": row.get("role") or "client",
+    }
+
+
+class IndexedJsonFile:
+    """ JSON array file indexed by one key, reloaded when the file's mtime changes """
+
+    def __init__(self, path: Path, key: str, mapper=None):
+        self.path = path
+        self.key = key
+        self.mapper = mapper
+        self._mtime_ns: Optional[int] = None
+        self._rows: List[Dict[str, Any]] = []
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _refresh(self) -> None:
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        if mtime_ns == self._mtime_ns:
+            return
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return
+            rows = load_json(self.path)
+            if self.mapper is not None:
+                rows = [self.mapper(r) for r in rows]
+            # First row wins on duplicate keys, matching the old linear scan.
+            index: Dict[str, Dict[str, Any]] = {}
+            for row in rows:
+                index.setdefault(row.get(self.key), row)
+            self._rows, self._index, self._mtime_ns = rows, index, mtime_ns
+            self.loads += 1
+
+    def all(self) -> List[Dict[str, Any]]:
+        self._refresh()
+        return [dict(r) for r in self._rows]
+
+    def get(self, key_value: str) -> Optional[Dict[str, Any]]:
+        self._refresh()
+        row = self._index.get(key_value)
+        return dict(row) if row is not None else None
+
+
+_users = IndexedJsonFile(USERS_PATH, 'id', _map_mock_user)
+_emr_reports = IndexedJsonFile(EMR_REPORTS_PATH, 'user_id', _map_emr_row)
+
 def get_users() -> list:
     """ get users from json file """
-    return load_json(USERS_PATH)
+    return sorted(_users.all(), key=lambda u: u.get('id') or '')
 
 def get_emr_by_user_id(user_id: str) -> dict|None:
     """ get EMR report for user by user id """
-    emr_reports = load_json(EMR_REPORTS_PATH)
-    for report in emr_reports:
-        if report.get('user_id') == user_id:
-            return report
-    return None
+    return _emr_reports.get(user_id)
+
+def get_visit_notes(user_id: str) -> list:
+    """ get visit-note history for user, oldest first (the mock data holds one note per patient) """
+    emr = _emr_reports.get(user_id)
+    if not emr or not emr.get('visit_notes'):
+        return []
+    return [{"id": 1, "visit_date": emr.get('last_visit'), "note": emr['visit_notes']}]
 
 def get_user_by_id(user_id: str) -> dict|None:
     """ get user by user id """
-    users = load_json(USERS_PATH)
-    for user in users:
-        if user['id'] == user_id:
-            return user
-    return None
+    return _users.get(user_id)
 
 def get_report_by_user_id(user_id: str) -> dict|None:
     """ get report by user id """
-    reports = load_json(EMR_REPORTS_PATH)
-    for report in reports:
-        if report.get('user_id') == user_id:
-            return report
-    return None
\ No newline at end of file
+    return _emr_reports.get(user_id)
+
+async def get_users_async() -> list:
+    return get_users()
+
+async def get_emr_by_user_id_async(user_id: str) -> dict|None:
+    return get_emr_by_user_id(user_id)
+
+async def get_user_by_id_async(user_id: str) -> dict|None:
+    return get_user_by_id(user_id)
@@ -0,0 +1,82 @@
+"""Which model each generator uses.
+
+Structured, low-stakes jobs (speaker labeling, tasks, cards from text) go to the
+small tier; clinical notes and reports stay on the large tier. Each generator has
+its own max_tokens. JSON generators on
+the small tier are retried on the large tier when their output fails validation
+(see ai_service.send_json_async).
+
+Featherless concurrency is one budget of units per account, shared by every
+model: a request holds its model's unit cost until it finishes (on the default
+plan the budget is 4 units, i.e. one large-model request at a time).
+LLM_CONCURRENCY is how many large-model requests fit in the budget;
+LLM_CONCURRENCY_UNITS sets the budget directly.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict
+
+LLM_CONCURRENCY = max(1, int(os.getenv("LLM_CONCURRENCY", "1")))
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    name: str
+    model: str
+    units: int  # concurrency units one request to this model holds
+
+
+@dataclass(frozen=True)
+class GeneratorRoute:
+    tier: str
+    max_tokens: int
+
+
+TIERS: Dict[str, ModelTier] = {
+    "large": ModelTier(
+        "large",
+        os.getenv("LLM_LARGE_MODEL", "deepseek-ai/DeepSeek-V3-0324"),
+        max(1, int(os.getenv("LLM_LARGE_UNITS", "4"))),
+    ),
+    # Set LLM_SMALL_MODEL to the large model to route everything to one model.
+    "small": ModelTier(
+        "small",
+        os.getenv("LLM_SMALL_MODEL", "meta-llama/Meta-Llama-3.1-8B-Instruct"),
+        max(1, int(os.getenv("LLM_SMALL_UNITS", "1"))),
+    ),
+}
+
+LLM_CONCURRENCY_UNITS = max(1, int(os.getenv("LLM_CONCURRENCY_UNITS", str(LLM_CONCURRENCY * TIERS["large"].units))))
+
+ROUTES: Dict[str, GeneratorRoute] = {
+    "transcript": GeneratorRoute("small", 4000),
+    "diarization": GeneratorRoute("small", 1000),
+    "transcript_summary": GeneratorRoute("small", 120),
+    "tasks": GeneratorRoute("small", 800),
+    "questions_from_text": GeneratorRoute("small", 2000),
+    "questions": GeneratorRoute("large", 2000),
+    "summary": GeneratorRoute("large", 600),
+    # 350-550 words needs ~750 tokens; the old 500 cut reports off mid-section.
+    "report": GeneratorRoute("large", 900),
+    "emr": GeneratorRoute("large", 2000),
+}
+
+DEFAULT_ROUTE = GeneratorRoute("large", 500)
+DEFAULT_MODEL = TIERS["large"].model
+
+
+def get_route(generator: str) -> GeneratorRoute:
+    return ROUTES.get(generator, DEFAULT_ROUTE)
+
+
+def model_for(generator: str) -> str:
+    return TIERS[get_route(generator).tier].model
+
+
+def units_for(model: str) -> int:
+    """Units one request to model holds; models outside the tier table (e.g. a
+    resilience fallback) are assumed to cost as much as the large tier."""
+    costs = [tier.units for tier in TIERS.values() if tier.model == model]
+    units = max(costs) if costs else TIERS["large"].units
+    return min(units, LLM_CONCURRENCY_UNITS)
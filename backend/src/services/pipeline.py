@@ -0,0 +1,122 @@
+"""Small async stage engine for multi-step generation.
+
+Each stage declares the stages it depends on and starts as soon as those finish,
+so independent stages overlap instead of running back to back. Per-stage
+wall-clock timings are recorded for the response.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .progress_summary_generator import generate_progress_summary
+from .question_generator import generate_questions_from_emr_text
+from .task_generator import generate_clinician_tasks
+from .transcript_processor import TranscriptSession, process_transcript
+from .transcript_to_emr import format_dialogue, generate_emr_from_transcript
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    deps: Tuple[str, ...] = ()
+    # Optional stages report their error instead of failing the whole pipeline.
+    optional: bool = False
+
+
+@dataclass
+class PipelineResult:
+    results: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    timings_ms: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+class StageSkipped(Exception):
+    pass
+
+
+async def run_pipeline(stages: List[Stage]) -> PipelineResult:
+    """Run stages as their dependencies complete. Raises the first required-stage error."""
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate pipeline stages: {sorted({n for n in names if names.count(n) > 1})}")
+    out = PipelineResult()
+    started = time.perf_counter()
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run_stage(stage: Stage) -> Any:
+        for dep in stage.deps:
+            try:
+                await tasks[dep]
+            except Exception as e:
+                raise StageSkipped(f"dependency {dep!r} failed") from e
+        begin = time.perf_counter()
+        try:
+            value = await stage.run(out.results)
+        finally:
+            end = time.perf_counter()
+            out.timings_ms[stage.name] = {
+                "start": round((begin - started) * 1000, 1),
+                "duration": round((end - begin) * 1000, 1),
+            }
+        out.results[stage.name] = value
+        return value
+
+    for stage in stages:
+        tasks[stage.name] = asyncio.create_task(run_stage(stage))
+
+    try:
+        for stage in stages:
+            try:
+                await tasks[stage.name]
+            except Exception as e:
+                if not stage.optional:
+                    raise
+                out.errors[stage.name] = str(e)
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    out.timings_ms["total"] = {"start": 0.0, "duration": round((time.perf_counter() - started) * 1000, 1)}
+    return out
+
+
+VISIT_DOWNSTREAM_STAGES = ("cards", "tasks", "summary")
+
+
+def visit_pipeline_stages(
+    raw_transcript: str = "",
+    session: Optional[TranscriptSession] = None,
+    downstream: Tuple[str, ...] = (),
+) -> List[Stage]:
+    """Stages for the post-visit pipeline.
+
+    EMR notes start once utterances are labeled. Cards, tasks and the progress summary
+    work from the labeled dialogue, so they run alongside EMR generation instead of after it.
+    """
+
+    async def process(results):
+        if session is not None:
+            return await session.finalize(raw_transcript)
+        return await process_transcript(raw_transcript=raw_transcript)
+
+    async def emr(results):
+        return await generate_emr_from_transcript(processed=results["process"])
+
+    async def cards(results):
+        return await generate_questions_from_emr_text(emr_text=format_dialogue(results["process"]))
+
+    async def tasks(results):
+        return await generate_clinician_tasks(emr_text=format_dialogue(results["process"]), agreed_items=[])
+
+    async def summary(results):
+        return await generate_progress_summary(emr_text=format_dialogue(results["process"]))
+
+    optional = {"cards": cards, "tasks": tasks, "summary": summary}
+    stages = [Stage("process", process), Stage("emr", emr, deps=("process",))]
+    for name in dict.fromkeys(downstream):
+        if name not in optional:
+            raise ValueError(f"Unknown pipeline stage: {name!r} (expected one of {list(VISIT_DOWNSTREAM_STAGES)})")
+        stages.append(Stage(name, optional[name], deps=("process",), optional=True))
+    return stages
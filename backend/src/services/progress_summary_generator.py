@@ -2,20 +2,35 @@
 
 from typing import Any, Dict, List, Optional
 
-from .ai_service import send_msg
+from .generator import Generator
+from .prompting import TOKEN_BUDGETS, truncate_to_tokens
 
 
-def generate_progress_summary(
+NO_CONTEXT_SUMMARY = "No EMR or agreed items yet. Select a client and agree on cards to generate a progress summary."
+
+
+SUMMARY_SYSTEM_PROMPT = """You are a clinical documentation assistant. Write a concise progress summary for a clinician. Use the EMR and agreed items (topics the patient/clinician flagged for attention) provided by the user. Be professional, factual, and highlight what matters most for follow-up. Do not invent information. If data is sparse, say so. Output 2-4 short paragraphs. No markdown, no section headers.
+
+Write a brief progress summary (2-4 paragraphs) that a clinician can quickly scan. Focus on:
+- Current status and key concerns
+- What to watch based on agreed items
+- Any gaps or areas needing follow-up"""
+
+
+def build_progress_summary_prompt(
     emr_text: Optional[str] = None,
     agreed_items: Optional[List[Dict[str, Any]]] = None,
-) -> str:
-    """Generate a clinician-facing progress summary from EMR and items the user agreed need attention."""
+) -> Optional[str]:
+    """Build the user prompt for a progress summary, or None when there is nothing to summarize."""
     agreed_items = agreed_items or []
 
     if not emr_text and not agreed_items:
-        return "No EMR or agreed items yet. Select a client and agree on cards to generate a progress summary."
+        return None
 
-    emr_block = emr_text.strip() if emr_text and emr_text.strip() else "No EMR on file."
+    if emr_text and emr_text.strip():
+        emr_block = truncate_to_tokens(emr_text, TOKEN_BUDGETS["summary"]["emr_text"])
+    else:
+        emr_block = "No EMR on file."
     agreed_block = ""
     if agreed_items:
         lines = []
@@ -26,16 +41,7 @@ def generate_progress_summary(
             lines.append(f"{i}. {title} ({severity}): {detail}")
         agreed_block = "\n".join(lines)
 
-    system_prompt = (
-        "You are a clinical documentation assistant. Write a concise progress summary for a clinician. "
-        "Use the EMR and agreed items (topics the patient/clinician flagged for attention). "
-        "Be professional, factual, and highlight what matters most for follow-up. "
-        "Do not invent information. If data is sparse, say so. "
-        "Output 2-4 short paragraphs. No markdown, no section headers."
-    )
-
-    user_prompt = f"""
-EMR / Clinical context:
+    return f"""EMR / Clinical context:
 \"\"\"
 {emr_block}
 \"\"\"
@@ -44,17 +50,28 @@ Items agreed as needing attention:
 \"\"\"
 {agreed_block if agreed_block else "None yet."}
 \"\"\"
-
-Write a brief progress summary (2-4 paragraphs) that a clinician can quickly scan. Focus on:
-- Current status and key concerns
-- What to watch based on agreed items
-- Any gaps or areas needing follow-up
 """
 
-    return send_msg(
-        [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=600,
-    )
+
+SUMMARY = Generator(
+    "summary",
+    SUMMARY_SYSTEM_PROMPT,
+    build_progress_summary_prompt,
+    on_empty=lambda: NO_CONTEXT_SUMMARY,
+)
+
+
+def build_progress_summary_messages(
+    emr_text: Optional[str] = None,
+    agreed_items: Optional[List[Dict[str, Any]]] = None,
+) -> Optional[List[Dict[str, str]]]:
+    """Build the chat messages for a progress summary, or None when there is nothing to summarize."""
+    return SUMMARY.messages(emr_text, agreed_items)
+
+
+async def generate_progress_summary(
+    emr_text: Optional[str] = None,
+    agreed_items: Optional[List[Dict[str, Any]]] = None,
+) -> str:
+    """Generate a clinician-facing progress summary from EMR and items the user agreed need attention."""
+    return await SUMMARY.run(emr_text, agreed_items)
@@ -0,0 +1,127 @@
+"""Prompt assembly helpers: stable prefixes and token budgets.
+
+Generators keep their instructions in module-level system prompts that never vary
+between calls, and put only patient data in the user message. Providers that cache
+prompt prefixes can then reuse the instruction tokens across requests.
+
+Patient context is trimmed to a per-generator token budget so input size stays
+bounded as visit notes grow.
+
+Budgets are estimates, not exact counts for the served models: tiktoken is an
+optional dependency (not in requirements.txt) and its cl100k_base encoding is not
+the Llama/DeepSeek tokenizer anyway. Without it, tokens are estimated at
+CHARS_PER_TOKEN characters each, which over-counts typical English (about 4
+characters per token) so the budgets keep some headroom for denser clinical text.
+"""
+
+import math
+from typing import Any, Dict, List
+
+from .emr_repo import format_emr_report_as_text
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # optional; fall back to a character heuristic
+    _encoding = None
+
+# Conservative: English prose averages ~4 chars/token, numbers and drug names fewer.
+CHARS_PER_TOKEN = 3
+
+# Input-token budgets for the variable part of each generator's prompt.
+TOKEN_BUDGETS: Dict[str, Dict[str, int]] = {
+    "questions": {"emr": 1200, "transcript_emr": 1500},
+    "questions_from_text": {"emr_text": 2000},
+    "report": {"emr": 1500},
+    "tasks": {"emr_text": 1500},
+    "summary": {"emr_text": 2000},
+    "transcript_summary": {"dialogue": 3000},
+    "emr": {"dialogue": 6000, "clinician_questions": 500, "client_responses": 500, "summary": 200},
+}
+
+TRUNCATION_MARKER = "[... earlier content omitted ...]"
+# Lists are cut to this many entries before any further trimming of notes.
+MAX_LIST_ITEMS = {"alerts": 10, "medications": 20, "conditions": 20, "procedures": 10}
+
+
+def count_tokens(text: str) -> int:
+    """Estimated token count for budgeting (cl100k_base with tiktoken, CHARS_PER_TOKEN otherwise)."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "tail") -> str:
+    """Trim text to about max_tokens.
+
+    keep="tail" keeps the most recent (last) part, "head" the first part, and
+    "middle" drops the middle, keeping the opening and the close of the text.
+    """
+    text = (text or "").strip()
+    if count_tokens(text) <= max_tokens:
+        return text
+    if keep == "middle":
+        head = truncate_to_tokens(text, max_tokens // 2, keep="head").rsplit("\n", 1)[0]
+        tail = truncate_to_tokens(text, max_tokens - max_tokens // 2, keep="tail").split("\n", 1)[1]
+        return f"{head}\n{TRUNCATION_MARKER}\n{tail}"
+    if _encoding is not None:
+        tokens = _encoding.encode(text)
+        kept = tokens[-max_tokens:] if keep == "tail" else tokens[:max_tokens]
+        body = _encoding.decode(kept)
+    else:
+        chars = max_tokens * CHARS_PER_TOKEN
+        body = text[-chars:] if keep == "tail" else text[:chars]
+    # Don't start or end on half a word.
+    if keep == "tail" and " " in body:
+        body = body.split(" ", 1)[1]
+    elif keep != "tail" and " " in body:
+        body = body.rsplit(" ", 1)[0]
+    return f"{TRUNCATION_MARKER}\n{body}" if keep == "tail" else f"{body}\n[... truncated ...]"
+
+
+def fit_list_to_tokens(items: List[Any], max_tokens: int) -> List[Any]:
+    """Keep leading items while their text fits max_tokens; the rest become "(+N more)"."""
+    kept: List[Any] = []
+    used = 0
+    for item in items:
+        cost = count_tokens(str(item)) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(item)
+        used += cost
+    if len(kept) < len(items):
+        kept.append(f"(+{len(items) - len(kept)} more)")
+    return kept
+
+
+def fit_emr_to_budget(emr_report: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
+    """Return a copy of emr_report whose text form fits max_tokens.
+
+    Long lists are capped first, then visit notes are cut from the front so the
+    most recent notes survive.
+    """
+    fitted = dict(emr_report)
+    if count_tokens(format_emr_report_as_text(fitted)) <= max_tokens:
+        return fitted
+
+    for key, limit in MAX_LIST_ITEMS.items():
+        items = fitted.get(key) or []
+        if len(items) > limit:
+            fitted[key] = list(items[:limit]) + [f"(+{len(items) - limit} more)"]
+
+    notes = fitted.get("visit_notes") or fitted.get("visitNotes") or ""
+    overflow = count_tokens(format_emr_report_as_text(fitted)) - max_tokens
+    if overflow > 0 and notes:
+        fitted.pop("visitNotes", None)
+        fitted["visit_notes"] = truncate_to_tokens(notes, max(count_tokens(notes) - overflow, 50))
+    return fitted
+
+
+def chat_messages(system_prompt: str, user_content: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content},
+    ]
@@ -1,97 +1,73 @@
-import json
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from .ai_service import send_msg
 from .emr_repo import format_emr_report_as_text
+from .generator import Generator, JsonArray
+from .prompting import TOKEN_BUDGETS, fit_emr_to_budget, truncate_to_tokens
 
-def _strip_code_fences(text: str) -> str:
-    text = text.strip()
-    if text.startswith("```"):
-        lines = text.splitlines()
-        if len(lines) >= 2 and lines[-1].strip().startswith("```"):
-            lines = lines[1:-1]
-        if lines and lines[0].strip().lower() == "json":
-            lines = lines[1:]
-        text = "\n".join(lines).strip()
-    return text
-
-def generate_questions(emr_report: Dict[str, Any], transcript_emr: str) -> List[Dict[str, Any]]:
+CARD_REQUIRED_FIELDS = {"id", "title", "description"}
+# A reply with any card missing a required field fails validation (and goes to the large tier).
+CARD_SCHEMA = JsonArray(CARD_REQUIRED_FIELDS, item="card")
+
+
+CARDS_SYSTEM_PROMPT = """You are a clinical follow-up question generator and diagnostic assistant for post-visit after care. Output MUST be a valid JSON array only. Do not include markdown, code fences, commentary, or trailing text. Do not invent diagnoses, labs, or medications not present in the inputs. Focus on actionable follow-up and patient safety.
+
+Task:
+Generate follow-up aftercare cards/questions using both EMR sources provided by the user: a Structured EMR Report and Transcript-Derived EMR Notes.
+
+Requirements:
+- Return as many cards as needed.
+- Every card must be a yes/no question relevant to the patient context.
+- Prioritize high-risk and time-sensitive issues first.
+- Questions must be specific, plain language, and patient-facing.
+- Avoid duplicate or overlapping questions.
+- Reconcile both sources; if details conflict, prefer safer follow-up questions.
+
+Output format:
+Return ONLY a JSON array of objects with exactly these keys:
+- id: string (format "q1", "q2", ...)
+- title: string (short yes/no question, max 80 chars, ends with "?")
+- description: string (1 sentence, what to check/ask)
+- rationale: string (1 sentence, why this matters clinically)
+- category: string (one of: "medication", "symptom", "red_flag", "recovery", "follow_up")
+
+Quality rules:
+- Include at least 1 card in category "red_flag" when EMR suggests any potential complication.
+- Use clinically meaningful distinctions (e.g., worsening SOB vs mild stable SOB).
+- Keep each field concise and non-redundant.
+- If inputs lack detail, still generate conservative, general follow-up cards without fabricating facts."""
+
+def build_questions_prompt(emr_report: Dict[str, Any], transcript_emr: str) -> str:
     if not emr_report:
         raise ValueError("emr_report is required")
     if not transcript_emr or not transcript_emr.strip():
         raise ValueError("transcript_emr is required")
 
-    emr_text = format_emr_report_as_text(emr_report)
-
-    system_prompt = (
-        "You are a clinical follow-up question generator and diagnostic assistant for post-visit after care. "
-        "Output MUST be a valid JSON array only. "
-        "Do not include markdown, code fences, commentary, or trailing text. "
-        "Do not invent diagnoses, labs, or medications not present in the inputs. "
-        "Focus on actionable follow-up and patient safety."
-    )
-
-    user_prompt = f"""
-    Task:
-    Generate follow-up aftercare cards/questions using both EMR sources.
-
-    Structured EMR Report:
-    \"\"\"{emr_text}\"\"\"
-
-    Transcript-Derived EMR Notes:
-    \"\"\"{transcript_emr.strip()}\"\"\"
-
-    Requirements:
-    - Return as many cards as needed.
-    - Every card must be a yes/no question relevant to the patient context.
-    - Prioritize high-risk and time-sensitive issues first.
-    - Questions must be specific, plain language, and patient-facing.
-    - Avoid duplicate or overlapping questions.
-    - Reconcile both sources; if details conflict, prefer safer follow-up questions.
-
-    Output format:
-    Return ONLY a JSON array of objects with exactly these keys:
-    - id: string (format "q1", "q2", ...)
-    - title: string (short yes/no question, max 80 chars, ends with "?")
-    - description: string (1 sentence, what to check/ask)
-    - rationale: string (1 sentence, why this matters clinically)
-    - category: string (one of: "medication", "symptom", "red_flag", "recovery", "follow_up")
-
-    Quality rules:
-    - Include at least 1 card in category "red_flag" when EMR suggests any potential complication.
-    - Use clinically meaningful distinctions (e.g., worsening SOB vs mild stable SOB).
-    - Keep each field concise and non-redundant.
-    - If inputs lack detail, still generate conservative, general follow-up cards without fabricating facts.
-    """
+    budget = TOKEN_BUDGETS["questions"]
+    emr_text = format_emr_report_as_text(fit_emr_to_budget(emr_report, budget["emr"]))
+    transcript_text = truncate_to_tokens(transcript_emr, budget["transcript_emr"])
 
-    content = send_msg(
-        [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=2000,
-    )
+    return f"""Structured EMR Report:
+\"\"\"{emr_text}\"\"\"
 
-    return _parse_cards(content)
+Transcript-Derived EMR Notes:
+\"\"\"{transcript_text}\"\"\"
+"""
 
 
-def generate_questions_from_emr_text(emr_text: str) -> List[Dict[str, Any]]:
-    """Generate follow-up cards from raw EMR text (e.g., from formatted EMR or visit notes)."""
-    if not emr_text or not emr_text.strip():
-        raise ValueError("emr_text is required")
+QUESTIONS = Generator("questions", CARDS_SYSTEM_PROMPT, build_questions_prompt, output=CARD_SCHEMA, label="cards")
 
-    system_prompt = (
-        "You are a clinical follow-up question generator for post-visit after care. "
-        "Output MUST be a valid JSON array only. No markdown, no code fences, no commentary. "
-        "Do not invent diagnoses or medications not in the input. Focus on actionable follow-up."
-    )
 
-    user_prompt = f"""
-Generate follow-up aftercare cards from this EMR/clinical summary:
+def build_questions_messages(emr_report: Dict[str, Any], transcript_emr: str) -> List[Dict[str, str]]:
+    return QUESTIONS.messages(emr_report, transcript_emr)
 
-\"\"\"
-{emr_text.strip()}
-\"\"\"
+
+async def generate_questions(emr_report: Dict[str, Any], transcript_emr: str) -> List[Dict[str, Any]]:
+    return await QUESTIONS.run(emr_report, transcript_emr)
+
+
+CARDS_FROM_TEXT_SYSTEM_PROMPT = """You are a clinical follow-up question generator for post-visit after care. Output MUST be a valid JSON array only. No markdown, no code fences, no commentary. Do not invent diagnoses or medications not in the input. Focus on actionable follow-up.
+
+Generate follow-up aftercare cards from the EMR/clinical summary provided by the user.
 
 Requirements:
 - Return up to 6 cards as a JSON array.
@@ -104,33 +80,56 @@ Output format (JSON array only):
 - title: string (short question, ends with "?")
 - description: string (1–2 sentences, what to check/ask)
 - rationale: string (why this matters clinically)
-- category: string (one of: "medication", "symptom", "red_flag", "recovery", "follow_up")
+- category: string (one of: "medication", "symptom", "red_flag", "recovery", "follow_up")"""
+
+def build_questions_from_text_prompt(emr_text: str) -> str:
+    if not emr_text or not emr_text.strip():
+        raise ValueError("emr_text is required")
+
+    text = truncate_to_tokens(emr_text, TOKEN_BUDGETS["questions_from_text"]["emr_text"])
+    return f"""EMR/clinical summary:
+\"\"\"
+{text}
+\"\"\"
 """
 
-    content = send_msg(
-        [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=2000,
-    )
-
-    return _parse_cards(content)
-
-
-def _parse_cards(content: str) -> List[Dict[str, Any]]:
-    cleaned = _strip_code_fences(content)
-    try:
-        cards = json.loads(cleaned)
-    except Exception as exc:
-        raise ValueError(f"Model did not return valid JSON: {exc}") from exc
-    if not isinstance(cards, list):
-        raise ValueError("Model output must be a JSON array")
-    required = {"id", "title", "description"}
-    for i, card in enumerate(cards):
-        if not isinstance(card, dict):
-            raise ValueError(f"Card at index {i} is not an object")
-        missing = required - set(card.keys())
-        if missing:
-            raise ValueError(f"Card at index {i} missing fields: {sorted(missing)}")
-    return cards
\ No newline at end of file
+
+QUESTIONS_FROM_TEXT = Generator(
+    "questions_from_text", CARDS_FROM_TEXT_SYSTEM_PROMPT, build_questions_from_text_prompt, output=CARD_SCHEMA, label="cards"
+)
+
+
+def build_questions_from_text_messages(emr_text: str) -> List[Dict[str, str]]:
+    return QUESTIONS_FROM_TEXT.messages(emr_text)
+
+
+async def generate_questions_from_emr_text(emr_text: str) -> List[Dict[str, Any]]:
+    """Generate follow-up cards from raw EMR text (e.g., from formatted EMR or visit notes)."""
+    return await QUESTIONS_FROM_TEXT.run(emr_text)
+
+
+async def generate_questions_batch(
+    items: List[Tuple[str, str]],
+) -> AsyncIterator[Tuple[str, Optional[List[Dict[str, Any]]], Optional[str]]]:
+    """Generate cards for many (patient_id, emr_text) pairs concurrently.
+
+    Identical EMR texts are generated once. Yields (patient_id, cards, error) as each
+    distinct input finishes; concurrency is bounded by the LLM limiter in send_msg_async.
+    """
+    async for patient_id, cards, error in QUESTIONS_FROM_TEXT.batch(
+        [(patient_id, ((emr_text or "").strip(),)) for patient_id, emr_text in items]
+    ):
+        yield patient_id, cards, error
+
+
+async def stream_questions_from_emr_text(emr_text: str) -> AsyncIterator[Tuple[str, Any]]:
+    """Stream cards from raw EMR text as the model writes them.
+
+    Yields ("card", card) for each valid card as soon as its JSON object closes, then
+    ("done", {"cards": [...], "usage": ..., "cached": bool}).
+    """
+    async for kind, payload in QUESTIONS_FROM_TEXT.stream_items(emr_text):
+        if kind == "item":
+            yield "card", payload
+        else:
+            yield "done", {"cards": payload["items"], "usage": payload["usage"], "cached": payload["cached"]}
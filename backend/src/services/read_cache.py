@@ -0,0 +1,102 @@
+"""Read-through TTL cache for repository lookups.
+
+Misses go to the wrapped async loader; concurrent misses for the same key are
+coalesced so the database sees one round-trip. Entries are bounded (LRU) and
+expire individually; a missing row (None) is only remembered for
+negative_ttl_seconds. Writers call invalidate() after changing a row: the entry
+is dropped, a load already in flight is not cached, and later readers start a
+fresh load instead of joining it.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .singleflight import SingleFlight
+
+
+class ReadThroughCache:
+    def __init__(
+        self,
+        loader: Callable[[Hashable], Awaitable[Any]],
+        ttl_seconds: float = 30,
+        max_entries: int = 1024,
+        negative_ttl_seconds: float = 5,
+    ):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # key -> token of the load whose result may be cached; only keys being loaded.
+        self._loading: Dict[Hashable, object] = {}
+        self._flight = SingleFlight()
+        self.counters = {"hits": 0, "misses": 0, "loads": 0, "invalidations": 0}
+
+    async def get(self, key: Hashable, ttl_seconds: Optional[float] = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return value
+            del self._entries[key]
+
+        self.counters["misses"] += 1
+
+        async def load():
+            token = self._loading[key] = object()
+            self.counters["loads"] += 1
+            try:
+                value = await self.loader(key)
+                if self._loading.get(key) is token:
+                    self.set(key, value, ttl_seconds)
+                return value
+            finally:
+                if self._loading.get(key) is token:
+                    del self._loading[key]
+
+        return await self._flight.do(key, load)
+
+    def peek(self, key: Hashable) -> Any:
+        """Return the cached value if present and fresh, else None; never loads."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        if value is None:
+            ttl = self.negative_ttl_seconds
+        else:
+            ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        # The load in flight read the old row: don't cache it, and don't hand it to new readers.
+        self._loading.pop(key, None)
+        self._flight.forget(key)
+        self.counters["invalidations"] += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """invalidate() every cached or loading key for which predicate(key) is true."""
+        for key in [k for k in dict.fromkeys((*self._entries, *self._loading)) if predicate(k)]:
+            self.invalidate(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        for key in list(self._loading):
+            self._flight.forget(key)
+        self._loading.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "coalesced": self._flight.counters["coalesced"],
+            "entries": len(self._entries),
+        }
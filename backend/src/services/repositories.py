@@ -0,0 +1,331 @@
+"""Pluggable repository backends for users and EMR reports.
+
+REPO_BACKEND selects the implementation at startup:
+
+- supabase (default): live Supabase tables via emr_repo/users_repo
+- memory: mock_db JSON data held in process, no network
+- sqlite: local SQLite file (REPO_SQLITE_PATH), seeded from the mock data when empty
+
+The local backends let the full FastAPI stack be load-tested on one box.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from . import emr_repo, mock_db, users_repo
+from .metrics import add_span, db_call_seconds
+
+
+class Repository(ABC):
+    """Interface every backend implements. Methods return API-shaped dicts.
+
+    A backend missing any method fails when it is constructed."""
+
+    name = "base"
+
+    @abstractmethod
+    async def get_users(self) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get_users_page(self, limit: int, after: Optional[str] = None) -> Dict[str, Any]:
+        """Users ordered by id after the cursor: {"users": [...], "next_cursor": str | None}."""
+
+    @abstractmethod
+    async def get_users_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    async def get_emr_by_user_id(
+        self, user_id: str, columns: Optional[Sequence[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """EMR for a user; with columns, only those fields (see emr_repo.EMR_FIELDS)."""
+
+    @abstractmethod
+    async def get_visit_notes(self, user_id: str, limit: int, before: Optional[int] = None) -> Dict[str, Any]:
+        """One page of visit notes, newest first: {"notes": [...], "next_cursor": str | None}."""
+
+
+class SupabaseRepository(Repository):
+    name = "supabase"
+
+    async def get_users(self) -> List[Dict[str, Any]]:
+        return await users_repo.get_users_async()
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await users_repo.get_user_by_id_async(user_id)
+
+    async def get_users_page(self, limit: int, after: Optional[str] = None) -> Dict[str, Any]:
+        return await users_repo.get_users_page_async(limit, after)
+
+    async def get_users_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
+        return await users_repo.get_users_by_ids_async(ids)
+
+    async def get_emr_by_user_id(
+        self, user_id: str, columns: Optional[Sequence[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        return await emr_repo.get_emr_by_user_id_async(user_id, columns)
+
+    async def get_visit_notes(self, user_id: str, limit: int, before: Optional[int] = None) -> Dict[str, Any]:
+        return await emr_repo.get_visit_notes_async(user_id, limit, before)
+
+
+class InMemoryRepository(Repository):
+    name = "memory"
+
+    async def get_users(self) -> List[Dict[str, Any]]:
+        return mock_db.get_users()
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return mock_db.get_user_by_id(user_id)
+
+    async def get_users_page(self, limit: int, after: Optional[str] = None) -> Dict[str, Any]:
+        users = mock_db.get_users()
+        rows = [u for u in users if not after or (u["id"] or "") > after][: limit + 1]
+        next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+        return {"users": rows[:limit], "next_cursor": next_cursor}
+
+    async def get_users_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
+        found = (mock_db.get_user_by_id(i) for i in ids)
+        return sorted((u for u in found if u), key=lambda u: u["id"])
+
+    async def get_emr_by_user_id(
+        self, user_id: str, columns: Optional[Sequence[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        emr = mock_db.get_emr_by_user_id(user_id)
+        return emr_repo.project_emr(emr, columns) if emr else None
+
+    async def get_visit_notes(self, user_id: str, limit: int, before: Optional[int] = None) -> Dict[str, Any]:
+        notes = mock_db.get_visit_notes(user_id)
+        rows = [n for n in reversed(notes) if before is None or n["id"] < before]
+        return emr_repo.visit_notes_page(rows[: limit + 1], limit)
+
+
+_EMR_JSON_COLUMNS = ("conditions", "medications", "procedures", "vitals", "alerts")
+
+
+class SQLiteRepository(Repository):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        with self._lock:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS users (
+                    id TEXT PRIMARY KEY,
+                    name TEXT,
+                    date_of_birth TEXT,
+                    role TEXT
+                );
+                CREATE TABLE IF NOT EXISTS emr_reports (
+                    user_id TEXT PRIMARY KEY,
+                    last_visit TEXT,
+                    conditions TEXT,
+                    medications TEXT,
+                    procedures TEXT,
+                    vitals TEXT,
+                    visit_notes TEXT,
+                    alerts TEXT
+                );
+                CREATE TABLE IF NOT EXISTS emr_visit_notes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    visit_date TEXT,
+                    note TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS emr_visit_notes_user ON emr_visit_notes (user_id, id);
+                -- Same history rule as the Supabase migration: each new note is appended.
+                CREATE TRIGGER IF NOT EXISTS emr_reports_visit_note_insert AFTER INSERT ON emr_reports
+                WHEN coalesce(NEW.visit_notes, '') <> ''
+                BEGIN
+                    INSERT INTO emr_visit_notes (user_id, visit_date, note)
+                    VALUES (NEW.user_id, NEW.last_visit, NEW.visit_notes);
+                END;
+                CREATE TRIGGER IF NOT EXISTS emr_reports_visit_note_update AFTER UPDATE OF visit_notes ON emr_reports
+                WHEN coalesce(NEW.visit_notes, '') <> '' AND NEW.visit_notes IS NOT OLD.visit_notes
+                BEGIN
+                    INSERT INTO emr_visit_notes (user_id, visit_date, note)
+                    VALUES (NEW.user_id, NEW.last_visit, NEW.visit_notes);
+                END;
+                """
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM users").fetchone()
+            if count == 0:
+                self._seed()
+            (notes,) = self._conn.execute("SELECT COUNT(*) FROM emr_visit_notes").fetchone()
+            if notes == 0:
+                # Files created before the history table: start it from each chart's note.
+                self._conn.execute(
+                    "INSERT INTO emr_visit_notes (user_id, visit_date, note)"
+                    " SELECT user_id, last_visit, visit_notes FROM emr_reports"
+                    " WHERE visit_notes IS NOT NULL AND visit_notes != '' ORDER BY user_id"
+                )
+            self._conn.commit()
+
+    def _seed(self) -> None:
+        for u in mock_db.get_users():
+            self._conn.execute(
+                "INSERT INTO users (id, name, date_of_birth, role) VALUES (?, ?, ?, ?)",
+                (u["id"], u["name"], u["dateOfBirth"], u["role"]),
+            )
+        for u in mock_db.get_users():
+            emr = mock_db.get_emr_by_user_id(u["id"])
+            if not emr:
+                continue
+            self._conn.execute(
+                "INSERT INTO emr_reports (user_id, last_visit, conditions, medications, procedures,"
+                " vitals, visit_notes, alerts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    emr["user_id"],
+                    emr["last_visit"],
+                    json.dumps(emr["conditions"]),
+                    json.dumps(emr["medications"]),
+                    json.dumps(emr["procedures"]),
+                    json.dumps(emr["vitals"]),
+                    emr["visit_notes"],
+                    json.dumps(emr["alerts"]),
+                ),
+            )
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    @staticmethod
+    def _decode_emr(row: Dict[str, Any], columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        for c in _EMR_JSON_COLUMNS:
+            if row.get(c) is not None:
+                row[c] = json.loads(row[c])
+        return emr_repo._map_emr_row(row, columns)
+
+    async def get_users(self) -> List[Dict[str, Any]]:
+        rows = await asyncio.to_thread(self._query, "SELECT id, name, date_of_birth, role FROM users ORDER BY id")
+        return [users_repo._map_user_row(r) for r in rows]
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        rows = await asyncio.to_thread(
+            self._query, "SELECT id, name, date_of_birth, role FROM users WHERE id = ?", (user_id,)
+        )
+        return users_repo._map_user_row(rows[0]) if rows else None
+
+    async def get_users_page(self, limit: int, after: Optional[str] = None) -> Dict[str, Any]:
+        rows = await asyncio.to_thread(
+            self._query,
+            "SELECT id, name, date_of_birth, role FROM users WHERE id > ? ORDER BY id LIMIT ?",
+            (after or "", limit + 1),
+        )
+        return users_repo.users_page(rows, limit)
+
+    async def get_users_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        rows = await asyncio.to_thread(
+            self._query,
+            f"SELECT id, name, date_of_birth, role FROM users WHERE id IN ({placeholders}) ORDER BY id",
+            tuple(ids),
+        )
+        return [users_repo._map_user_row(r) for r in rows]
+
+    async def get_emr_by_user_id(
+        self, user_id: str, columns: Optional[Sequence[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        # columns come from emr_repo.parse_emr_fields, so they are known column names.
+        select = emr_repo._select_columns(columns)
+        rows = await asyncio.to_thread(
+            self._query, f"SELECT {select} FROM emr_reports WHERE user_id = ?", (user_id,)
+        )
+        return self._decode_emr(rows[0], columns) if rows else None
+
+    async def get_visit_notes(self, user_id: str, limit: int, before: Optional[int] = None) -> Dict[str, Any]:
+        sql = "SELECT id, visit_date, note FROM emr_visit_notes WHERE user_id = ?"
+        params: tuple = (user_id,)
+        if before is not None:
+            sql += " AND id < ?"
+            params += (before,)
+        rows = await asyncio.to_thread(self._query, sql + " ORDER BY id DESC LIMIT ?", params + (limit + 1,))
+        return emr_repo.visit_notes_page(rows, limit)
+
+
+class InstrumentedRepository(Repository):
+    """Wraps a backend and records per-call latency in db_call_seconds."""
+
+    def __init__(self, inner: Repository):
+        self.inner = inner
+        self.name = inner.name
+
+    async def _timed(self, operation: str, call):
+        start = time.perf_counter()
+        try:
+            return await call
+        finally:
+            elapsed = time.perf_counter() - start
+            db_call_seconds.observe(elapsed, backend=self.name, operation=operation)
+            add_span("db", elapsed)
+
+    async def get_users(self) -> List[Dict[str, Any]]:
+        return await self._timed("get_users", self.inner.get_users())
+
+    async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self._timed("get_user_by_id", self.inner.get_user_by_id(user_id))
+
+    async def get_users_page(self, limit: int, after: Optional[str] = None) -> Dict[str, Any]:
+        return await self._timed("get_users_page", self.inner.get_users_page(limit, after))
+
+    async def get_users_by_ids(self, ids: List[str]) -> List[Dict[str, Any]]:
+        return await self._timed("get_users_by_ids", self.inner.get_users_by_ids(ids))
+
+    async def get_emr_by_user_id(
+        self, user_id: str, columns: Optional[Sequence[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        return await self._timed("get_emr_by_user_id", self.inner.get_emr_by_user_id(user_id, columns))
+
+    async def get_visit_notes(self, user_id: str, limit: int, before: Optional[int] = None) -> Dict[str, Any]:
+        return await self._timed("get_visit_notes", self.inner.get_visit_notes(user_id, limit, before))
+
+
+_repository: Optional[Repository] = None
+
+
+def _build_repository() -> Repository:
+    backend = os.getenv("REPO_BACKEND", "supabase").strip().lower()
+    if backend == "supabase":
+        return SupabaseRepository()
+    if backend in ("memory", "mock"):
+        return InMemoryRepository()
+    if backend == "sqlite":
+        default_path = Path(__file__).resolve().parent.parent / "data" / "local_repo.sqlite3"
+        return SQLiteRepository(os.getenv("REPO_SQLITE_PATH") or str(default_path))
+    raise RuntimeError(f"Unknown REPO_BACKEND: {backend!r} (expected supabase, memory or sqlite)")
+
+
+def get_repository() -> Repository:
+    """Return the process-wide repository selected by REPO_BACKEND."""
+    global _repository
+    if _repository is None:
+        _repository = InstrumentedRepository(_build_repository())
+    return _repository
+
+
+def set_repository(repository: Optional[Repository]) -> None:
+    """Swap the active backend (benchmarks and fakes); None re-reads REPO_BACKEND."""
+    global _repository
+    _repository = InstrumentedRepository(repository) if repository is not None else None
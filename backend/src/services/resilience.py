@@ -0,0 +1,255 @@
+"""Retry, deadline, circuit-breaker and hedging policy for LLM calls.
+
+Each generator has a RetryPolicy (see POLICIES): an overall deadline, a per-attempt
+timeout, jittered exponential backoff on 429/5xx/connection errors, and optionally
+a fallback model that is used when the primary fails or its circuit is open, or
+raced against the primary ("hedged") once the primary is slower than hedge_after.
+Generators whose output must come from the primary model (EMR notes, reports)
+have no fallback.
+"""
+
+import asyncio
+import os
+import random
+import time
+from dataclasses import dataclass, replace
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import openai
+
+from .metrics import llm_resilience_events_total
+
+T = TypeVar("T")
+
+# Cheaper model used by generators that tolerate it; unset disables fallback and hedging.
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL") or None
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "90"))
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "45"))
+LLM_MAX_ATTEMPTS = max(1, int(os.getenv("LLM_MAX_ATTEMPTS", "3")))
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0")) or None
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a model's circuit is open and no fallback is allowed."""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    deadline_seconds: float = LLM_DEADLINE_SECONDS  # whole call, including retries and queueing
+    attempt_timeout: float = LLM_ATTEMPT_TIMEOUT_SECONDS
+    max_attempts: int = LLM_MAX_ATTEMPTS
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    fallback_model: Optional[str] = None
+    hedge_after: Optional[float] = None  # seconds; needs fallback_model
+
+
+_STRICT = RetryPolicy()
+_TOLERANT = RetryPolicy(fallback_model=LLM_FALLBACK_MODEL)
+
+POLICIES: Dict[str, RetryPolicy] = {
+    "emr": _STRICT,
+    "report": _STRICT,
+    "transcript": _STRICT,
+    "questions": _TOLERANT,
+    "questions_from_text": _TOLERANT,
+    "tasks": _TOLERANT,
+    "transcript_summary": _TOLERANT,
+    "summary": replace(_TOLERANT, hedge_after=LLM_HEDGE_AFTER_SECONDS),
+}
+
+
+def get_policy(generator: str) -> RetryPolicy:
+    return POLICIES.get(generator, _STRICT)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; lets one probe through after `reset_seconds`."""
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_seconds: float = CIRCUIT_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def abandon(self) -> None:
+        """The probe was cancelled before finishing; let the next caller probe."""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(model: str) -> CircuitBreaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers[model] = CircuitBreaker()
+    return breaker
+
+
+def breaker_stats() -> Dict[str, Dict[str, object]]:
+    return {model: {"state": b.state, "failures": b.failures} for model, b in _breakers.items()}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, (asyncio.TimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, policy: RetryPolicy, exc: Optional[BaseException] = None) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when the server sends one."""
+    hinted = _retry_after(exc) if exc is not None else None
+    if hinted is not None:
+        return min(hinted, policy.max_delay)
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** attempt))
+
+
+async def _with_retries(
+    attempt_fn: Callable[[str, float], Awaitable[T]],
+    model: str,
+    policy: RetryPolicy,
+    generator: str,
+    deadline: float,
+) -> T:
+    breaker = get_breaker(model)
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            llm_resilience_events_total.inc(generator=generator, model=model, event="circuit_open")
+            raise CircuitOpenError(f"Circuit open for model {model}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError(f"LLM deadline exceeded for {generator}")
+        try:
+            # attempt_timeout bounds model time inside attempt_fn; the deadline also covers queueing.
+            result = await asyncio.wait_for(attempt_fn(model, min(policy.attempt_timeout, remaining)), remaining)
+        except asyncio.CancelledError:
+            breaker.abandon()
+            raise
+        except Exception as exc:
+            if not is_retryable(exc):
+                breaker.abandon()
+                raise
+            breaker.record_failure()
+            if isinstance(exc, (asyncio.TimeoutError, openai.APITimeoutError)):
+                llm_resilience_events_total.inc(generator=generator, model=model, event="timeout")
+            attempt += 1
+            delay = backoff_delay(attempt - 1, policy, exc)
+            if attempt >= policy.max_attempts or time.monotonic() + delay >= deadline:
+                raise
+            llm_resilience_events_total.inc(generator=generator, model=model, event="retry")
+            await asyncio.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+async def _hedged(
+    attempt_fn: Callable[[str, float], Awaitable[T]],
+    model: str,
+    fallback: str,
+    policy: RetryPolicy,
+    generator: str,
+    deadline: float,
+) -> T:
+    """Start the primary; if it hasn't finished after hedge_after, race the fallback against it.
+
+    A primary that fails early with a retryable error or an open circuit fails over
+    to the fallback instead.
+    """
+    tasks = {asyncio.create_task(_with_retries(attempt_fn, model, policy, generator, deadline))}
+    fallback_started = False
+    last_exc: Optional[BaseException] = None
+    try:
+        while True:
+            done, tasks = await asyncio.wait(
+                tasks,
+                timeout=None if fallback_started else policy.hedge_after,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_exc = task.exception()
+            if not fallback_started and (not done or _can_fall_back(last_exc)):
+                fallback_started = True
+                llm_resilience_events_total.inc(generator=generator, model=fallback, event="fallback" if done else "hedge")
+                tasks.add(asyncio.create_task(_with_retries(attempt_fn, fallback, policy, generator, deadline)))
+            elif not tasks:
+                raise last_exc
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _can_fall_back(exc: Optional[BaseException]) -> bool:
+    return isinstance(exc, CircuitOpenError) or (exc is not None and is_retryable(exc))
+
+
+async def call_with_policy(
+    attempt_fn: Callable[[str, float], Awaitable[T]],
+    model: str,
+    generator: str,
+    policy: Optional[RetryPolicy] = None,
+) -> T:
+    """Run attempt_fn(model, timeout) under the generator's retry policy.
+
+    attempt_fn performs a single call against the given model and should apply
+    timeout to the model request itself (not to queueing). Falls back to
+    policy.fallback_model when the primary's retries are exhausted or its circuit is open.
+    """
+    policy = policy or get_policy(generator)
+    deadline = time.monotonic() + policy.deadline_seconds
+    fallback = policy.fallback_model if policy.fallback_model != model else None
+    if fallback and policy.hedge_after:
+        return await _hedged(attempt_fn, model, fallback, policy, generator, deadline)
+    try:
+        return await _with_retries(attempt_fn, model, policy, generator, deadline)
+    except Exception as exc:
+        if not fallback or not _can_fall_back(exc):
+            raise
+        if time.monotonic() >= deadline:
+            raise
+        llm_resilience_events_total.inc(generator=generator, model=fallback, event="fallback")
+        return await _with_retries(attempt_fn, fallback, policy, generator, deadline)
@@ -0,0 +1,43 @@
+"""Single-flight coalescing: concurrent callers asking for the same key share one in-flight call."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.counters = {"calls": 0, "coalesced": 0}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def has(self, key: Hashable) -> bool:
+        """True if a call for key is running now (a do() would coalesce onto it)."""
+        return key in self._inflight
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or wait on the call already running for it."""
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.counters["coalesced"] += 1
+            # shield: one impatient caller cancelling must not cancel the shared call.
+            return await asyncio.shield(fut)
+
+        self.counters["calls"] += 1
+        fut = asyncio.ensure_future(fn())
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda done: self._forget_if(key, done))
+        return await asyncio.shield(fut)
+
+    def forget(self, key: Hashable) -> None:
+        """Let the next do() for key start a new call; callers already waiting keep the old one."""
+        self._inflight.pop(key, None)
+
+    def _forget_if(self, key: Hashable, fut: asyncio.Future) -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "in_flight": self.in_flight}
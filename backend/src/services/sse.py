@@ -0,0 +1,55 @@
+"""Server-Sent Events helpers for streaming LLM output to the browser."""
+
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi.responses import StreamingResponse
+
+from .ai_service import stream_msg_async
+
+
+def format_sse(data: Any, event: Optional[str] = None) -> str:
+    # JSON-encode every payload so newlines inside tokens never break SSE framing.
+    lines = []
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def completion_events(
+    messages: List[Dict[str, str]],
+    max_tokens: Optional[int] = None,
+    generator: str = "unknown",
+) -> AsyncIterator[str]:
+    """Forward tokens as `token` events and finish with one `done` event
+    carrying the assembled text and token usage."""
+    try:
+        async for item in stream_msg_async(messages, max_tokens=max_tokens, generator=generator):
+            if item["type"] == "token":
+                yield format_sse({"text": item["text"]}, event="token")
+            else:
+                yield format_sse(
+                    {"text": item["text"], "usage": item["usage"], "cached": item["cached"]},
+                    event="done",
+                )
+    except Exception as e:
+        # Headers are already sent, so errors have to travel in-band.
+        yield format_sse({"detail": str(e)}, event="error")
+
+
+def static_events(text: str) -> AsyncIterator[str]:
+    """Emit a precomputed text as a single `done` event (no LLM call needed)."""
+
+    async def _gen():
+        yield format_sse({"text": text, "usage": None, "cached": False}, event="done")
+
+    return _gen()
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
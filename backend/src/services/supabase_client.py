@@ -1,8 +1,46 @@
+"""Process-wide Supabase clients.
+
+create_client builds a fresh HTTP session each time, so every repo call used to pay
+for a new TCP/TLS handshake. Clients are now created lazily once and reused, each
+backed by a keep-alive httpx pool. Tunables (env):
+
+- SUPABASE_POOL_SIZE: number of sync clients handed out round-robin (default 1)
+- SUPABASE_MAX_CONNECTIONS / SUPABASE_MAX_KEEPALIVE: httpx pool limits per client
+- SUPABASE_TIMEOUT: request timeout in seconds
+"""
+
+import asyncio
+import itertools
 import os
-from supabase import create_client, Client
+import threading
+from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
+from supabase import (
+    AsyncClient,
+    AsyncClientOptions,
+    Client,
+    ClientOptions,
+    create_async_client,
+    create_client,
+)
 
-def get_supabase() -> Client:
+_lock = threading.Lock()
+_clients: List[Client] = []
+_round_robin = itertools.count()
+_async_client: Optional[AsyncClient] = None
+_async_lock: Optional[asyncio.Lock] = None
+_http_clients: List[Any] = []
+
+_stats = {
+    "clients_created": 0,
+    "acquisitions": 0,
+    "requests": 0,
+    "connections_opened": 0,
+}
+
+
+def _credentials() -> Tuple[str, str]:
     url = os.getenv("SUPABASE_URL")
     # Prefer service role key (server-side); fall back to SUPABASE_KEY for local .env
     service_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY") or os.getenv("SUPABASE_KEY")
@@ -12,4 +50,112 @@ def get_supabase() -> Client:
             "Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY/SUPABASE_KEY in environment."
         )
 
-    return create_client(url, service_key)
+    return url, service_key
+
+
+def _pool_settings() -> Dict[str, Any]:
+    return {
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20")),
+            max_keepalive_connections=int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10")),
+        ),
+        "timeout": httpx.Timeout(float(os.getenv("SUPABASE_TIMEOUT", "10"))),
+    }
+
+
+def _trace(event_name: str, info: Dict[str, Any]) -> None:
+    # httpcore emits connect_tcp only when the pool has no idle connection to reuse.
+    if event_name == "connection.connect_tcp.complete":
+        _stats["connections_opened"] += 1
+
+
+async def _atrace(event_name: str, info: Dict[str, Any]) -> None:
+    _trace(event_name, info)
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _stats["requests"] += 1
+        request.extensions["trace"] = _trace
+        return super().handle_request(request)
+
+
+class _AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _stats["requests"] += 1
+        request.extensions["trace"] = _atrace
+        return await super().handle_async_request(request)
+
+
+def _new_client() -> Client:
+    url, service_key = _credentials()
+    settings = _pool_settings()
+    http_client = httpx.Client(
+        transport=_CountingTransport(limits=settings["limits"]),
+        timeout=settings["timeout"],
+    )
+    _http_clients.append(http_client)
+    _stats["clients_created"] += 1
+    return create_client(url, service_key, options=ClientOptions(httpx_client=http_client))
+
+
+def get_supabase() -> Client:
+    """Return a shared Supabase client (round-robin over SUPABASE_POOL_SIZE clients)."""
+    pool_size = max(1, int(os.getenv("SUPABASE_POOL_SIZE", "1")))
+    with _lock:
+        _stats["acquisitions"] += 1
+        if len(_clients) < pool_size:
+            _clients.append(_new_client())
+            return _clients[-1]
+        return _clients[next(_round_robin) % len(_clients)]
+
+
+async def get_async_supabase() -> AsyncClient:
+    """Return the shared async Supabase client for use from async routes."""
+    global _async_client, _async_lock
+    _stats["acquisitions"] += 1
+    if _async_client is not None:
+        return _async_client
+    if _async_lock is None:
+        _async_lock = asyncio.Lock()
+    async with _async_lock:
+        if _async_client is None:
+            url, service_key = _credentials()
+            settings = _pool_settings()
+            http_client = httpx.AsyncClient(
+                transport=_AsyncCountingTransport(limits=settings["limits"]),
+                timeout=settings["timeout"],
+            )
+            _http_clients.append(http_client)
+            _stats["clients_created"] += 1
+            _async_client = await create_async_client(
+                url, service_key, options=AsyncClientOptions(httpx_client=http_client)
+            )
+    return _async_client
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Connection reuse counters; reuse_rate is the share of requests served on an existing connection."""
+    requests = _stats["requests"]
+    opened = _stats["connections_opened"]
+    return {
+        **_stats,
+        "pool_size": len(_clients),
+        "async_client": _async_client is not None,
+        "reuse_rate": round(max(requests - opened, 0) / requests, 4) if requests else 0.0,
+    }
+
+
+async def close_supabase() -> None:
+    """Close pooled HTTP sessions (call on app shutdown)."""
+    global _async_client
+    with _lock:
+        http_clients = list(_http_clients)
+        _http_clients.clear()
+        _clients.clear()
+    _async_client = None
+    for http_client in http_clients:
+        if isinstance(http_client, httpx.AsyncClient):
+            await http_client.aclose()
+        else:
+            http_client.close()
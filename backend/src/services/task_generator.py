@@ -1,34 +1,37 @@
 """Generate clinician tasks (Follow-up, Medication, Screening, Routine) from patient context."""
 
-import json
 from typing import Any, Dict, List
 
-from .ai_service import send_msg
+from .generator import Generator, JsonArray
+from .prompting import TOKEN_BUDGETS, truncate_to_tokens
 
 
-def _strip_code_fences(text: str) -> str:
-    text = text.strip()
-    if text.startswith("```"):
-        lines = text.splitlines()
-        if len(lines) >= 2 and lines[-1].strip().startswith("```"):
-            lines = lines[1:-1]
-        if lines and lines[0].strip().lower() == "json":
-            lines = lines[1:]
-        text = "\n".join(lines).strip()
-    return text
+TASKS_SYSTEM_PROMPT = """You are a clinical task assistant for nurses. Output MUST be a valid JSON array only. No markdown, no code fences. Generate actionable clinician tasks from the patient context provided by the user.
+
+Generate clinician tasks for the nurse. Return a JSON array of objects with:
+- id: string (e.g. "task-f1", "task-m1", "task-s1", "task-r1")
+- label: string (short actionable task, e.g. "Discuss headache management at next visit")
+- priority: string ("high", "medium", or "low")
+- source: string (e.g. "AI-generated")
+- category: string (one of: "Follow-up", "Medication", "Screening", "Routine")
+
+Requirements:
+- Include 1-3 tasks total across Follow-up, Medication, Screening, Routine as relevant.
+- Only include categories that make sense for this patient (e.g. if no meds mentioned, skip Medication).
+- Prioritize high-risk and time-sensitive items.
+- Keep labels concise and actionable.
+- Do not include Escalation (those come from agreed items separately)."""
 
 
-def generate_clinician_tasks(
+def build_tasks_prompt(
     emr_text: str | None,
     agreed_items: List[Dict[str, Any]],
-) -> List[Dict[str, Any]]:
-    """
-    Generate clinician tasks for Follow-up, Medication, Screening, and Routine.
-    Returns list of { id, label, priority, source, category }.
-    """
+) -> str | None:
+    """Build the user prompt for clinician tasks, or None when there is no context."""
     context_parts = []
     if emr_text and emr_text.strip():
-        context_parts.append(f"Patient/EMR notes:\n{emr_text.strip()}")
+        notes = truncate_to_tokens(emr_text, TOKEN_BUDGETS["tasks"]["emr_text"])
+        context_parts.append(f"Patient/EMR notes:\n{notes}")
     if agreed_items:
         agreed_str = "\n".join(
             f"- {a.get('title', '')}: {a.get('detail', '')}" for a in agreed_items
@@ -36,67 +39,46 @@ def generate_clinician_tasks(
         context_parts.append(f"Agreed follow-up items:\n{agreed_str}")
 
     if not context_parts:
-        return []
+        return None
 
     context = "\n\n".join(context_parts)
+    return f"Patient context:\n\n{context}\n"
 
-    system_prompt = (
-        "You are a clinical task assistant for nurses. "
-        "Output MUST be a valid JSON array only. No markdown, no code fences. "
-        "Generate actionable clinician tasks from the patient context."
-    )
 
-    user_prompt = f"""
-Given this patient context:
+TASK_REQUIRED_FIELDS = {"id", "label", "priority", "category"}
+TASK_CATEGORIES = ("Follow-up", "Medication", "Screening", "Routine")
 
-{context}
 
-Generate clinician tasks for the nurse. Return a JSON array of objects with:
-- id: string (e.g. "task-f1", "task-m1", "task-s1", "task-r1")
-- label: string (short actionable task, e.g. "Discuss headache management at next visit")
-- priority: string ("high", "medium", or "low")
-- source: string (e.g. "AI-generated")
-- category: string (one of: "Follow-up", "Medication", "Screening", "Routine")
+def _normalize_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    task.setdefault("source", "AI-generated")
+    category = str(task.get("category", "")).strip()
+    task["category"] = category if category in TASK_CATEGORIES else "Follow-up"
+    return task
 
-Requirements:
-- Include 1-3 tasks total across Follow-up, Medication, Screening, Routine as relevant.
-- Only include categories that make sense for this patient (e.g. if no meds mentioned, skip Medication).
-- Prioritize high-risk and time-sensitive items.
-- Keep labels concise and actionable.
-- Do not include Escalation (those come from agreed items separately).
-"""
-
-    content = send_msg(
-        [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=800,
-    )
-
-    return _parse_tasks(content)
-
-
-def _parse_tasks(content: str) -> List[Dict[str, Any]]:
-    cleaned = _strip_code_fences(content)
-    try:
-        tasks = json.loads(cleaned)
-    except Exception as exc:
-        raise ValueError(f"Model did not return valid JSON: {exc}") from exc
-    if not isinstance(tasks, list):
-        raise ValueError("Model output must be a JSON array")
-    required = {"id", "label", "priority", "category"}
-    for i, t in enumerate(tasks):
-        if not isinstance(t, dict):
-            raise ValueError(f"Task at index {i} is not an object")
-        missing = required - set(t.keys())
-        if missing:
-            raise ValueError(f"Task at index {i} missing fields: {sorted(missing)}")
-        t.setdefault("source", "AI-generated")
-        # Normalize category
-        cat = str(t.get("category", "")).strip()
-        if cat not in ("Follow-up", "Medication", "Screening", "Routine"):
-            t["category"] = "Follow-up"
-        else:
-            t["category"] = cat
-    return tasks
+
+TASKS = Generator(
+    "tasks",
+    TASKS_SYSTEM_PROMPT,
+    build_tasks_prompt,
+    output=JsonArray(TASK_REQUIRED_FIELDS, item="task", normalize=_normalize_task),
+    on_empty=list,
+)
+
+
+def build_tasks_messages(
+    emr_text: str | None,
+    agreed_items: List[Dict[str, Any]],
+) -> List[Dict[str, str]] | None:
+    """Build the chat messages for clinician tasks, or None when there is no context."""
+    return TASKS.messages(emr_text, agreed_items)
+
+
+async def generate_clinician_tasks(
+    emr_text: str | None,
+    agreed_items: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Generate clinician tasks for Follow-up, Medication, Screening, and Routine.
+    Returns list of { id, label, priority, source, category }.
+    """
+    return await TASKS.run(emr_text, agreed_items)
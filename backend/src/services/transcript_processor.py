@@ -1,26 +1,42 @@
-"""Process raw transcript: separate clinician vs client using LLM."""
+"""Process raw transcript: separate clinician vs client, with rules first and the LLM as fallback."""
 
-import json
-from typing import Any, Dict, List
+import asyncio
+import os
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
 
-from .ai_service import send_msg
+from .diarization import (
+    DIARIZATION_ENABLED,
+    MAX_CLIENT_RESPONSES,
+    MAX_CLINICIAN_QUESTIONS,
+    diarize,
+    summarize_utterances,
+)
+from .generator import Generator, JsonObject
 
+# Transcripts longer than this are split into chunks that are labeled concurrently.
+CHUNK_CHARS = int(os.getenv("TRANSCRIPT_CHUNK_CHARS", "3000"))
+# Sentences repeated at the start of the next chunk so the model sees who was talking.
+CHUNK_OVERLAP_SENTENCES = int(os.getenv("TRANSCRIPT_CHUNK_OVERLAP_SENTENCES", "2"))
+CHUNK_MAX_TOKENS = 2000
+# Live sessions are unauthenticated and each one starts LLM work, so both the number
+# of open sessions and the text one session may take are bounded.
+MAX_SESSIONS = int(os.getenv("TRANSCRIPT_MAX_SESSIONS", "200"))
+MAX_SESSION_CHARS = int(os.getenv("TRANSCRIPT_SESSION_MAX_CHARS", "200000"))
 
-def _strip_code_fences(text: str) -> str:
-    text = text.strip()
-    if text.startswith("```"):
-        lines = text.splitlines()
-        if len(lines) >= 2 and lines[-1].strip().startswith("```"):
-            lines = lines[1:-1]
-        if lines and lines[0].strip().lower() == "json":
-            lines = lines[1:]
-        text = "\n".join(lines).strip()
-    return text
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
 
 
-def process_transcript(raw_transcript: str) -> Dict[str, Any]:
-    """Given a raw conversation transcript (no speaker labels), use LLM to label
-    each utterance as clinician or client and structure the dialogue.
+async def process_transcript(raw_transcript: str) -> Dict[str, Any]:
+    """Given a raw conversation transcript, label each utterance as clinician or
+    client and structure the dialogue.
+
+    The rule-based labeler in diarization.py runs first and only sends uncertain
+    sentences to the LLM; if it is unsure about too much of the transcript, the
+    whole transcript is labeled by the LLM instead, and long transcripts are split
+    at sentence boundaries and labeled chunk by chunk (see process_transcript_chunked).
 
     Returns:
         {
@@ -33,25 +49,22 @@ def process_transcript(raw_transcript: str) -> Dict[str, Any]:
     if not raw_transcript or not raw_transcript.strip():
         raise ValueError("raw_transcript is required")
 
-    system_prompt = (
-        "You are a clinical documentation assistant. Given a transcript of a clinician-patient conversation, "
-        "split it into utterances and label each as 'clinician' or 'client'. "
-        "Clinicians typically ask questions, give instructions, or provide medical information. "
-        "Clients (patients) typically describe symptoms, side effects, answer questions, and report how they feel. "
-        "Output ONLY valid JSON. No markdown, no code fences, no commentary."
-    )
+    if DIARIZATION_ENABLED:
+        processed = await diarize(raw_transcript)
+        if processed is not None:
+            return processed
+    if len(raw_transcript) > CHUNK_CHARS:
+        return await process_transcript_chunked(raw_transcript)
+    return await _label_transcript(raw_transcript)
 
-    user_prompt = f"""
-Raw transcript:
-\"\"\"
-{raw_transcript}
-\"\"\"
+
+TRANSCRIPT_SYSTEM_PROMPT = """You are a clinical documentation assistant. Given a transcript of a clinician-patient conversation, split it into utterances and label each as 'clinician' or 'client'. Clinicians typically ask questions, give instructions, or provide medical information. Clients (patients) typically describe symptoms, side effects, answer questions, and report how they feel. Output ONLY valid JSON. No markdown, no code fences, no commentary.
 
 Task:
 1. Split into logical utterances (sentences or short exchanges).
 2. For each utterance, decide: "clinician" or "client".
 3. Return a JSON object with:
-   - utterances: array of {{"speaker": "clinician"|"client", "text": "..."}}
+   - utterances: array of {"speaker": "clinician"|"client", "text": "..."}
    - clinician_questions: array of strings (key questions the clinician asked)
    - client_responses: array of strings (symptoms, side effects, patient answers)
    - summary: 1-2 sentence summary of the conversation
@@ -59,30 +72,295 @@ Task:
 Rules:
 - Preserve the original wording; do not paraphrase.
 - If unsure, use context: questions → clinician; symptoms/answers → client.
-- Keep utterances in chronological order.
+- Keep utterances in chronological order."""
+
+
+def build_transcript_prompt(raw_transcript: str) -> str:
+    return f"""Raw transcript:
+\"\"\"
+{raw_transcript}
+\"\"\"
 """
 
-    content = send_msg(
-        [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=4000,
+
+def _keep_usable_utterances(data: Dict[str, Any]) -> Dict[str, Any]:
+    # A truncated reply can cut an utterance in half; keep only usable ones.
+    data["utterances"] = [
+        u for u in data["utterances"] if isinstance(u, dict) and u.get("text")
+    ]
+    return data
+
+
+TRANSCRIPT = Generator(
+    "transcript",
+    TRANSCRIPT_SYSTEM_PROMPT,
+    build_transcript_prompt,
+    output=JsonObject(
+        defaults={"utterances": [], "clinician_questions": [], "client_responses": [], "summary": ""},
+        normalize=_keep_usable_utterances,
+    ),
+)
+TRANSCRIPT_CHUNK = TRANSCRIPT.with_max_tokens(CHUNK_MAX_TOKENS)
+
+
+def build_transcript_messages(raw_transcript: str) -> List[Dict[str, str]]:
+    return TRANSCRIPT.messages(raw_transcript)
+
+
+async def _label_transcript(raw_transcript: str) -> Dict[str, Any]:
+    return await TRANSCRIPT.run(raw_transcript)
+
+
+async def _label_chunk(text: str) -> Dict[str, Any]:
+    """Label one live-session chunk; rules first, one utterance per sentence so overlap merging still works.
+
+    No per-chunk summary: finalize() writes one for the merged transcript.
+    """
+    if DIARIZATION_ENABLED:
+        processed = await diarize(text, merge=False, summarize=False)
+        if processed is not None:
+            return processed
+    return await TRANSCRIPT_CHUNK.run(text)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [p.strip() for p in _SENTENCE_BOUNDARY.split(text) if p and p.strip()]
+
+
+def split_transcript(
+    raw_transcript: str,
+    max_chars: int = CHUNK_CHARS,
+    overlap_sentences: int = CHUNK_OVERLAP_SENTENCES,
+) -> List[Dict[str, Any]]:
+    """Split a transcript at sentence boundaries into chunks of about max_chars.
+
+    Each chunk is {"text": ..., "overlap": n}, where the first n sentences repeat
+    the end of the previous chunk for context and are dropped again on merge.
+    """
+    chunks: List[Dict[str, Any]] = []
+    current: List[str] = []
+    overlap = 0
+    size = 0
+    for sentence in split_sentences(raw_transcript):
+        if current and size + len(sentence) > max_chars and len(current) > overlap:
+            chunks.append({"text": " ".join(current), "overlap": overlap})
+            current = current[-overlap_sentences:] if overlap_sentences else []
+            overlap = len(current)
+            size = sum(len(c) + 1 for c in current)
+        current.append(sentence)
+        size += len(sentence) + 1
+    if len(current) > overlap or not chunks:
+        chunks.append({"text": " ".join(current), "overlap": overlap})
+    return chunks
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def _dedupe(items: List[str]) -> List[str]:
+    seen = set()
+    out = []
+    for item in items:
+        key = _normalize_text(item)
+        if key and key not in seen:
+            seen.add(key)
+            out.append(item)
+    return out
+
+
+def merge_chunk_results(chunks: List[Dict[str, Any]], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-chunk outputs in chunk order, dropping utterances from each chunk's overlap prefix.
+
+    A chunk's summary only covers that chunk, so the merged summary is left empty
+    when there are several; summarize_merged() writes one for the whole dialogue.
+    """
+    utterances: List[Dict[str, Any]] = []
+    questions: List[str] = []
+    responses: List[str] = []
+    for chunk, result in zip(chunks, results):
+        overlap_text = ""
+        if chunk["overlap"]:
+            overlap_text = _normalize_text(" ".join(split_sentences(chunk["text"])[: chunk["overlap"]]))
+        leading = True
+        for u in result.get("utterances", []):
+            text = _normalize_text(u.get("text", ""))
+            # Only the leading utterances can belong to the overlap; stop at the first new one.
+            if leading and overlap_text and text and text in overlap_text:
+                continue
+            leading = False
+            utterances.append(u)
+        questions.extend(result.get("clinician_questions", []))
+        responses.extend(result.get("client_responses", []))
+    return {
+        "utterances": utterances,
+        "clinician_questions": _dedupe(questions)[:MAX_CLINICIAN_QUESTIONS],
+        "client_responses": _dedupe(responses)[:MAX_CLIENT_RESPONSES],
+        "summary": str(results[0].get("summary") or "").strip() if len(results) == 1 else "",
+    }
+
+
+async def summarize_merged(merged: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in one summary for a merged transcript that does not have one yet."""
+    if not merged["summary"]:
+        merged["summary"] = await summarize_utterances(merged["utterances"])
+    return merged
+
+
+async def process_transcript_chunked(raw_transcript: str) -> Dict[str, Any]:
+    """Label a long transcript chunk by chunk (concurrently) and merge deterministically."""
+    if not raw_transcript or not raw_transcript.strip():
+        raise ValueError("raw_transcript is required")
+    chunks = split_transcript(raw_transcript)
+    results = await asyncio.gather(
+        *(TRANSCRIPT_CHUNK.run(c["text"]) for c in chunks)
     )
+    return await summarize_merged(merge_chunk_results(chunks, list(results)))
 
-    cleaned = _strip_code_fences(content)
-    try:
-        data = json.loads(cleaned)
-    except json.JSONDecodeError as e:
-        raise ValueError(f"LLM did not return valid JSON: {e}") from e
 
-    if not isinstance(data, dict):
-        raise ValueError("Output must be a JSON object")
+class SessionLimitError(RuntimeError):
+    """Too many open sessions, or a session was sent more text than MAX_SESSION_CHARS."""
 
-    # Ensure required keys
-    data.setdefault("utterances", [])
-    data.setdefault("clinician_questions", [])
-    data.setdefault("client_responses", [])
-    data.setdefault("summary", "")
 
-    return data
+class TranscriptSession:
+    """Incremental processing for live recordings.
+
+    append() buffers text and starts labeling each chunk as soon as it fills up, so
+    by the time recording stops only the tail is left for finalize().
+    """
+
+    def __init__(
+        self,
+        max_chars: int = CHUNK_CHARS,
+        overlap_sentences: int = CHUNK_OVERLAP_SENTENCES,
+        max_total_chars: int = MAX_SESSION_CHARS,
+    ):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.max_chars = max_chars
+        self.overlap_sentences = overlap_sentences
+        self.max_total_chars = max_total_chars
+        self.total_chars = 0
+        self._buffer = ""  # trailing text that may be a sentence still being spoken
+        self._sentences: List[str] = []
+        self._next = 0  # first sentence not yet sent in a chunk
+        self._chunks: List[Dict[str, Any]] = []
+        self._tasks: List[asyncio.Task] = []
+        self._final_tail: Optional[str] = None  # tail passed to the first finalize()
+        # Set while a request is finalizing this session, so a second one can be refused.
+        self.in_use = False
+
+    @property
+    def chunks_started(self) -> int:
+        return len(self._tasks)
+
+    def append(self, text: str) -> int:
+        """Add transcript text; returns the number of chunks started so far.
+
+        Raises SessionLimitError, without keeping the text, once the session would
+        exceed max_total_chars.
+        """
+        if self.total_chars + len(text) > self.max_total_chars:
+            raise SessionLimitError(f"Transcript session is limited to {self.max_total_chars} characters")
+        self.total_chars += len(text)
+        self._buffer += text
+        cut = 0
+        for match in _SENTENCE_BOUNDARY.finditer(self._buffer):
+            cut = match.end()
+        self._sentences.extend(split_sentences(self._buffer[:cut]))
+        self._buffer = self._buffer[cut:]
+        while sum(len(p) + 1 for p in self._sentences[self._next:]) > self.max_chars:
+            self._start_chunk(self._chunk_end())
+        return self.chunks_started
+
+    def _chunk_end(self) -> int:
+        end, size = self._next, 0
+        while end < len(self._sentences) and (end == self._next or size + len(self._sentences[end]) <= self.max_chars):
+            size += len(self._sentences[end]) + 1
+            end += 1
+        return end
+
+    def _start_chunk(self, end: int) -> None:
+        start = max(0, self._next - self.overlap_sentences)
+        chunk = {"text": " ".join(self._sentences[start:end]), "overlap": self._next - start}
+        self._next = end
+        self._chunks.append(chunk)
+        self._tasks.append(
+            asyncio.create_task(_label_chunk(chunk["text"]))
+        )
+
+    async def finalize(self, tail: str = "") -> Dict[str, Any]:
+        """Process whatever is left and merge all chunk results in order.
+
+        Can be called again after a failure with the same tail: chunks that failed
+        or were cancelled are labeled again, finished ones are reused.
+        """
+        if self._final_tail is None:
+            if tail:
+                self.append(tail)
+            if self._buffer.strip():
+                self._sentences.append(self._buffer.strip())
+            self._buffer = ""
+            if self._next < len(self._sentences):
+                self._start_chunk(len(self._sentences))
+            self._final_tail = tail
+        elif tail != self._final_tail:
+            raise ValueError("Transcript session was already finalized with a different tail")
+        if not self._chunks:
+            raise ValueError("raw_transcript is required")
+        for i, task in enumerate(self._tasks):
+            if task.done() and (task.cancelled() or task.exception() is not None):
+                self._tasks[i] = asyncio.create_task(_label_chunk(self._chunks[i]["text"]))
+        results = await asyncio.gather(*self._tasks)
+        return await summarize_merged(merge_chunk_results(self._chunks, list(results)))
+
+    def cancel(self) -> None:
+        """Stop chunks still being labeled; failures of finished ones are discarded."""
+        for task in self._tasks:
+            task.cancel()
+            task.add_done_callback(_discard_outcome)
+
+
+def _discard_outcome(task: asyncio.Task) -> None:
+    # Retrieve the exception so asyncio does not log "exception was never retrieved".
+    if not task.cancelled():
+        task.exception()
+
+
+SESSION_TTL_SECONDS = 2 * 60 * 60
+_sessions: Dict[str, TranscriptSession] = {}
+
+
+def _prune_sessions() -> None:
+    now = time.time()
+    for sid, session in list(_sessions.items()):
+        if now - session.created_at > SESSION_TTL_SECONDS:
+            session.cancel()
+            del _sessions[sid]
+
+
+def create_session() -> TranscriptSession:
+    """Open a session; raises SessionLimitError when MAX_SESSIONS are already open."""
+    _prune_sessions()
+    if len(_sessions) >= MAX_SESSIONS:
+        raise SessionLimitError("Too many open transcript sessions; try again later")
+    session = TranscriptSession()
+    _sessions[session.id] = session
+    return session
+
+
+def get_session(session_id: str) -> Optional[TranscriptSession]:
+    _prune_sessions()
+    return _sessions.get(session_id)
+
+
+def pop_session(session_id: str) -> Optional[TranscriptSession]:
+    _prune_sessions()
+    return _sessions.pop(session_id, None)
+
+
+def discard_session(session_id: str) -> None:
+    """Drop a session that was rejected and stop any chunks it still has running."""
+    session = _sessions.pop(session_id, None)
+    if session is not None:
+        session.cancel()
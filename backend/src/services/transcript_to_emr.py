@@ -2,47 +2,23 @@
 
 from typing import Any, Dict, List
 
-from .ai_service import send_msg
+from .generator import Generator
+from .prompting import TOKEN_BUDGETS, fit_list_to_tokens, truncate_to_tokens
 
 
-def generate_emr_from_transcript(processed: Dict[str, Any]) -> str:
-    """Generate structured EMR visit notes from processed transcript.
-
-    Input processed has:
-        - utterances: [{speaker, text}, ...]
-        - clinician_questions: [...]
-        - client_responses: [...]
-        - summary: str
-    """
-    utterances = processed.get("utterances", [])
-    clinician_q = processed.get("clinician_questions", [])
-    client_resp = processed.get("client_responses", [])
-    summary = processed.get("summary", "")
-
-    # Build dialogue representation
+def format_dialogue(processed: Dict[str, Any]) -> str:
+    """Render labeled utterances as "[SPEAKER] text" lines."""
     dialogue_lines = []
-    for u in utterances:
+    for u in processed.get("utterances", []):
         speaker = u.get("speaker", "unknown")
         text = u.get("text", "").strip()
         if text:
             dialogue_lines.append(f"[{speaker.upper()}] {text}")
 
-    dialogue = "\n".join(dialogue_lines) if dialogue_lines else "No dialogue."
+    return "\n".join(dialogue_lines) if dialogue_lines else "No dialogue."
 
-    system_prompt = (
-        "You are a clinical documentation assistant. Create structured EMR (Electronic Medical Record) "
-        "visit notes from a clinician-patient conversation. Use standard medical terminology. "
-        "Do not invent facts not present in the transcript. If information is missing, state 'Not documented'. "
-        "Output professional, concise notes suitable for charting. Do not use markdown code fences."
-    )
 
-    user_prompt = f"""
-Transcript (clinician vs client labeled):
-{dialogue}
-
-Clinician questions asked: {clinician_q}
-Client-reported symptoms/responses: {client_resp}
-Brief summary: {summary}
+EMR_SYSTEM_PROMPT = """You are a clinical documentation assistant. Create structured EMR (Electronic Medical Record) visit notes from the clinician-patient conversation provided by the user. Use standard medical terminology. Do not invent facts not present in the transcript. If information is missing, state 'Not documented'. Output professional, concise notes suitable for charting. Do not use markdown code fences.
 
 Create EMR visit notes with these sections:
 
@@ -66,13 +42,44 @@ Rules:
 - Use section headers exactly as above.
 - Bullet points where appropriate.
 - 250–400 words total.
-- Professional tone, no AI disclaimers.
+- Professional tone, no AI disclaimers."""
+
+
+def build_emr_prompt(processed: Dict[str, Any]) -> str:
+    """Build the user prompt for EMR visit notes from a processed transcript.
+
+    Input processed has:
+        - utterances: [{speaker, text}, ...]
+        - clinician_questions: [...]
+        - client_responses: [...]
+        - summary: str
+    """
+    budget = TOKEN_BUDGETS["emr"]
+    clinician_q = fit_list_to_tokens(processed.get("clinician_questions") or [], budget["clinician_questions"])
+    client_resp = fit_list_to_tokens(processed.get("client_responses") or [], budget["client_responses"])
+    summary = truncate_to_tokens(processed.get("summary") or "", budget["summary"], keep="middle")
+
+    # Very long visits lose their middle: the chief complaint is said at the start,
+    # and the plan, medications and follow-ups at the end.
+    dialogue = truncate_to_tokens(format_dialogue(processed), budget["dialogue"], keep="middle")
+
+    return f"""Transcript (clinician vs client labeled):
+{dialogue}
+
+Clinician questions asked: {clinician_q}
+Client-reported symptoms/responses: {client_resp}
+Brief summary: {summary}
 """
 
-    return send_msg(
-        [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=2000,
-    )
+
+EMR = Generator("emr", EMR_SYSTEM_PROMPT, build_emr_prompt)
+
+
+def build_emr_messages(processed: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Build the chat messages for EMR visit notes from a processed transcript."""
+    return EMR.messages(processed)
+
+
+async def generate_emr_from_transcript(processed: Dict[str, Any]) -> str:
+    """Generate structured EMR visit notes from processed transcript."""
+    return await EMR.run(processed)
@@ -1,5 +1,13 @@
+import os
 from typing import Any, Dict, List, Optional
-from src.services.supabase_client import get_supabase
+from src.services.read_cache import ReadThroughCache
+from src.services.supabase_client import get_async_supabase, get_supabase
+
+USER_COLUMNS = "id,name,date_of_birth,role"
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "100"))
+USERS_MAX_PAGE_SIZE = 500
+USERS_MAX_IDS = 200
+USERS_MAX_CURSOR_LENGTH = 255
 
 def _map_user_row(row: Dict[str, Any]) -> Dict[str, Any]:
     # DB uses snake_case; API returns camelCase like your JSON
@@ -12,7 +20,7 @@ def _map_user_row(row: Dict[str, Any]) -> Dict[str, Any]:
 
 def get_users() -> List[Dict[str, Any]]:
     sb = get_supabase()
-    res = sb.table("users").select("id,name,date_of_birth,role").order("id").execute()
+    res = sb.table("users").select(USER_COLUMNS).order("id").execute()
 
     if getattr(res, "error", None):
         raise RuntimeError(f"Supabase error: {res.error}")
@@ -24,7 +32,7 @@ def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     sb = get_supabase()
     res = (
         sb.table("users")
-        .select("id,name,date_of_birth,role")
+        .select(USER_COLUMNS)
         .eq("id", user_id)
         .maybe_single()
         .execute()
@@ -36,4 +44,103 @@ def get_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
     if not res.data:
         return None
 
-    return _map_user_row(res.data)
\ No newline at end of file
+    return _map_user_row(res.data)
+
+async def get_users_async() -> List[Dict[str, Any]]:
+    sb = await get_async_supabase()
+    res = await sb.table("users").select(USER_COLUMNS).order("id").execute()
+
+    if getattr(res, "error", None):
+        raise RuntimeError(f"Supabase error: {res.error}")
+
+    data = res.data or []
+    return [_map_user_row(r) for r in data]
+
+async def get_user_by_id_async(user_id: str) -> Optional[Dict[str, Any]]:
+    sb = await get_async_supabase()
+    res = await (
+        sb.table("users")
+        .select(USER_COLUMNS)
+        .eq("id", user_id)
+        .maybe_single()
+        .execute()
+    )
+
+    if getattr(res, "error", None):
+        raise RuntimeError(f"Supabase error: {res.error}")
+
+    # maybe_single() yields no response at all when the row is missing.
+    if res is None or not res.data:
+        return None
+
+    return _map_user_row(res.data)
+
+def clamp_users_limit(limit: Optional[int]) -> int:
+    if limit is None:
+        return USERS_PAGE_SIZE
+    return max(1, min(int(limit), USERS_MAX_PAGE_SIZE))
+
+def parse_user_ids(ids: str) -> List[str]:
+    """Split a comma-separated ids= value, dropping blanks and duplicates. Raises ValueError past USERS_MAX_IDS."""
+    parsed = list(dict.fromkeys(i.strip() for i in ids.split(",") if i.strip()))
+    if len(parsed) > USERS_MAX_IDS:
+        raise ValueError(f"At most {USERS_MAX_IDS} ids per request")
+    return parsed
+
+def parse_users_cursor(cursor: Optional[str]) -> Optional[str]:
+    """cursor= is the last id of the previous page; None starts at the beginning. Raises ValueError when it cannot be an id."""
+    if cursor is None or cursor == "":
+        return None
+    if len(cursor) > USERS_MAX_CURSOR_LENGTH or not cursor.isprintable():
+        raise ValueError("Invalid cursor")
+    return cursor
+
+def users_page(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    """Build a page from up to limit + 1 rows ordered by id; next_cursor is the last id when more remain."""
+    users = [_map_user_row(r) for r in rows[:limit]]
+    next_cursor = users[-1]["id"] if len(rows) > limit and users else None
+    return {"users": users, "next_cursor": next_cursor}
+
+async def get_users_page_async(limit: int, after: Optional[str] = None) -> Dict[str, Any]:
+    """One page of users ordered by id (keyset: ids greater than after)."""
+    sb = await get_async_supabase()
+    query = sb.table("users").select(USER_COLUMNS)
+    if after:
+        query = query.gt("id", after)
+    res = await query.order("id").limit(limit + 1).execute()
+
+    if getattr(res, "error", None):
+        raise RuntimeError(f"Supabase error: {res.error}")
+
+    return users_page(res.data or [], limit)
+
+async def get_users_by_ids_async(ids: List[str]) -> List[Dict[str, Any]]:
+    """Users with the given ids in one round-trip, ordered by id; unknown ids are skipped."""
+    if not ids:
+        return []
+    sb = await get_async_supabase()
+    res = await sb.table("users").select(USER_COLUMNS).in_("id", ids).order("id").execute()
+
+    if getattr(res, "error", None):
+        raise RuntimeError(f"Supabase error: {res.error}")
+
+    return [_map_user_row(r) for r in res.data or []]
+
+async def _load_user(user_id: str) -> Optional[Dict[str, Any]]:
+    # Imported here: repositories builds on this module.
+    from src.services.repositories import get_repository
+    return await get_repository().get_user_by_id(user_id)
+
+user_cache = ReadThroughCache(
+    _load_user,
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "4096")),
+)
+
+async def get_user_cached(user_id: str) -> Optional[Dict[str, Any]]:
+    """Read-through cached user lookup. Treat the returned dict as read-only."""
+    return await user_cache.get(user_id)
+
+def invalidate_user(user_id: str) -> None:
+    """Drop the cached user for user_id; call after writing that user row."""
+    user_cache.invalidate(user_id)
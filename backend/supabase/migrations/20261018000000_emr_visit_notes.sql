@@ -0,0 +1,46 @@
+-- Visit-note history for GET /api/emr/{user_id}/visit-notes (emr_repo.get_visit_notes_async).
+--
+-- emr_reports.visit_notes keeps only the latest note. Every time a chart's note is
+-- written (insert, or an update that changes it) the trigger below appends it here,
+-- so whatever maintains emr_reports fills the history without a second write.
+-- Existing charts are backfilled with their current note.
+
+create table if not exists emr_visit_notes (
+    id bigint generated always as identity primary key,
+    user_id text not null references users(id) on delete cascade,
+    visit_date date,
+    note text not null
+);
+
+-- Keyset pages: where user_id = ? and id < ? order by id desc.
+create index if not exists emr_visit_notes_user_id_idx on emr_visit_notes (user_id, id desc);
+
+-- last_visit is free text on some charts; only a leading YYYY-MM-DD becomes a date.
+create or replace function emr_visit_date(last_visit text) returns date
+language sql immutable as $$
+    select case when last_visit ~ '^\d{4}-\d{2}-\d{2}' then left(last_visit, 10)::date end
+$$;
+
+create or replace function emr_reports_append_visit_note() returns trigger
+language plpgsql as $$
+begin
+    if coalesce(new.visit_notes, '') <> ''
+       and (tg_op = 'INSERT' or new.visit_notes is distinct from old.visit_notes) then
+        insert into emr_visit_notes (user_id, visit_date, note)
+        values (new.user_id, emr_visit_date(new.last_visit::text), new.visit_notes);
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists emr_reports_visit_note_history on emr_reports;
+create trigger emr_reports_visit_note_history
+    after insert or update of visit_notes on emr_reports
+    for each row execute function emr_reports_append_visit_note();
+
+insert into emr_visit_notes (user_id, visit_date, note)
+select r.user_id, emr_visit_date(r.last_visit::text), r.visit_notes
+from emr_reports r
+where coalesce(r.visit_notes, '') <> ''
+  and not exists (select 1 from emr_visit_notes n where n.user_id = r.user_id)
+order by r.user_id;
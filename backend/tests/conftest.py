@@ -0,0 +1,11 @@
+"""Run from backend/: python -m pytest -q
+
+Tests never reach Featherless or Supabase; ai_service only needs a key to import.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("FEATHERLESS_API_KEY", "test")
+os.environ.setdefault("REPO_BACKEND", "memory")
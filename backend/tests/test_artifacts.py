@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from src.services import artifacts
+from src.services.artifacts import MemoryArtifactStore, emr_content_hash, get_artifacts, refresh_artifacts
+from src.services.emr_repo import get_emr_cached
+
+USER = "user_001"
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = MemoryArtifactStore()
+    monkeypatch.setattr(artifacts, "artifact_store", store)
+    monkeypatch.setattr(artifacts, "_pending", {})
+    monkeypatch.setattr(artifacts, "_backoff", {})
+    monkeypatch.setattr(artifacts, "ARTIFACT_RETRY_BASE_SECONDS", 60)
+    return store
+
+
+def _generator(calls, failing=()):
+    async def generate(kind, emr_text):
+        calls.append(kind)
+        if kind in failing:
+            raise RuntimeError("upstream down")
+        return f"{kind}-{len(calls)}"
+
+    return generate
+
+
+def test_failed_artifact_keeps_its_last_good_value(monkeypatch, store):
+    calls = []
+    monkeypatch.setattr(artifacts, "_generate", _generator(calls))
+    asyncio.run(refresh_artifacts(USER))
+    good = store.get(USER)
+    # Same EMR content under a different hash forces a full regeneration.
+    good.emr_hash = "older"
+
+    monkeypatch.setattr(artifacts, "_generate", _generator(calls, failing={"tasks"}))
+    asyncio.run(refresh_artifacts(USER))
+    stored = store.get(USER)
+    assert stored.errors == {"tasks": "Failed to generate tasks"}
+    assert stored.tasks == good.tasks
+    assert stored.cards != good.cards and stored.summary != good.summary
+
+
+def test_retry_for_the_same_emr_redoes_only_failed_artifacts(monkeypatch, store):
+    calls = []
+    monkeypatch.setattr(artifacts, "_generate", _generator(calls, failing={"summary"}))
+    asyncio.run(refresh_artifacts(USER))
+    cards = store.get(USER).cards
+
+    calls.clear()
+    monkeypatch.setattr(artifacts, "_generate", _generator(calls))
+    asyncio.run(refresh_artifacts(USER))
+    stored = store.get(USER)
+    assert calls == ["summary"]
+    assert stored.errors == {} and stored.cards == cards and stored.summary
+
+
+def test_reads_do_not_requeue_a_failed_refresh_while_it_backs_off(monkeypatch, store):
+    monkeypatch.setattr(artifacts, "_generate", _generator([], failing={"cards"}))
+    asyncio.run(refresh_artifacts(USER))
+    before = artifacts._counters["retries_deferred"]
+
+    for _ in range(3):
+        out = asyncio.run(get_artifacts(USER))
+        assert out["status"] == "stale" and out["refresh_job_id"] is None
+    assert artifacts._counters["retries_deferred"] == before + 3
+
+
+def test_backoff_doubles_per_failure_and_resets_for_a_new_emr(monkeypatch, store):
+    emr_hash = emr_content_hash(asyncio.run(get_emr_cached(USER)))
+    monkeypatch.setattr(artifacts, "_generate", _generator([], failing={"cards"}))
+    asyncio.run(refresh_artifacts(USER))
+    asyncio.run(refresh_artifacts(USER))
+    _, failures, not_before = artifacts._backoff[USER]
+    assert failures == 2
+    assert 110 < not_before - artifacts.time.monotonic() <= 120
+
+    assert artifacts._retry_deferred(USER, emr_hash)
+    assert not artifacts._retry_deferred(USER, "newer-emr")
+
+    monkeypatch.setattr(artifacts, "_generate", _generator([]))
+    asyncio.run(refresh_artifacts(USER))
+    assert USER not in artifacts._backoff
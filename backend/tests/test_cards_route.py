@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from src.services import ai_service
+
+CARDS = [{"id": "q1", "title": "Any new swelling?", "description": "Check the knee.", "rationale": "DVT risk.", "category": "red_flag"}]
+
+
+def read_lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_batch_dedupes_prompts_and_reports_per_patient_errors(monkeypatch):
+    prompts = []
+
+    async def fake_send(messages, model=None, max_tokens=None, generator="unknown", **kwargs):
+        prompts.append(messages[-1]["content"])
+        if "Upstream down" in messages[-1]["content"]:
+            raise RuntimeError("connection reset")
+        return json.dumps(CARDS)
+
+    monkeypatch.setattr(ai_service, "send_msg_async", fake_send)
+    from main import app
+
+    patients = [
+        {"patient_id": "p1", "emr_text": "Post-op knee, on warfarin."},
+        {"patient_id": "p2", "emr_text": "  Post-op knee, on warfarin.\n"},
+        {"patient_id": "p3", "emr_text": "   "},
+        {"patient_id": "p4", "emr_text": "Upstream down for this one."},
+    ]
+    with TestClient(app) as client:
+        response = client.post("/api/cards/generate-batch", json={"patients": patients})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    by_patient = {line["patient_id"]: line for line in read_lines(response)}
+    assert set(by_patient) == {"p1", "p2", "p3", "p4"}
+    # p1 and p2 build the same prompt once their text is stripped.
+    assert len(prompts) == 2
+    assert by_patient["p1"] == {"patient_id": "p1", "cards": CARDS, "error": None}
+    assert by_patient["p2"] == {"patient_id": "p2", "cards": CARDS, "error": None}
+    assert by_patient["p3"] == {"patient_id": "p3", "cards": None, "error": "emr_text is required"}
+    assert by_patient["p4"] == {"patient_id": "p4", "cards": None, "error": "Failed to generate cards"}
+
+
+def test_batch_requires_patients():
+    from main import app
+
+    with TestClient(app) as client:
+        response = client.post("/api/cards/generate-batch", json={"patients": []})
+    assert response.status_code == 400
+
+
+def test_client_disconnect_cancels_the_remaining_patients(monkeypatch):
+    slow_cancelled = asyncio.Event()
+
+    async def fake_send(messages, model=None, max_tokens=None, generator="unknown", **kwargs):
+        if "Slow" in messages[-1]["content"]:
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                slow_cancelled.set()
+                raise
+        return json.dumps(CARDS)
+
+    monkeypatch.setattr(ai_service, "send_msg_async", fake_send)
+    from main import app
+
+    body = json.dumps({
+        "patients": [
+            {"patient_id": "fast", "emr_text": "Post-op knee, on warfarin."},
+            {"patient_id": "slow", "emr_text": "Slow: chronic heart failure."},
+        ]
+    }).encode()
+
+    async def scenario():
+        disconnected = asyncio.Event()
+        requested = False
+        lines = []
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                lines.append(json.loads(message["body"]))
+                disconnected.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/api/cards/generate-batch",
+            "raw_path": b"/api/cards/generate-batch",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("test", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        await asyncio.wait_for(slow_cancelled.wait(), 1)
+        return lines
+
+    lines = asyncio.run(scenario())
+    assert [line["patient_id"] for line in lines] == ["fast"]
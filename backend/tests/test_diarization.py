@@ -0,0 +1,76 @@
+import asyncio
+
+from src.services import diarization
+from src.services.diarization import build_processed, label_segments
+
+TRANSCRIPT = """Doctor: How is the knee today? Are you taking the warfarin every day?
+Patient: Yes, every morning. My knee is still swollen at night. Okay.
+Doctor: Keep elevating the leg and call us if the swelling gets worse.
+Patient: I noticed a bruise on my arm last week."""
+
+
+def test_diarize_returns_a_summary_from_the_small_tier(monkeypatch):
+    prompts = []
+
+    async def fake_send(messages, max_tokens=None, generator="unknown"):
+        prompts.append(messages)
+        assert generator == "transcript_summary"
+        return " Knee swelling after surgery; continue elevation and warfarin. "
+
+    monkeypatch.setattr("src.services.generator.send_msg_async", fake_send)
+    processed = asyncio.run(diarization.diarize(TRANSCRIPT))
+    assert processed["summary"] == "Knee swelling after surgery; continue elevation and warfarin."
+    assert "[CLINICIAN] How is the knee today?" in prompts[0][1]["content"]
+    assert processed["clinician_questions"] == ["How is the knee today?", "Are you taking the warfarin every day?"]
+    # Acknowledgements are left out; symptom reports are kept.
+    assert "Okay." not in processed["client_responses"]
+    assert "My knee is still swollen at night." in processed["client_responses"]
+
+
+def test_highlight_lists_are_capped():
+    lines = "\n".join(
+        f"Doctor: Did the pain change on day {i}?\nPatient: I felt sore on day {i}." for i in range(50)
+    )
+    processed = build_processed(label_segments(lines))
+    assert len(processed["clinician_questions"]) == diarization.MAX_CLINICIAN_QUESTIONS
+    assert len(processed["client_responses"]) == diarization.MAX_CLIENT_RESPONSES
+    assert len(processed["utterances"]) == 100
+
+
+def test_failed_summary_keeps_the_rule_labels(monkeypatch):
+    async def fake_send(messages, max_tokens=None, generator="unknown"):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr("src.services.generator.send_msg_async", fake_send)
+    processed = asyncio.run(diarization.diarize(TRANSCRIPT))
+    assert processed["summary"] == ""
+    assert processed["utterances"][0] == {
+        "speaker": "clinician",
+        "text": "How is the knee today? Are you taking the warfarin every day?",
+    }
+
+
+def test_failed_refinement_falls_back_to_the_full_llm_path(monkeypatch):
+    refined = []
+
+    async def failing_refine(segments, uncertain):
+        refined.append(uncertain)
+        raise RuntimeError("model unavailable")
+
+    async def no_summary(utterances):
+        return ""
+
+    monkeypatch.setattr(diarization, "refine_with_llm", failing_refine)
+    monkeypatch.setattr(diarization, "summarize_utterances", no_summary)
+    # The last, untagged sentence is uncertain and goes to refine_with_llm.
+    assert asyncio.run(diarization.diarize(TRANSCRIPT + "\nThe weather has been cold.")) is None
+    assert refined
+
+
+def test_chunks_are_not_summarized(monkeypatch):
+    async def fake_send(messages, max_tokens=None, generator="unknown"):
+        raise AssertionError(f"unexpected {generator} call")
+
+    monkeypatch.setattr("src.services.generator.send_msg_async", fake_send)
+    processed = asyncio.run(diarization.diarize(TRANSCRIPT, merge=False, summarize=False))
+    assert processed["summary"] == ""
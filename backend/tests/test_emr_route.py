@@ -0,0 +1,106 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.services import emr_repo
+from src.services.repositories import InMemoryRepository, SQLiteRepository, set_repository
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repository(request, tmp_path):
+    repo = InMemoryRepository() if request.param == "memory" else SQLiteRepository(str(tmp_path / "repo.sqlite3"))
+    set_repository(repo)
+    emr_repo.emr_cache.clear()
+    emr_repo.emr_projection_cache.clear()
+    yield repo
+    set_repository(None)
+    emr_repo.emr_cache.clear()
+    emr_repo.emr_projection_cache.clear()
+
+
+@pytest.fixture
+def sqlite_repo(tmp_path):
+    repo = SQLiteRepository(str(tmp_path / "repo.sqlite3"))
+    set_repository(repo)
+    yield repo
+    set_repository(None)
+
+
+def get(path, **kwargs):
+    from main import app
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, **kwargs)
+
+    return asyncio.run(run())
+
+
+def write_notes(repo, user_id, notes):
+    """Update the chart's latest note the way an EMR writer would; the trigger keeps the history."""
+    with repo._lock:
+        for i, note in enumerate(notes):
+            repo._conn.execute(
+                "UPDATE emr_reports SET visit_notes = ?, last_visit = ? WHERE user_id = ?",
+                (note, f"2026-01-{i + 10:02d}", user_id),
+            )
+        repo._conn.commit()
+
+
+def test_fields_projects_the_emr(repository):
+    emr = get("/api/emr/user_001", params={"fields": "alerts, medications"}).json()
+    assert set(emr) == {"user_id", "alerts", "medications"}
+    assert emr["user_id"] == "user_001" and isinstance(emr["medications"], list)
+
+
+def test_unknown_fields_are_rejected(repository):
+    response = get("/api/emr/user_001", params={"fields": "alerts,ssn"})
+    assert response.status_code == 400
+    assert "ssn" in response.json()["detail"]
+
+
+def test_projections_share_one_cache_entry_whatever_the_order(repository):
+    get("/api/emr/user_002", params={"fields": "alerts,vitals"})
+    get("/api/emr/user_002", params={"fields": "vitals,alerts,user_id"})
+    stats = emr_repo.emr_projection_cache.stats()
+    assert stats["entries"] == 1
+    # Projections never fill the full-EMR cache.
+    assert emr_repo.emr_cache.peek("user_002") is None
+
+
+def test_single_note_history(repository):
+    page = get("/api/emr/user_001/visit-notes", params={"limit": 1}).json()
+    assert len(page["notes"]) == 1 and page["next_cursor"] is None
+    assert page["notes"][0]["note"]
+
+
+def test_visit_note_pages_walk_newest_first(sqlite_repo):
+    write_notes(sqlite_repo, "user_001", ["second visit", "third visit", "fourth visit"])
+    pages, before = [], None
+    while True:
+        params = {"limit": 2, **({"before": before} if before else {})}
+        page = get("/api/emr/user_001/visit-notes", params=params).json()
+        pages.append([n["note"] for n in page["notes"]])
+        before = page["next_cursor"]
+        if before is None:
+            break
+    assert pages[0] == ["fourth visit", "third visit"]
+    assert pages[1][0] == "second visit" and len(pages[1]) == 2
+    assert len(pages) == 2  # the last page is exactly full, so it has no next_cursor
+
+
+def test_unchanged_note_is_not_recorded_again(sqlite_repo):
+    write_notes(sqlite_repo, "user_003", ["follow-up", "follow-up", ""])
+    notes = get("/api/emr/user_003/visit-notes").json()["notes"]
+    assert [n["note"] for n in notes][0] == "follow-up"
+    assert [n["note"] for n in notes].count("follow-up") == 1
+
+
+def test_invalid_before_cursor_is_rejected(repository):
+    assert get("/api/emr/user_001/visit-notes", params={"before": "abc"}).status_code == 400
+
+
+def test_unknown_patient_has_no_notes(repository):
+    assert get("/api/emr/nobody/visit-notes").json() == {"notes": [], "next_cursor": None}
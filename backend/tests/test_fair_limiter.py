@@ -0,0 +1,155 @@
+import asyncio
+
+from src.services.ai_service import FairLimiter
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    async def scenario():
+        limiter = FairLimiter(1)
+        order = []
+
+        async def worker(i):
+            async with limiter:
+                order.append(i)
+                await asyncio.sleep(0)
+
+        await limiter.acquire()
+        tasks = [asyncio.create_task(worker(i)) for i in range(5)]
+        await asyncio.sleep(0)
+        assert limiter.waiting == 5
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order, limiter
+
+    order, limiter = run(scenario())
+    assert order == [0, 1, 2, 3, 4]
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+
+
+def test_cancel_while_waiting_leaves_the_queue():
+    async def scenario():
+        limiter = FairLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.waiting == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert limiter.waiting == 0
+        limiter.release()
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_cancel_after_handoff_passes_the_slot_on():
+    async def scenario():
+        limiter = FairLimiter(1)
+        await limiter.acquire()
+        first = asyncio.create_task(limiter.acquire())
+        second = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # Hand the slot to `first`, then cancel it before it gets to run.
+        limiter.release()
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.wait_for(second, timeout=1)
+        assert limiter.in_flight == 1 and limiter.waiting == 0
+        limiter.release()
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_waiter_skipped_by_release_does_not_raise():
+    async def scenario():
+        limiter = FairLimiter(1)
+        await limiter.acquire()
+        first = asyncio.create_task(limiter.acquire())
+        second = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # Cancel `first` and release before its task runs: release() pops the
+        # cancelled future, skips it and hands the slot to `second`.
+        first.cancel()
+        limiter.release()
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert results[1] is None
+        assert limiter.in_flight == 1 and limiter.waiting == 0
+        limiter.release()
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_units_are_shared_across_request_sizes():
+    async def scenario():
+        limiter = FairLimiter(4)
+        await limiter.acquire(1)
+        await limiter.acquire(1)
+        large = asyncio.create_task(limiter.acquire(4))
+        small = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+        # 2 units are free, but the large request is first in line: the small one waits behind it.
+        assert not large.done() and not small.done()
+        limiter.release(1)
+        limiter.release(1)
+        await asyncio.sleep(0)
+        assert large.done() and not small.done()
+        assert limiter.in_flight == 4
+        limiter.release(4)
+        await asyncio.wait_for(small, timeout=1)
+        assert limiter.in_flight == 1
+        limiter.release(1)
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+
+
+def test_cancelled_large_waiter_unblocks_smaller_ones():
+    async def scenario():
+        limiter = FairLimiter(4)
+        await limiter.acquire(2)
+        large = asyncio.create_task(limiter.acquire(4))
+        small = asyncio.create_task(limiter.acquire(2))
+        await asyncio.sleep(0)
+        assert not small.done()
+        large.cancel()
+        await asyncio.gather(large, return_exceptions=True)
+        await asyncio.wait_for(small, timeout=1)
+        assert limiter.in_flight == 4
+        limiter.release(2)
+        limiter.release(2)
+        return limiter
+
+    limiter = run(scenario())
+    assert limiter.in_flight == 0
+
+
+def test_requests_larger_than_the_budget_are_capped():
+    async def scenario():
+        limiter = FairLimiter(2)
+        await asyncio.wait_for(limiter.acquire(4), timeout=1)
+        assert limiter.in_flight == 2
+        limiter.release(4)
+        return limiter
+
+    assert run(scenario()).in_flight == 0
+
+
+def test_small_and_large_tiers_draw_from_one_budget():
+    from src.services import ai_service
+    from src.services.model_routing import TIERS, units_for
+
+    assert units_for(TIERS["large"].model) == 4
+    assert units_for(TIERS["small"].model) == 1
+    assert units_for("some/unlisted-fallback-model") == 4
+    assert ai_service.llm_limiter.limit == ai_service.LLM_CONCURRENCY_UNITS
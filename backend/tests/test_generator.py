@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+import pytest
+
+from src.services import ai_service
+from src.services.generator import Generator, JsonArray
+from src.services.model_routing import TIERS
+
+TASK_SCHEMA = JsonArray({"id", "label"}, item="task")
+GOOD = [{"id": "t1", "label": "Check INR"}, {"id": "t2", "label": "Review swelling"}]
+
+
+def test_parse_returns_valid_items():
+    assert TASK_SCHEMA.parse(json.dumps(GOOD)) == GOOD
+
+
+@pytest.mark.parametrize(
+    "items, message",
+    [
+        ([GOOD[0], {"id": "t2"}], r"Task at index 1 missing fields: \['label'\]"),
+        (["Check INR", GOOD[0]], "Task at index 0 is not an object"),
+    ],
+)
+def test_parse_rejects_the_reply_on_any_invalid_item(items, message):
+    with pytest.raises(ValueError, match=message):
+        TASK_SCHEMA.parse(json.dumps(items))
+
+
+def test_accept_all_skips_invalid_items():
+    assert TASK_SCHEMA.accept_all(json.dumps([GOOD[0], {"id": "t2"}, "x", GOOD[1]])) == GOOD
+
+
+def test_invalid_small_tier_reply_falls_back_to_the_large_tier(monkeypatch):
+    models = []
+
+    async def fake_send(messages, model=None, max_tokens=None, generator="default", **kwargs):
+        models.append(model)
+        if model == TIERS["large"].model:
+            return json.dumps(GOOD)
+        return json.dumps([GOOD[0], {"id": "t2"}])
+
+    monkeypatch.setattr(ai_service, "send_msg_async", fake_send)
+    tasks = Generator("tasks", "system", lambda text: text, output=TASK_SCHEMA)
+    assert asyncio.run(tasks.run("notes")) == GOOD
+    assert models == [TIERS["small"].model, TIERS["large"].model]
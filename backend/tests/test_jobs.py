@@ -0,0 +1,142 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from src.services import jobs
+from src.services.jobs import JobQueue, MemoryJobStore, validate_callback_url
+
+
+def test_callbacks_are_refused_without_an_allowlist(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_CALLBACK_HOSTS", frozenset())
+    with pytest.raises(ValueError, match="not enabled"):
+        validate_callback_url("https://hooks.example.com/done")
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "http://hooks.example.com/done",
+        "https://169.254.169.254/latest/meta-data",
+        "https://localhost/admin",
+        "https://hooks.example.com.attacker.test/done",
+        "https://user:pw@hooks.example.com/done",
+        "file:///etc/passwd",
+    ],
+)
+def test_callbacks_outside_the_allowlist_are_refused(monkeypatch, url):
+    monkeypatch.setattr(jobs, "JOB_CALLBACK_HOSTS", frozenset({"hooks.example.com"}))
+    with pytest.raises(ValueError):
+        validate_callback_url(url)
+
+
+def test_allowlisted_https_callback_is_accepted(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_CALLBACK_HOSTS", frozenset({"hooks.example.com"}))
+    assert validate_callback_url("https://Hooks.Example.com:8443/done?job=1")
+
+
+def test_submit_rejects_a_disallowed_callback(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_CALLBACK_HOSTS", frozenset())
+
+    async def scenario():
+        queue = JobQueue(MemoryJobStore(), workers=1)
+        await queue.start()
+        try:
+            with pytest.raises(ValueError):
+                await queue.submit("tasks", {"emr_text": "x"}, callback_url="http://10.0.0.1/")
+        finally:
+            await queue.stop()
+
+    asyncio.run(scenario())
+
+
+def test_finished_jobs_are_pruned_without_new_submissions(monkeypatch):
+    async def quick(payload):
+        return "done"
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "quick", (quick, "normal"))
+    monkeypatch.setattr(jobs, "JOB_PRUNE_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(jobs, "JOB_TTL_SECONDS", 0)
+
+    async def scenario():
+        store = MemoryJobStore()
+        queue = JobQueue(store, workers=1)
+        await queue.start()
+        try:
+            job = await queue.submit("quick", {})
+            deadline = time.monotonic() + 2
+            while (queue.get(job.id) or store.get(job.id)) and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            return queue.get(job.id), store.get(job.id)
+        finally:
+            await queue.stop()
+
+    assert asyncio.run(scenario()) == (None, None)
+
+
+class FlakyStore(MemoryJobStore):
+    """Fails the first save of a finished job."""
+
+    def __init__(self):
+        super().__init__()
+        self.failed = False
+
+    def save(self, job):
+        if job.status in jobs.FINISHED and not self.failed:
+            self.failed = True
+            raise sqlite3.OperationalError("database is locked")
+        super().save(job)
+
+
+async def _wait_finished(queue, job_id, timeout=2):
+    deadline = time.monotonic() + timeout
+    while queue.get(job_id).status not in jobs.FINISHED and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    return queue.get(job_id)
+
+
+def test_worker_survives_a_store_failure(monkeypatch):
+    async def quick(payload):
+        return payload["n"]
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "quick", (quick, "normal"))
+
+    async def scenario():
+        store = FlakyStore()
+        queue = JobQueue(store, workers=1)
+        await queue.start()
+        try:
+            first = await queue.submit("quick", {"n": 1})
+            second = await queue.submit("quick", {"n": 2})
+            return await _wait_finished(queue, first.id), await _wait_finished(queue, second.id), store
+        finally:
+            await queue.stop()
+
+    first, second, store = asyncio.run(scenario())
+    assert store.failed
+    assert first.status in jobs.FINISHED and store.get(first.id).status == first.status
+    assert (second.status, second.result) == ("succeeded", 2)
+
+
+def test_worker_fails_jobs_of_a_removed_kind(monkeypatch):
+    async def quick(payload):
+        return "done"
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "quick", (quick, "normal"))
+    monkeypatch.setitem(jobs.JOB_KINDS, "gone", (quick, "normal"))
+
+    async def scenario():
+        queue = JobQueue(MemoryJobStore(), workers=1)
+        await queue.start()
+        try:
+            stale = await queue.submit("gone", {})
+            del jobs.JOB_KINDS["gone"]
+            fresh = await queue.submit("quick", {})
+            return await _wait_finished(queue, stale.id), await _wait_finished(queue, fresh.id)
+        finally:
+            await queue.stop()
+
+    stale, fresh = asyncio.run(scenario())
+    assert (stale.status, stale.error) == ("failed", "Failed to run gone job")
+    assert fresh.status == "succeeded"
@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from src.services.json_stream import JsonArrayStream, parse_json_lenient, strip_code_fences
+
+CARDS = [
+    {"id": "c1", "title": "Bleeding", "tags": ["warfarin", {"dose": "5 mg"}]},
+    {"id": "c2", "title": "Mobility \"cane\" use", "tags": []},
+    {"id": "c3", "title": "Pain, at night", "tags": ["knee"]},
+]
+
+
+def feed_in_pieces(stream, text, size):
+    out = []
+    for i in range(0, len(text), size):
+        out.extend(stream.feed(text[i:i + size]))
+    return out
+
+
+def test_code_fences_are_stripped():
+    fenced = "```json\n" + json.dumps(CARDS) + "\n```"
+    assert strip_code_fences(fenced) == json.dumps(CARDS)
+    assert parse_json_lenient(fenced) == CARDS
+    assert parse_json_lenient("```\n{\"summary\": \"ok\"}\n```", expect=dict) == {"summary": "ok"}
+
+
+def test_surrounding_prose_is_ignored():
+    text = "Here are the cards:\n" + json.dumps(CARDS) + "\nLet me know if you need more."
+    assert parse_json_lenient(text) == CARDS
+
+
+@pytest.mark.parametrize("cut", ['"Pain, at ni', '"Pain, at night", "tags": ["kn', '"Pain\\'])
+def test_truncation_inside_a_string_keeps_complete_elements(cut):
+    text = json.dumps(CARDS)
+    truncated = text[: text.index('"Pain, at night"')] + cut
+    assert parse_json_lenient(truncated) == CARDS[:2]
+
+
+def test_truncation_inside_a_nested_object_drops_the_whole_element():
+    cards = CARDS[1:] + CARDS[:1]
+    text = json.dumps(cards)
+    truncated = text[: text.index('"5 mg"')]
+    assert parse_json_lenient(truncated) == cards[:2]
+
+
+def test_truncation_inside_the_first_element_raises():
+    text = json.dumps(CARDS)
+    with pytest.raises(ValueError):
+        parse_json_lenient(text[: text.index('"5 mg"')])
+
+
+def test_truncated_object_keeps_its_complete_keys():
+    utterances = [{"speaker": "client", "text": "My knee hurts."}]
+    text = json.dumps({"utterances": utterances, "summary": "Knee pa"})
+    assert parse_json_lenient(text[:-3], expect=dict) == {"utterances": utterances}
+
+
+def test_truncated_object_keeps_complete_elements_of_a_nested_array():
+    utterances = [{"speaker": "clinician", "text": "How is the knee?"}, {"speaker": "client", "text": "Sore, mostly at night."}]
+    text = json.dumps({"utterances": utterances, "summary": "s"})
+    truncated = text[: text.index("mostly")]
+    assert parse_json_lenient(truncated, expect=dict) == {"utterances": utterances[:1]}
+
+
+def test_unrecoverable_output_raises_value_error():
+    with pytest.raises(ValueError):
+        parse_json_lenient("I could not generate cards for this patient.")
+    with pytest.raises(ValueError):
+        parse_json_lenient('[{"id": "c1", "title": "Blee')
+
+
+@pytest.mark.parametrize("size", [1, 7, 64])
+def test_stream_emits_each_element_as_it_closes(size):
+    text = "```json\n" + json.dumps(CARDS) + "\n```"
+    assert feed_in_pieces(JsonArrayStream(), text, size) == CARDS
+
+
+def test_stream_under_a_key_ignores_other_arrays():
+    payload = {"clinician_questions": [["nested"]], "utterances": CARDS, "summary": "s"}
+    stream = JsonArrayStream(key="utterances")
+    assert feed_in_pieces(stream, json.dumps(payload), 5) == CARDS
+    assert stream.done
+
+
+def test_stream_skips_elements_that_are_not_objects_or_not_valid_json():
+    text = '[1, "two", {"id": "c1"}, {"id": bad}, {"id": "c2"}'
+    assert JsonArrayStream().feed(text) == [{"id": "c1"}, {"id": "c2"}]
+
+
+def test_streamed_items_failing_the_schema_are_not_accepted():
+    from src.services.generator import JsonArray
+
+    schema = JsonArray({"id", "title"}, item="card")
+    text = json.dumps([{"id": "c1", "title": "Bleeding"}, {"id": "c2"}, {"title": "No id"}, {"id": "c3", "title": "Pain"}])
+    accepted = [item for item in map(schema.accept, JsonArrayStream().feed(text)) if item is not None]
+    assert [card["id"] for card in accepted] == ["c1", "c3"]
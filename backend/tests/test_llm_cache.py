@@ -0,0 +1,132 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import ai_service
+from src.services.llm_cache import LLMCache, make_cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.services.llm_cache.time.time", lambda: now[0])
+    return now
+
+
+def test_keys_ignore_prompt_indentation():
+    a = make_cache_key([{"role": "user", "content": "  Summarize:\n    knee pain\n"}], "m", 100, 0.5)
+    b = make_cache_key([{"role": "user", "content": "Summarize:\nknee pain"}], "m", 100, 0.5)
+    assert a == b
+    assert a != make_cache_key([{"role": "user", "content": "Summarize:\nknee pain"}], "m", 200, 0.5)
+
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    cache = LLMCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"  # a is now the most recently used
+    cache.set("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["memory_entries"] == 2
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = LLMCache(max_entries=8, ttl_seconds=60)
+    cache.set("a", "A")
+    clock[0] += 59
+    assert cache.get("a") == "A"
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_empty_completions_are_not_stored():
+    cache = LLMCache()
+    cache.set("a", "")
+    assert cache.get("a") is None
+    assert cache.stats()["stores"] == 0
+
+
+def test_disk_tier_survives_a_restart(tmp_path, clock):
+    path = str(tmp_path / "llm_cache.db")
+    first = LLMCache(max_entries=8, ttl_seconds=60, db_path=path)
+    first.set("a", "A")
+
+    second = LLMCache(max_entries=8, ttl_seconds=60, db_path=path)
+    assert second.has_disk_tier
+    assert second.get("a") == "A"
+    # The disk hit is promoted to memory.
+    assert second.get("a") == "A"
+    stats = second.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+    clock[0] += 61
+    third = LLMCache(max_entries=8, ttl_seconds=60, db_path=path)
+    assert third.get("a") is None
+    assert third._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone() == (0,)
+
+
+def test_disk_tier_evicts_least_recently_accessed_rows(tmp_path, clock):
+    cache = LLMCache(max_entries=1, ttl_seconds=60, db_path=str(tmp_path / "llm_cache.db"), db_max_entries=2)
+    cache.set("a", "A")
+    clock[0] += 1
+    cache.set("b", "B")
+    clock[0] += 1
+    cache.set("c", "C")
+
+    keys = {row[0] for row in cache._db.execute("SELECT key FROM llm_cache")}
+    assert keys == {"b", "c"}
+
+
+def fake_client(calls):
+    async def create(model, messages, **kwargs):
+        calls.append(model)
+        message = SimpleNamespace(content=f"answer from {model}")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    calls = []
+    cache = LLMCache(max_entries=8, ttl_seconds=60)
+    monkeypatch.setattr(ai_service, "llm_cache", cache)
+    monkeypatch.setattr(ai_service, "async_client", fake_client(calls))
+    return SimpleNamespace(cache=cache, calls=calls)
+
+
+MESSAGES = [{"role": "user", "content": "Summarize the visit."}]
+
+
+def test_primary_answers_are_cached(llm):
+    async def scenario():
+        first = await ai_service.send_msg_async(MESSAGES, model="primary", max_tokens=50)
+        second = await ai_service.send_msg_async(MESSAGES, model="primary", max_tokens=50)
+        return first, second
+
+    assert asyncio.run(scenario()) == ("answer from primary", "answer from primary")
+    assert llm.calls == ["primary"]
+    assert llm.cache.stats()["stores"] == 1
+
+
+def test_fallback_answers_are_not_cached(llm, monkeypatch):
+    async def fail_over(attempt, model, generator, policy=None):
+        return await attempt("fallback", 1.0)
+
+    monkeypatch.setattr(ai_service, "call_with_policy", fail_over)
+
+    async def scenario():
+        first = await ai_service.send_msg_async(MESSAGES, model="primary", max_tokens=50)
+        second = await ai_service.send_msg_async(MESSAGES, model="primary", max_tokens=50)
+        return first, second
+
+    assert asyncio.run(scenario()) == ("answer from fallback", "answer from fallback")
+    assert llm.calls == ["fallback", "fallback"]
+    assert llm.cache.stats()["stores"] == 0
+    assert llm.cache.get(make_cache_key(MESSAGES, "primary", 50, ai_service.TEMPERATURE)) is None
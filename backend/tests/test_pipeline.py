@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from src.services import transcript_processor
+from src.services.pipeline import Stage, run_pipeline, visit_pipeline_stages
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_duplicate_stages_are_rejected():
+    async def value(results):
+        return 1
+
+    with pytest.raises(ValueError, match="Duplicate pipeline stages"):
+        run(run_pipeline([Stage("cards", value), Stage("cards", value)]))
+
+
+def test_repeated_downstream_stages_run_once():
+    names = [stage.name for stage in visit_pipeline_stages("text", downstream=("cards", "cards", "tasks"))]
+    assert names == ["process", "emr", "cards", "tasks"]
+
+
+def test_session_survives_a_failed_finalize(monkeypatch):
+    calls = []
+
+    async def flaky_chunk(text):
+        calls.append(text)
+        if len(calls) == 1:
+            raise RuntimeError("model unavailable")
+        return {"utterances": [{"speaker": "client", "text": text}], "clinician_questions": [], "client_responses": [], "summary": ""}
+
+    async def no_summary(utterances):
+        return ""
+
+    monkeypatch.setattr(transcript_processor, "_label_chunk", flaky_chunk)
+    monkeypatch.setattr(transcript_processor, "summarize_utterances", no_summary)
+
+    async def scenario():
+        session = transcript_processor.TranscriptSession()
+        session.append("I have had a headache since Monday. ")
+        with pytest.raises(RuntimeError):
+            await session.finalize("It gets worse at night.")
+        retried = await session.finalize("It gets worse at night.")
+        with pytest.raises(ValueError, match="different tail"):
+            await session.finalize("Something else.")
+        return retried
+
+    processed = run(scenario())
+    assert len(calls) == 2
+    assert [u["text"] for u in processed["utterances"]] == [
+        "I have had a headache since Monday. It gets worse at night."
+    ]
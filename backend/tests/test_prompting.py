@@ -0,0 +1,46 @@
+from src.services.prompting import TOKEN_BUDGETS, TRUNCATION_MARKER, count_tokens, fit_list_to_tokens, truncate_to_tokens
+from src.services.transcript_to_emr import build_emr_prompt
+
+
+def test_fit_list_keeps_leading_items_and_counts_the_rest():
+    items = [f"Response number {i} about the knee." for i in range(100)]
+    fitted = fit_list_to_tokens(items, 50)
+    assert fitted[0] == items[0]
+    assert fitted[-1] == f"(+{100 - (len(fitted) - 1)} more)"
+    assert count_tokens(" ".join(fitted[:-1])) <= 50
+    assert fit_list_to_tokens(items[:2], 50) == items[:2]
+
+
+def test_emr_prompt_stays_within_the_whole_budget():
+    sentence = "My knee has been swelling every evening after physical therapy."
+    processed = {
+        "utterances": [{"speaker": "client", "text": sentence} for _ in range(2000)],
+        "clinician_questions": ["How is the swelling today?"] * 2000,
+        "client_responses": [sentence] * 2000,
+        "summary": sentence * 200,
+    }
+    prompt = build_emr_prompt(processed)
+    # Fixed labels add a few dozen tokens on top of the per-part budgets.
+    assert count_tokens(prompt) <= sum(TOKEN_BUDGETS["emr"].values()) + 100
+
+
+def test_long_visit_keeps_its_opening_and_its_plan():
+    filler = [{"speaker": "client", "text": f"The swelling was worse on day {i} of the week."} for i in range(3000)]
+    processed = {
+        "utterances": [{"speaker": "client", "text": "My left knee has been swollen since surgery."}]
+        + filler
+        + [{"speaker": "clinician", "text": "Continue warfarin 5mg and follow up in two weeks."}],
+        "summary": "",
+    }
+    prompt = build_emr_prompt(processed)
+    assert count_tokens(prompt) <= sum(TOKEN_BUDGETS["emr"].values()) + 100
+    assert "My left knee has been swollen since surgery." in prompt
+    assert "Continue warfarin 5mg and follow up in two weeks." in prompt
+    assert TRUNCATION_MARKER in prompt
+
+
+def test_middle_truncation_keeps_both_ends():
+    text = "start " + "filler words " * 2000 + "end"
+    trimmed = truncate_to_tokens(text, 100, keep="middle")
+    assert trimmed.startswith("start") and trimmed.endswith("end")
+    assert count_tokens(trimmed) <= 120
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from src.services import emr_repo
+from src.services.read_cache import ReadThroughCache
+from src.services.repositories import InMemoryRepository, set_repository
+
+
+class CountingRepository(InMemoryRepository):
+    """In-memory backend that counts EMR round-trips and can hold them open."""
+
+    def __init__(self):
+        self.emr_calls = 0
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.overrides = {}
+
+    async def get_emr_by_user_id(self, user_id, columns=None):
+        self.emr_calls += 1
+        await self.gate.wait()
+        if user_id in self.overrides:
+            return emr_repo.project_emr(self.overrides[user_id], columns) if columns else self.overrides[user_id]
+        return await super().get_emr_by_user_id(user_id, columns)
+
+
+@pytest.fixture
+def repo():
+    repo = CountingRepository()
+    set_repository(repo)
+    emr_repo.emr_cache.clear()
+    emr_repo.emr_projection_cache.clear()
+    yield repo
+    set_repository(None)
+    emr_repo.emr_cache.clear()
+    emr_repo.emr_projection_cache.clear()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_repeated_reads_hit_the_cache(repo):
+    async def scenario():
+        first = await emr_repo.get_emr_cached("user_001")
+        for _ in range(5):
+            assert await emr_repo.get_emr_cached("user_001") == first
+        # A projection of a cached EMR is served from it.
+        assert set(await emr_repo.get_emr_cached("user_001", ["vitals"])) == {"vitals"}
+        return first
+
+    assert run(scenario()) is not None
+    assert repo.emr_calls == 1
+
+
+def test_concurrent_misses_share_one_round_trip(repo):
+    async def scenario():
+        repo.gate.clear()
+        readers = [asyncio.create_task(emr_repo.get_emr_cached("user_001")) for _ in range(10)]
+        await asyncio.sleep(0)
+        repo.gate.set()
+        return await asyncio.gather(*readers)
+
+    results = run(scenario())
+    assert repo.emr_calls == 1
+    assert all(r == results[0] for r in results)
+
+
+def test_invalidate_reloads_and_drops_projections(repo):
+    async def scenario():
+        await emr_repo.get_emr_cached("user_001")
+        await emr_repo.get_emr_cached("user_002", ["alerts"])
+        emr_repo.invalidate_emr("user_001")
+        emr_repo.invalidate_emr("user_002")
+        await emr_repo.get_emr_cached("user_001")
+        await emr_repo.get_emr_cached("user_002", ["alerts"])
+
+    run(scenario())
+    assert repo.emr_calls == 4
+    assert emr_repo.emr_projection_cache.stats()["entries"] == 1
+
+
+def test_readers_after_invalidate_do_not_join_the_stale_load(repo):
+    async def scenario():
+        repo.overrides["user_001"] = {"user_id": "user_001", "visit_notes": "old"}
+        repo.gate.clear()
+        stale = asyncio.create_task(emr_repo.get_emr_cached("user_001"))
+        await asyncio.sleep(0)
+        repo.overrides["user_001"] = {"user_id": "user_001", "visit_notes": "new"}
+        emr_repo.invalidate_emr("user_001")
+        fresh = asyncio.create_task(emr_repo.get_emr_cached("user_001"))
+        await asyncio.sleep(0)
+        repo.gate.set()
+        await asyncio.gather(stale, fresh)
+        # The stale load finished after the write; it must not have been cached.
+        return fresh.result(), await emr_repo.get_emr_cached("user_001")
+
+    fresh, cached = run(scenario())
+    assert fresh["visit_notes"] == "new"
+    assert cached["visit_notes"] == "new"
+    assert repo.emr_calls == 2
+
+
+def test_missing_rows_use_the_negative_ttl(monkeypatch):
+    calls = []
+
+    async def loader(key):
+        calls.append(key)
+        return None
+
+    cache = ReadThroughCache(loader, ttl_seconds=60, negative_ttl_seconds=1)
+    now = [1000.0]
+    monkeypatch.setattr("src.services.read_cache.time.monotonic", lambda: now[0])
+
+    async def scenario():
+        assert await cache.get("missing") is None
+        assert await cache.get("missing") is None
+        now[0] += 2
+        assert await cache.get("missing") is None
+
+    run(scenario())
+    assert calls == ["missing", "missing"]
+
+
+def test_bookkeeping_does_not_grow_with_invalidated_keys():
+    async def loader(key):
+        return key
+
+    cache = ReadThroughCache(loader, max_entries=8)
+
+    async def scenario():
+        for i in range(100):
+            await cache.get(i)
+            cache.invalidate(i)
+
+    run(scenario())
+    assert cache.stats()["entries"] == 0
+    assert not cache._loading and not cache._flight.in_flight
@@ -0,0 +1,17 @@
+import pytest
+
+from src.services.repositories import InMemoryRepository, InstrumentedRepository, Repository, SQLiteRepository
+
+
+def test_backend_missing_a_method_fails_at_construction():
+    class Partial(Repository):
+        async def get_users(self):
+            return []
+
+    with pytest.raises(TypeError, match="abstract"):
+        Partial()
+
+
+def test_shipped_backends_implement_the_interface(tmp_path):
+    InstrumentedRepository(InMemoryRepository())
+    InstrumentedRepository(SQLiteRepository(str(tmp_path / "repo.sqlite3")))
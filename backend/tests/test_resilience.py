@@ -0,0 +1,169 @@
+import asyncio
+import time
+
+import httpx
+import openai
+import pytest
+
+from src.services import resilience
+from src.services.ai_service import FairLimiter
+from src.services.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, backoff_delay, call_with_policy
+
+REQUEST = httpx.Request("POST", "https://llm.test/v1/chat/completions")
+
+
+def rate_limited(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    return openai.RateLimitError("slow down", response=httpx.Response(429, request=REQUEST, headers=headers), body=None)
+
+
+def server_error():
+    return openai.InternalServerError("boom", response=httpx.Response(500, request=REQUEST), body=None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+def test_breaker_opens_then_lets_one_probe_through(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker(threshold=2, reset_seconds=30)
+
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 30
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+
+    breaker.record_failure()  # failed probe: open again for another reset period
+    assert breaker.state == "open"
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_cancelled_probe_frees_the_half_open_slot(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience, "time", clock)
+    breaker = CircuitBreaker(threshold=1, reset_seconds=1)
+    breaker.record_failure()
+    clock.now += 1
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+
+def test_backoff_honours_retry_after_up_to_max_delay():
+    policy = RetryPolicy(base_delay=0.5, max_delay=8.0)
+    assert backoff_delay(0, policy, rate_limited(2)) == 2.0
+    assert backoff_delay(0, policy, rate_limited(120)) == 8.0
+    for attempt in range(5):
+        assert 0 <= backoff_delay(attempt, policy, server_error()) <= min(8.0, 0.5 * 2 ** attempt)
+
+
+def test_retryable_errors_are_retried_with_the_hinted_delay():
+    calls = []
+
+    async def attempt(model, timeout):
+        calls.append(time.monotonic())
+        if len(calls) < 3:
+            raise rate_limited(0.05)
+        return "ok"
+
+    policy = RetryPolicy(max_attempts=3, deadline_seconds=5)
+    assert asyncio.run(call_with_policy(attempt, "model-a", "test", policy)) == "ok"
+    assert len(calls) == 3
+    assert all(later - earlier >= 0.04 for earlier, later in zip(calls, calls[1:]))
+
+
+def test_non_retryable_errors_fail_at_once():
+    calls = []
+
+    async def attempt(model, timeout):
+        calls.append(model)
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_policy(attempt, "model-a", "test", RetryPolicy(max_attempts=3)))
+    assert calls == ["model-a"]
+
+
+def test_deadline_bounds_the_whole_call():
+    async def attempt(model, timeout):
+        await asyncio.sleep(10)
+
+    policy = RetryPolicy(deadline_seconds=0.1, attempt_timeout=10, max_attempts=5)
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(call_with_policy(attempt, "model-a", "test", policy))
+    assert time.monotonic() - started < 1
+
+
+def test_open_circuit_fails_over_to_the_fallback():
+    async def attempt(model, timeout):
+        if model == "primary":
+            raise server_error()
+        return f"from {model}"
+
+    resilience.get_breaker("primary").opened_at = time.monotonic()
+    policy = RetryPolicy(fallback_model="fallback")
+    assert asyncio.run(call_with_policy(attempt, "primary", "test", policy)) == "from fallback"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call_with_policy(attempt, "primary", "test", RetryPolicy()))
+
+
+def test_hedge_races_the_fallback_and_cancels_the_loser():
+    limiter = FairLimiter(2)
+    started, cancelled = [], []
+
+    async def attempt(model, timeout):
+        async with limiter:
+            started.append(model)
+            try:
+                await asyncio.sleep(5 if model == "primary" else 0.01)
+            except asyncio.CancelledError:
+                cancelled.append(model)
+                raise
+            return f"from {model}"
+
+    async def scenario():
+        policy = RetryPolicy(fallback_model="fallback", hedge_after=0.05)
+        result = await call_with_policy(attempt, "primary", "test", policy)
+        await asyncio.sleep(0)
+        return result
+
+    begin = time.monotonic()
+    assert asyncio.run(scenario()) == "from fallback"
+    assert time.monotonic() - begin < 1
+    assert started == ["primary", "fallback"]
+    assert cancelled == ["primary"]
+    assert limiter.in_flight == 0 and limiter.waiting == 0
+    # The cancelled primary is not counted as a failure.
+    assert resilience.get_breaker("primary").failures == 0
+
+
+def test_hedge_is_not_started_when_the_primary_is_fast():
+    started = []
+
+    async def attempt(model, timeout):
+        started.append(model)
+        return f"from {model}"
+
+    policy = RetryPolicy(fallback_model="fallback", hedge_after=0.5)
+    assert asyncio.run(call_with_policy(attempt, "primary", "test", policy)) == "from primary"
+    assert started == ["primary"]
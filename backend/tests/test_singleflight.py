@@ -0,0 +1,182 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import ai_service
+from src.services.singleflight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("k", load) for _ in range(5)))
+
+    assert run(scenario()) == ["value"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        results = await asyncio.gather(flight.do("k", load), flight.do("k", load), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        with pytest.raises(RuntimeError):
+            await flight.do("k", load)
+
+    run(scenario())
+    assert len(calls) == 2
+
+
+def test_cancelling_the_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+    gate = None
+
+    async def load():
+        await gate.wait()
+        return "value"
+
+    async def scenario():
+        nonlocal gate
+        gate = asyncio.Event()
+        leader = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        assert await follower == "value"
+        assert leader.cancelled()
+
+    run(scenario())
+
+
+def test_forget_starts_a_new_call_for_later_callers():
+    flight = SingleFlight()
+    values = iter(["old", "new"])
+    gate = None
+
+    async def load():
+        value = next(values)
+        await gate.wait()
+        return value
+
+    async def scenario():
+        nonlocal gate
+        gate = asyncio.Event()
+        first = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        flight.forget("k")
+        second = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        gate.set()
+        return await first, await second
+
+    assert run(scenario()) == ("old", "new")
+
+
+class GatedClient:
+    """Fake AsyncOpenAI whose completions wait until the test opens the gate."""
+
+    def __init__(self):
+        self.calls = 0
+        self.gate = asyncio.Event()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        self.calls += 1
+        content = f"answer {self.calls}"
+        await self.gate.wait()
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(ai_service, "llm_cache", None)
+    monkeypatch.setattr(ai_service, "llm_singleflight", SingleFlight())
+
+    def install():
+        client = GatedClient()
+        monkeypatch.setattr(ai_service, "async_client", client)
+        return client
+
+    return install
+
+
+MESSAGES = [{"role": "user", "content": "Summarize the visit."}]
+
+
+def send():
+    return asyncio.create_task(ai_service.send_msg_async(MESSAGES, model="primary", max_tokens=50))
+
+
+def test_identical_requests_share_one_upstream_call(client):
+    async def scenario():
+        fake = client()
+        tasks = [send() for _ in range(4)]
+        await asyncio.sleep(0.01)
+        fake.gate.set()
+        return fake, await asyncio.gather(*tasks)
+
+    fake, answers = run(scenario())
+    assert fake.calls == 1
+    assert answers == ["answer 1"] * 4
+    assert ai_service.llm_singleflight.counters["coalesced"] == 3
+
+
+def test_a_cancelled_leader_leaves_followers_their_answer(client):
+    async def scenario():
+        fake = client()
+        leader = send()
+        await asyncio.sleep(0.01)
+        follower = send()
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0)
+        fake.gate.set()
+        answer = await follower
+        await asyncio.sleep(0)
+        return fake, leader, answer
+
+    fake, leader, answer = run(scenario())
+    assert leader.cancelled()
+    assert answer == "answer 1"
+    assert fake.calls == 1
+    assert ai_service.llm_limiter.in_flight == 0
+
+
+def test_coalescing_can_be_turned_off(client, monkeypatch):
+    monkeypatch.setattr(ai_service, "LLM_COALESCE_ENABLED", False)
+
+    async def scenario():
+        fake = client()
+        tasks = [send() for _ in range(3)]
+        await asyncio.sleep(0.01)
+        fake.gate.set()
+        return fake, await asyncio.gather(*tasks)
+
+    fake, answers = run(scenario())
+    assert fake.calls == 3
+    assert sorted(answers) == ["answer 1", "answer 2", "answer 3"]
+    assert ai_service.llm_singleflight.stats() == {"calls": 0, "coalesced": 0, "in_flight": 0}
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.services import ai_service, sse
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.split("\n\n"):
+        if not block.strip():
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event"), json.loads(fields["data"])))
+    return events
+
+
+STREAM_ROUTES = [
+    ("/api/summary/generate-stream", {"emr_text": "Post-op knee, on warfarin."}, "summary"),
+    (
+        "/api/report/generate-stream",
+        {
+            "user_id": "user_001",
+            "selected_questions": [{"id": "q1", "title": "Any new swelling?", "description": "DVT signs.", "answer": "yes"}],
+        },
+        "report",
+    ),
+    (
+        "/api/transcript/generate-emr-stream",
+        {"processed": {"utterances": [{"speaker": "client", "text": "My knee is swollen."}]}},
+        "emr",
+    ),
+]
+
+
+def stream_events(client, path, payload):
+    with client.stream("POST", path, json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return parse_events(response.read().decode())
+
+
+def stream_summary(client, emr_text):
+    return stream_events(client, "/api/summary/generate-stream", {"emr_text": emr_text})
+
+
+@pytest.mark.parametrize("path, payload, generator", STREAM_ROUTES)
+def test_tokens_then_done_with_multiline_text(monkeypatch, path, payload, generator):
+    async def fake_stream(messages, max_tokens=None, generator="unknown"):
+        assert generator == expected
+        for text in ["Knee ", "improving.\n\nContinue", " PT."]:
+            yield {"type": "token", "text": text}
+        yield {"type": "done", "text": "Knee improving.\n\nContinue PT.", "usage": {"total_tokens": 9}, "cached": False}
+
+    expected = generator
+    monkeypatch.setattr(sse, "stream_msg_async", fake_stream)
+    from main import app
+
+    events = stream_events(TestClient(app), path, payload)
+    assert [e for e, _ in events] == ["token", "token", "token", "done"]
+    assert "".join(d["text"] for e, d in events if e == "token") == "Knee improving.\n\nContinue PT."
+    assert events[-1][1] == {"text": "Knee improving.\n\nContinue PT.", "usage": {"total_tokens": 9}, "cached": False}
+
+
+def test_upstream_failure_becomes_an_error_event(monkeypatch):
+    async def failing_stream(messages, max_tokens=None, generator="unknown"):
+        yield {"type": "token", "text": "Knee"}
+        raise RuntimeError("upstream closed the stream")
+
+    monkeypatch.setattr(sse, "stream_msg_async", failing_stream)
+    from main import app
+
+    events = stream_summary(TestClient(app), "Post-op knee, on warfarin.")
+    assert events == [("token", {"text": "Knee"}), ("error", {"detail": "upstream closed the stream"})]
+
+
+class HangingStream:
+    """A model stream that sends one token and then never finishes."""
+
+    def __init__(self):
+        self.cancelled = False
+
+    def __aiter__(self):
+        return self._chunks()
+
+    async def _chunks(self):
+        yield SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content="Knee"))])
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+def test_client_disconnect_releases_the_llm_slot(monkeypatch):
+    stream = HangingStream()
+
+    async def create(**kwargs):
+        return stream
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_service, "async_client", fake_client)
+    monkeypatch.setattr(ai_service, "llm_cache", None)
+    from main import app
+
+    body = json.dumps({"emr_text": "Disconnect test: post-op knee."}).encode()
+
+    async def scenario():
+        disconnected = asyncio.Event()
+        requested = False
+        held = []
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                held.append(ai_service.llm_limiter.in_flight)
+                disconnected.set()
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0", "spec_version": "2.3"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/api/summary/generate-stream",
+            "raw_path": b"/api/summary/generate-stream",
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"test"), (b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("test", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        return held
+
+    held = asyncio.run(scenario())
+    assert held and held[0] > 0  # the slot was held while tokens flowed
+    assert stream.cancelled
+    assert ai_service.llm_limiter.in_flight == 0 and ai_service.llm_limiter.waiting == 0
@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+
+from benchmarks.fake_llm_server import StubConfig
+from benchmarks.run import start_stub
+from src.services import assemblyai
+from src.services.http_client import close_http_client
+
+
+def _get_tokens(monkeypatch, *params):
+    server, port = start_stub(StubConfig(latency=0.0))
+    monkeypatch.setattr(assemblyai, "ASSEMBLYAI_STREAMING_BASE_URL", f"http://127.0.0.1:{port}")
+    monkeypatch.setenv("ASSEMBLYAI_API_KEY", "test-key")
+
+    from main import app
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = await asyncio.gather(*(client.get("/api/streaming/token", params=p) for p in params))
+        await close_http_client()
+        return responses
+
+    try:
+        return asyncio.run(run())
+    finally:
+        server.should_exit = True
+
+
+def test_each_call_gets_its_own_token(monkeypatch):
+    responses = _get_tokens(monkeypatch, {}, {}, {"expires_in_seconds": 300})
+    assert all(r.status_code == 200 for r in responses)
+    tokens = [r.json()["token"] for r in responses]
+    assert len(set(tokens)) == 3
+    assert all(r.json()["expires_in"] == 300 for r in responses)
+
+
+def test_expires_in_is_clamped(monkeypatch):
+    short, long = _get_tokens(monkeypatch, {"expires_in_seconds": 5}, {"expires_in_seconds": 3600})
+    assert short.json()["expires_in"] == 60
+    assert long.json()["expires_in"] == 600
+
+
+def test_missing_api_key_is_a_server_error(monkeypatch):
+    from main import app
+
+    monkeypatch.delenv("ASSEMBLYAI_API_KEY", raising=False)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/api/streaming/token")
+
+    response = asyncio.run(run())
+    assert response.status_code == 500
+    assert "ASSEMBLYAI_API_KEY" in response.json()["detail"]
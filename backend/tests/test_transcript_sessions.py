@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from src.services import transcript_processor
+from src.services.transcript_processor import create_session, get_session, pop_session
+
+
+def test_expired_sessions_are_pruned_on_access(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(transcript_processor.time, "time", lambda: now[0])
+    session = create_session()
+    assert get_session(session.id) is session
+    now[0] += transcript_processor.SESSION_TTL_SECONDS + 1
+    assert get_session(session.id) is None
+    assert pop_session(session.id) is None
+    assert session.id not in transcript_processor._sessions
+
+
+def test_cancel_stops_pending_chunks_and_retrieves_failures(monkeypatch):
+    async def failing_chunk(text):
+        raise RuntimeError("labeling failed")
+
+    async def hanging_chunk(text):
+        await asyncio.Event().wait()
+
+    async def chunk_failing_on_cancel(text):
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            raise RuntimeError("cleanup failed")
+
+    async def scenario():
+        session = transcript_processor.TranscriptSession(max_chars=20, overlap_sentences=0)
+        monkeypatch.setattr(transcript_processor, "_label_chunk", failing_chunk)
+        session.append("First sentence here. Second sentence here. ")
+        await asyncio.sleep(0)
+        monkeypatch.setattr(transcript_processor, "_label_chunk", hanging_chunk)
+        session.append("Third sentence here. Fourth sentence here. ")
+        monkeypatch.setattr(transcript_processor, "_label_chunk", chunk_failing_on_cancel)
+        session.append("Fifth sentence here. Sixth sentence here. ")
+        await asyncio.sleep(0)
+        session.cancel()
+        await asyncio.sleep(0)
+        return session._tasks
+
+    tasks = asyncio.run(scenario())
+    assert all(t.done() for t in tasks)
+    assert any(t.cancelled() for t in tasks)
+    # No "Task exception was never retrieved" when the session is dropped.
+    assert not any(t._log_traceback for t in tasks)
+
+
+def test_open_sessions_are_capped(monkeypatch):
+    monkeypatch.setattr(transcript_processor, "_sessions", {})
+    monkeypatch.setattr(transcript_processor, "MAX_SESSIONS", 2)
+    create_session()
+    create_session()
+    with pytest.raises(transcript_processor.SessionLimitError):
+        create_session()
+
+
+def test_session_text_is_capped_and_rejected_sessions_are_cancelled(monkeypatch):
+    async def hanging_chunk(text):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(transcript_processor, "_label_chunk", hanging_chunk)
+    monkeypatch.setattr(transcript_processor, "_sessions", {})
+
+    async def scenario():
+        session = create_session()
+        session.max_chars, session.max_total_chars = 20, 60
+        session.append("First sentence here. Second sentence here. ")
+        with pytest.raises(transcript_processor.SessionLimitError):
+            session.append("Third sentence here. Fourth sentence here. ")
+        transcript_processor.discard_session(session.id)
+        await asyncio.sleep(0)
+        return session
+
+    session = asyncio.run(scenario())
+    assert session.total_chars == len("First sentence here. Second sentence here. ")
+    assert session.chunks_started and all(t.cancelled() for t in session._tasks)
+    assert get_session(session.id) is None
+
+
+def test_chunked_session_returns_one_summary(monkeypatch):
+    summarized = []
+
+    async def chunk_with_summary(text):
+        return {
+            "utterances": [{"speaker": "client", "text": text}],
+            "clinician_questions": [],
+            "client_responses": [],
+            "summary": f"Summary of: {text}",
+        }
+
+    async def summarize(utterances):
+        summarized.append(utterances)
+        return "One summary of the whole visit."
+
+    monkeypatch.setattr(transcript_processor, "_label_chunk", chunk_with_summary)
+    monkeypatch.setattr(transcript_processor, "summarize_utterances", summarize)
+
+    async def scenario():
+        session = transcript_processor.TranscriptSession(max_chars=20, overlap_sentences=0)
+        session.append("First sentence here. Second sentence here. Third sentence here. ")
+        return await session.finalize("Last one.")
+
+    processed = asyncio.run(scenario())
+    assert len(processed["utterances"]) > 1
+    assert processed["summary"] == "One summary of the whole visit."
+    assert len(summarized) == 1 and summarized[0] == processed["utterances"]
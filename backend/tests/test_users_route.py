@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.services.repositories import InMemoryRepository, SQLiteRepository, set_repository
+from src.services.users_repo import USERS_MAX_IDS
+
+ALL_IDS = ["user_001", "user_002", "user_003", "user_004", "user_005"]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def repository(request, tmp_path):
+    repo = InMemoryRepository() if request.param == "memory" else SQLiteRepository(str(tmp_path / "repo.sqlite3"))
+    set_repository(repo)
+    yield repo
+    set_repository(None)
+
+
+def get(path, **kwargs):
+    from main import app
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_pages_continue_from_next_cursor(repository):
+    seen, cursor = [], None
+    for _ in range(len(ALL_IDS)):
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = get("/api/users", params=params).json()
+        seen += [u["id"] for u in page["users"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ALL_IDS
+
+
+def test_cursor_past_the_last_id_is_an_empty_page(repository):
+    assert get("/api/users", params={"cursor": "user_999"}).json() == {"users": [], "next_cursor": None}
+
+
+def test_invalid_cursor_is_rejected(repository):
+    assert get("/api/users", params={"cursor": "x" * 300}).status_code == 400
+    assert get("/api/users", params={"cursor": "user_001\x00"}).status_code == 400
+
+
+def test_ids_lookup_skips_unknown_and_caps_the_count(repository):
+    found = get("/api/users", params={"ids": "user_003,missing,user_001,user_003"}).json()
+    assert [u["id"] for u in found["users"]] == ["user_001", "user_003"]
+
+    too_many = ",".join(f"user_{i:04d}" for i in range(USERS_MAX_IDS + 1))
+    response = get("/api/users", params={"ids": too_many})
+    assert response.status_code == 400
+    assert str(USERS_MAX_IDS) in response.json()["detail"]
+
+
+def test_if_none_match_returns_304(repository):
+    first = get("/api/users", params={"limit": 2})
+    etag = first.headers["etag"]
+    cached = get("/api/users", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+    assert cached.headers["etag"] == etag
+    # A different page has a different ETag, so the stale tag does not match.
+    other = get("/api/users", params={"limit": 3}, headers={"If-None-Match": etag})
+    assert other.status_code == 200 and other.headers["etag"] != etag